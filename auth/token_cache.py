@@ -0,0 +1,209 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+from google.auth import exceptions as google_exceptions
+from google.auth import jwt
+
+from utils.http_client import sync_session
+from utils.kv_store import MemoryLRU
+
+logger = logging.getLogger(__name__)
+
+# Firebase ID-token verification without firebase_admin on the request path:
+#   CertCache      Google's securetoken x509 certs, prefetched at startup and
+#                  refreshed in a background thread before Cache-Control expiry
+#   TokenVerifier  RS256 signature + Firebase claim checks (what
+#                  firebase_admin.auth.verify_id_token does without
+#                  check_revoked), with verified claims cached per token hash
+#                  until the token's own exp
+#
+# A cached token stays valid until exp, exactly as a re-verification would;
+# revocation is not checked on either path.
+
+FIREBASE_CERTS_URL = (
+    "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+)
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class InvalidTokenError(Exception):
+    pass
+
+
+class CertCache:
+    def __init__(self, url: str = FIREBASE_CERTS_URL, refresh_margin: float = 300.0,
+                 default_max_age: float = 3600.0, min_refetch_interval: float = 30.0):
+        self.url = url
+        self.refresh_margin = refresh_margin
+        self.default_max_age = default_max_age
+        self.min_refetch_interval = min_refetch_interval
+        self._session = sync_session(pool_size=1)
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.fetches = 0
+        self.failures = 0
+
+    def _fetch(self) -> None:
+        resp = self._session.get(self.url, timeout=10)
+        resp.raise_for_status()
+        certs = resp.json()
+        m = _MAX_AGE.search(resp.headers.get("Cache-Control", ""))
+        max_age = float(m.group(1)) if m else self.default_max_age
+        with self._lock:
+            self._certs = certs
+            self._fetched_at = time.time()
+            self._expires_at = self._fetched_at + max_age
+        self.fetches += 1
+
+    def refresh(self, force: bool = False) -> bool:
+        """Fetches now unless a fetch happened within min_refetch_interval."""
+        if not force and time.time() - self._fetched_at < self.min_refetch_interval:
+            return False
+        try:
+            self._fetch()
+            return True
+        except Exception:
+            self.failures += 1
+            logger.warning("certificate refresh from %s failed", self.url, exc_info=True)
+            return False
+
+    def get(self) -> Dict[str, str]:
+        certs = self._certs
+        if certs and time.time() < self._expires_at:
+            return certs
+        # nothing prefetched yet (or the refresher is failing): fetch inline once
+        with self._lock:
+            stale = not self._certs or time.time() >= self._expires_at
+        if stale:
+            self.refresh()
+        return self._certs
+
+    # ---------------------------
+    # Background refresh
+    # ---------------------------
+    def start(self) -> "CertCache":
+        """Prefetches now (in the background thread) and keeps the certs fresh."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cert-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            # already prefetched (see auth.verify.prefetch_certs): sleep until due
+            due = self._expires_at - self.refresh_margin - time.time()
+            if due > 0:
+                self._stop.wait(due)
+                continue
+            if self.refresh(force=True):
+                backoff = 1.0
+                wait = max(self._expires_at - self.refresh_margin - time.time(), self.min_refetch_interval)
+            else:
+                wait, backoff = backoff, min(backoff * 2, 60.0)
+            self._stop.wait(wait)
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._certs),
+            "expires_in": max(0.0, self._expires_at - time.time()),
+            "fetches": self.fetches,
+            "failures": self.failures,
+        }
+
+
+class TokenVerifier:
+    def __init__(self, project_id: str, certs: CertCache, cache: Optional[MemoryLRU] = None,
+                 clock_skew: int = 60):
+        self.project_id = project_id
+        self.issuer = f"https://securetoken.google.com/{project_id}"
+        self.certs = certs
+        self.cache = cache
+        self.clock_skew = clock_skew
+        self.verified = 0
+
+    @classmethod
+    def from_env(cls, project_id: str) -> "TokenVerifier":
+        # ID_TOKEN_CACHE_SIZE=0 verifies every request
+        size = int(os.getenv("ID_TOKEN_CACHE_SIZE", "10000"))
+        return cls(
+            project_id,
+            CertCache(os.getenv("FIREBASE_CERTS_URL", FIREBASE_CERTS_URL)),
+            cache=MemoryLRU(maxsize=size) if size > 0 else None,
+        )
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def cached(self, token: str) -> Optional[dict]:
+        """Claims for an already-verified, unexpired token; never verifies."""
+        if self.cache is None:
+            return None
+        claims = self.cache.get(self.key(token))
+        # the LRU TTL is exp-based; re-check in case the clock moved past it
+        if claims is not None and claims["exp"] + self.clock_skew > time.time():
+            return claims
+        return None
+
+    def verify(self, token: str) -> dict:
+        claims = self.cached(token)
+        if claims is not None:
+            return claims
+
+        claims = self._verify(token)
+        self.verified += 1
+        if self.cache is not None:
+            ttl = claims["exp"] + self.clock_skew - time.time()
+            if ttl > 0:
+                self.cache.set(self.key(token), claims, ttl=ttl)
+        return claims
+
+    def _verify(self, token: str) -> dict:
+        if not isinstance(token, str) or token.count(".") != 2:
+            raise InvalidTokenError("malformed token")
+        header = jwt.decode_header(token)
+        if header.get("alg") != "RS256":
+            raise InvalidTokenError("unexpected algorithm")
+
+        certs = self.certs.get()
+        if header.get("kid") not in certs:
+            # keys rotated since the last refresh
+            self.certs.refresh()
+            certs = self.certs.get()
+        try:
+            claims = jwt.decode(
+                token, certs=certs, audience=self.project_id, clock_skew_in_seconds=self.clock_skew
+            )
+        except (ValueError, google_exceptions.GoogleAuthError) as e:
+            raise InvalidTokenError(str(e)) from e
+
+        if claims.get("iss") != self.issuer:
+            raise InvalidTokenError("unexpected issuer")
+        sub = claims.get("sub")
+        if not isinstance(sub, str) or not sub or len(sub) > 128:
+            raise InvalidTokenError("invalid subject")
+        if claims.get("auth_time", 0) > time.time() + self.clock_skew:
+            raise InvalidTokenError("auth_time in the future")
+        claims["uid"] = sub
+        return claims
+
+    def stats(self) -> dict:
+        return {
+            "verified": self.verified,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "certs": self.certs.stats(),
+        }
@@ -1,43 +1,49 @@
 import os
-import json
-from dotenv import load_dotenv
-load_dotenv()
-# ---------------------------
-# 1. LOAD SERVICE ACCOUNT JSON
-# ---------------------------
-firebase_creds = json.loads(os.environ["FIREBASE_CREDENTIALS"])
+
+from container import container
+from utils.executor import run_blocking
 
 # ---------------------------
-# 2. INITIALIZE FIRESTORE CLIENT
+# VERIFY TOKEN FUNCTION
 # ---------------------------
-from google.oauth2 import service_account
-from google.cloud import firestore
+# The Firestore client and the token verifier live on the app container
+# (created once per process); firebase_admin is only initialized for the
+# auth emulator, which issues unsigned tokens our verifier rejects.
 
-gcp_credentials = service_account.Credentials.from_service_account_info(firebase_creds)
-db = firestore.Client(
-    project=firebase_creds["project_id"],
-    credentials=gcp_credentials
-)
+# verified tokens are cached until their exp (ID_TOKEN_CACHE_SIZE entries)
+USE_FIREBASE_ADMIN = bool(os.getenv("FIREBASE_AUTH_EMULATOR_HOST"))
 
-# ---------------------------
-# 3. INITIALIZE FIREBASE ADMIN AUTH
-# ---------------------------
-import firebase_admin
-from firebase_admin import credentials as fb_credentials
-from firebase_admin import auth
 
-cred = fb_credentials.Certificate(firebase_creds)
+def prefetch_certs():
+    """Fetches Google's signing certs now and keeps them fresh in the background."""
+    if USE_FIREBASE_ADMIN:
+        container.firebase_app
+        return
+    certs = container.token_verifier.certs
+    if not certs.refresh(force=True):
+        # the refresher keeps retrying with backoff; report not-ready meanwhile
+        certs.start()
+        raise RuntimeError(f"could not fetch signing certs from {certs.url}")
+    certs.start()
 
-# Prevent “App already exists” error in reload
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
 
-# ---------------------------
-# 4. VERIFY TOKEN FUNCTION
-# ---------------------------
 def verify_id_token(id_token):
     try:
-        decoded_token = auth.verify_id_token(id_token)
+        if USE_FIREBASE_ADMIN:
+            from firebase_admin import auth
+
+            decoded_token = auth.verify_id_token(id_token, app=container.firebase_app)
+        else:
+            decoded_token = container.token_verifier.verify(id_token)
         return decoded_token["uid"]
     except Exception:
         raise Exception("Invalid or expired token")
+
+
+async def averify_id_token(id_token):
+    # cache hits are a dict lookup; only misses (RSA verify) go to the pool
+    if not USE_FIREBASE_ADMIN:
+        claims = container.token_verifier.cached(id_token)
+        if claims is not None:
+            return claims["uid"]
+    return await run_blocking(verify_id_token, id_token)
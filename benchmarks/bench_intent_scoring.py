@@ -0,0 +1,75 @@
+"""
+Micro-benchmark: per-exemplar cosine loop vs. the vectorized exemplar matrix.
+
+Run from the repo root:
+    python benchmarks/bench_intent_scoring.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# scoring never touches the network, dummy credentials are enough
+os.environ.setdefault("CF_API_TOKEN", "bench")
+os.environ.setdefault("EMBED_BASE_URL", "http://localhost")
+
+from utils.intent_engine import IntentEngine  # noqa: E402
+
+
+def _cosine_sim(a, b):
+    na, nb = np.linalg.norm(a), np.linalg.norm(b)
+    if na == 0 or nb == 0:
+        return 0.0
+    return float(np.dot(a, b) / (na * nb))
+
+
+def loop_scores(per_intent, query):
+    # the pre-vectorization path: one norm + dot per exemplar
+    best_score, matched = -1.0, "unknown"
+    for intent, embs in per_intent.items():
+        score = max((_cosine_sim(query, e) for e in embs), default=-1.0)
+        if score > best_score:
+            best_score, matched = score, intent
+    return matched, best_score
+
+
+def timeit(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def main(n_queries=2000, batch=64):
+    engine = IntentEngine()
+    rng = np.random.default_rng(0)
+    dim = engine.exemplar_matrix.shape[1]
+    queries = rng.standard_normal((n_queries, dim)).astype(np.float32)
+
+    per_intent = {
+        intent: [engine.exemplar_matrix[i] for i in np.flatnonzero(engine.exemplar_labels == idx)]
+        for idx, intent in enumerate(engine.intents)
+    }
+
+    # sanity: both paths agree on the winner
+    for q in queries[:50]:
+        scores = engine.score_embeddings(q)
+        assert engine.intents[int(np.argmax(scores))] == loop_scores(per_intent, q)[0]
+
+    it = iter(range(10**9))
+    t_loop = timeit(lambda: loop_scores(per_intent, queries[next(it) % n_queries]), n_queries)
+    it = iter(range(10**9))
+    t_vec = timeit(lambda: engine.score_embeddings(queries[next(it) % n_queries]), n_queries)
+    t_batch = timeit(lambda: engine.score_embeddings(queries[:batch]), max(1, n_queries // batch)) / batch
+
+    print(f"exemplars: {engine.exemplar_matrix.shape[0]} x {dim}, intents: {len(engine.intents)}")
+    print(f"loop         : {t_loop * 1e6:9.1f} us/query")
+    print(f"vectorized   : {t_vec * 1e6:9.1f} us/query  ({t_loop / t_vec:.1f}x)")
+    print(f"batched ({batch:>3}): {t_batch * 1e6:9.1f} us/query  ({t_loop / t_batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Prompt size and build time for synthetic users, legacy one-line-per-
+transaction prompt vs. the aggregated, token-budgeted build_prompt.
+
+    python benchmarks/bench_prompt_builder.py [--sizes 10 100 1000 10000 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_txn_analytics import synthetic  # noqa: E402
+from utils.prompt_builder import build_prompt, estimate_tokens, token_budget  # noqa: E402
+from utils.txn_analytics import TransactionFrame  # noqa: E402
+
+
+def legacy_prompt(transactions):
+    txn_summary = "\n".join([f"- {t['category']}: ₹{t['amount']}" for t in transactions])
+    return (
+        "You are a helpful Indian financial assistant.\n\n"
+        "User asked about expenses.\n"
+        f"Transactions:\n{txn_summary}\n"
+        "Provide a clear expense summary."
+    )
+
+
+def timed(fn, repeat=3):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1_000, 10_000, 100_000])
+    parser.add_argument("--intent", default="expense_query")
+    args = parser.parse_args()
+
+    print(f"intent={args.intent} budget={token_budget(args.intent)} tokens")
+    print(f"{'txns':>7} | {'legacy tok':>10} {'legacy ms':>9} | {'new tok':>7} {'frame ms':>8} {'build ms':>8}")
+    for n in args.sizes:
+        rows = [r for r in synthetic(n, days=90) if r["type"] == "expense"]
+        t_legacy, legacy = timed(lambda: legacy_prompt(rows))
+        t_frame, frame = timed(lambda: TransactionFrame.from_records(rows))
+        t_new, prompt = timed(lambda: build_prompt(args.intent, "show my expenses", {}, rows, frame=frame))
+        print(f"{n:>7} | {estimate_tokens(legacy):>10} {t_legacy * 1e3:>9.2f} | "
+              f"{estimate_tokens(prompt):>7} {t_frame * 1e3:>8.2f} {t_new * 1e3:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
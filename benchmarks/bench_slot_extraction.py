@@ -0,0 +1,139 @@
+"""
+Slot extraction: the legacy nested-fuzz + dateparser path vs. the compiled
+extractor, cold (memo cleared) and warm (memoized), over
+benchmarks/data/slot_prompts.txt. Also reports how often the two agree on
+the day window and how often the compiled path still needs dateparser.
+
+Run from the repo root:
+    python benchmarks/bench_slot_extraction.py
+"""
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import dateparser
+from rapidfuzz import fuzz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import slot_extraction  # noqa: E402
+from utils.slot_extraction import _word_to_num, extract_slots, warmup  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "slot_prompts.txt")
+
+
+def _near(token, targets, threshold=80):
+    return any(fuzz.ratio(token, t) >= threshold for t in targets)
+
+
+def legacy_extract_time_window(user_prompt: str):
+    # the pre-compiled path, verbatim apart from the helper imports
+    s = (user_prompt or "").lower().strip()
+    now = datetime.now()
+    tokens = re.findall(r"[a-z0-9]+", s)
+    has_window_word = any(_near(t, ["last", "past", "previous", "prev"]) for t in tokens)
+    unit_map = {"day": 1, "week": 7, "month": 30, "year": 365}
+    unit = None
+    for t in tokens:
+        for u in unit_map.keys():
+            if _near(t, [u, u + "s"]):
+                unit = u
+                break
+        if unit:
+            break
+    num = None
+    for t in tokens:
+        if t.isdigit():
+            num = int(t)
+            break
+    if num is None:
+        num = _word_to_num(" ".join(tokens))
+    if has_window_word and unit and num:
+        return num * unit_map[unit]
+    rel = dateparser.parse(s, settings={"RELATIVE_BASE": now})
+    if rel:
+        delta_days = (now - rel).days
+        if delta_days > 0:
+            return delta_days
+    if any(_near(t, ["fortnight"]) for t in tokens):
+        return 14
+    if any(_near(t, ["yesterday"]) for t in tokens):
+        return 1
+    if "this week" in s:
+        return 7
+    if "this month" in s:
+        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        return max(1, (now - start).days)
+    return None
+
+
+def load_corpus():
+    with open(CORPUS, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def per_prompt_us(fn, prompts, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for p in prompts:
+            fn(p)
+    return (time.perf_counter() - start) * 1e6 / (rounds * len(prompts))
+
+
+def main():
+    prompts = load_corpus()
+
+    start = time.perf_counter()
+    legacy_extract_time_window("3 days ago")
+    legacy_first = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    warmup()
+    warm_ms = (time.perf_counter() - start) * 1000
+
+    legacy = per_prompt_us(legacy_extract_time_window, prompts, 3)
+
+    calls = {"n": 0}
+    real = slot_extraction._dateparse
+
+    def counting(text, now):
+        calls["n"] += 1
+        return real(text, now)
+
+    slot_extraction._dateparse = counting
+    slot_extraction._extract.cache_clear()
+    extract_slots(prompts[0])
+    slot_extraction._extract.cache_clear()
+    calls["n"] = 0
+
+    def cold(p):
+        slot_extraction._extract.cache_clear()
+        return extract_slots(p)
+
+    compiled_cold = per_prompt_us(cold, prompts, 1)
+    dateparser_share = calls["n"] / len(prompts)
+    compiled_cold = per_prompt_us(cold, prompts, 20)
+    compiled_warm = per_prompt_us(extract_slots, prompts, 200)
+    slot_extraction._dateparse = real
+
+    agree = sum(legacy_extract_time_window(p) == extract_slots(p)["window_days"] for p in prompts)
+    found_legacy = sum(legacy_extract_time_window(p) is not None for p in prompts)
+    slots = [extract_slots(p) for p in prompts]
+    found = sum(s["window_days"] is not None for s in slots)
+
+    print(f"{len(prompts)} prompts")
+    print(f"first call (language load): legacy {legacy_first:8.1f} ms   warmup() {warm_ms:8.1f} ms")
+    print(f"legacy            : {legacy:10.1f} us/prompt")
+    print(f"compiled (cold)   : {compiled_cold:10.1f} us/prompt  ({legacy / compiled_cold:.0f}x), "
+          f"dateparser on {dateparser_share:.0%} of prompts")
+    print(f"compiled (memoized): {compiled_warm:9.1f} us/prompt  ({legacy / compiled_warm:.0f}x)")
+    print(f"window found: legacy {found_legacy}/{len(prompts)}, compiled {found}/{len(prompts)}; "
+          f"same window on {agree}/{len(prompts)}")
+    print(f"categories on {sum(bool(s['categories']) for s in slots)}, "
+          f"amounts on {sum(s['amount'] is not None for s in slots)}, "
+          f"date bounds on {sum(s['end'] is not None for s in slots)}")
+
+
+if __name__ == "__main__":
+    main()
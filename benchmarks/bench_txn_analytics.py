@@ -0,0 +1,146 @@
+"""
+List-of-dicts loops vs. TransactionFrame for the window analytics used by
+/chatbot and build_prompt, at 1k / 100k / 1M transactions.
+
+The second table is the route's client-side cost per request: the
+repository's read path over pages of projected documents already in
+memory, as txn_row dicts and then a frame (before) vs. window_frame()
+filling the columns page by page, each followed by the analytics.
+
+    python benchmarks/bench_txn_analytics.py [--sizes 1000 100000 1000000] [--fetch-sizes 1000 10000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.txn_analytics import TransactionFrame  # noqa: E402
+from utils.txn_repository import TransactionRepository  # noqa: E402
+
+CATEGORIES = ["Food", "Rent", "Travel", "Shopping", "Bills", "Health", "Fun", "Groceries", "Fuel", "Misc"]
+
+
+def synthetic(n, days=365, seed=0):
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+    offsets = rng.integers(0, days * 86400, n)
+    cats = rng.integers(0, len(CATEGORIES), n)
+    amounts = rng.gamma(2.0, 400.0, n).round(2)
+    income = rng.random(n) < 0.05
+    return [
+        {
+            "type": "income" if income[i] else "expense",
+            "category": "Salary" if income[i] else CATEGORIES[cats[i]],
+            "amount": float(amounts[i]),
+            "timestamp": now - timedelta(seconds=int(offsets[i])),
+        }
+        for i in range(n)
+    ]
+
+
+def loops(rows, since):
+    income = expense = 0.0
+    by_cat = defaultdict(float)
+    for t in rows:
+        if t["timestamp"] < since:
+            continue
+        if t["type"] == "income":
+            income += t["amount"]
+        elif t["type"] == "expense":
+            expense += t["amount"]
+            by_cat[t["category"]] += t["amount"]
+    top = max(by_cat.items(), key=lambda kv: kv[1]) if by_cat else None
+    share = {c: v * 100 / expense for c, v in by_cat.items()} if expense else {}
+    return income, expense, top, share
+
+
+def vectorized(frame, since):
+    income = frame.total("income", since=since)
+    expense = frame.total("expense", since=since)
+    top = frame.top_k(1, since=since)
+    share = frame.share_by_category(since=since)
+    return income, expense, top, share
+
+
+def best_of(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class _PagedRepository(TransactionRepository):
+    """The repository's read path over pages already in memory (no store)."""
+
+    def __init__(self, pages):
+        super().__init__(db=None)
+        self.pages = pages
+
+    def _query(self, uid, types, since=None, until=None, descending=False):
+        return None
+
+    async def _pages(self, query, cap, read):
+        for page in self.pages:
+            read["pages"] += 1
+            read["docs"] += len(page)
+            yield page
+
+
+def request_path(sizes, since):
+    print(f"\n{'fetched':>9} {'rows+frame':>11} {'frame':>10} {'speedup':>8}")
+    for n in sizes:
+        docs = synthetic(n)
+        repo = _PagedRepository([docs[i:i + 300] for i in range(0, n, 300)])
+
+        async def via_rows():
+            rows = await repo.window("u", since, types=("expense",))
+            return vectorized(TransactionFrame.from_records(rows), since)
+
+        async def via_frame():
+            return vectorized(await repo.window_frame("u", since, types=("expense",)), since)
+
+        a, b = asyncio.run(via_rows()), asyncio.run(via_frame())
+        assert abs(a[1] - b[1]) < 1e-6 * max(1.0, a[1])
+        t_rows = best_of(lambda: asyncio.run(via_rows()))
+        t_frame = best_of(lambda: asyncio.run(via_frame()))
+        print(f"{n:>9} {t_rows * 1e3:>9.2f}ms {t_frame * 1e3:>8.2f}ms {t_rows / t_frame:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--fetch-sizes", type=int, nargs="+", default=[1_000, 10_000])
+    args = parser.parse_args()
+
+    since = datetime.now(timezone.utc) - timedelta(days=30)
+    print(f"{'rows':>9} {'build':>10} {'append 1k':>10} {'loops':>10} {'frame':>10} {'speedup':>8}")
+    for n in args.sizes:
+        rows = synthetic(n)
+        start = time.perf_counter()
+        frame = TransactionFrame.from_records(rows)
+        t_build = time.perf_counter() - start
+
+        a, b = loops(rows, since), vectorized(frame, since)
+        assert abs(a[1] - b[1]) < 1e-6 * max(1.0, a[1])
+
+        t_loop = best_of(lambda: loops(rows, since))
+        t_vec = best_of(lambda: vectorized(frame, since))
+        extra = synthetic(1000, seed=1)
+        t_append = best_of(lambda: frame.append(extra), repeat=1)
+        print(f"{n:>9} {t_build * 1e3:>8.1f}ms {t_append * 1e3:>8.2f}ms "
+              f"{t_loop * 1e3:>8.2f}ms {t_vec * 1e3:>8.2f}ms {t_loop / t_vec:>7.1f}x")
+
+    request_path(args.fetch_sizes, since)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Bulk import throughput: a synthetic CSV statement streamed in 64 KiB
+chunks (never held in memory) through utils.txn_ingest.
+
+  --parse-only   parse + validate only (no Firestore), the CPU ceiling
+  default        BulkIngest against the Firestore emulator: batched
+                 creates + rollup increments, idempotency get_all
+
+Run twice with the same --uid to see the re-import (all duplicates) path.
+
+    python benchmarks/bulk_ingest.py --rows 1000000 --parse-only
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python benchmarks/bulk_ingest.py --rows 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.txn_ingest import BulkIngest, RowError, iter_records, validate  # noqa: E402
+
+CATEGORIES = ["Food", "Rent", "Travel", "Shopping", "Bills", "Health", "Salary", "Freelance"]
+
+
+async def synthetic_csv(rows, days, chunk_size=64 * 1024):
+    rng = random.Random(0)
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    buf = ["timestamp,amount,type,category,description\n"]
+    size = len(buf[0])
+    for i in range(rows):
+        income = rng.random() < 0.15
+        ts = start + timedelta(seconds=rng.uniform(0, days * 86400))
+        line = (
+            f"{ts:%Y-%m-%dT%H:%M:%S},{rng.uniform(50, 5000):.2f},{'credit' if income else 'debit'},"
+            f"{rng.choice(CATEGORIES[6:] if income else CATEGORIES[:6])},UPI/{i:09d}\n"
+        )
+        buf.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(buf).encode()
+            buf, size = [], 0
+            # let the consumer run, as a socket read would
+            await asyncio.sleep(0)
+    if buf:
+        yield "".join(buf).encode()
+
+
+async def parse_only(rows, days):
+    ok = bad = 0
+    async for _, record in iter_records(synthetic_csv(rows, days), "csv"):
+        try:
+            if isinstance(record, RowError):
+                raise record
+            validate(record)
+            ok += 1
+        except RowError:
+            bad += 1
+    return {"rows": ok + bad, "invalid": bad}
+
+
+async def ingest(rows, days, uid, inflight):
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import firestore
+
+    db = firestore.AsyncClient(project="bench", credentials=AnonymousCredentials())
+    return await BulkIngest(db, uid, max_inflight=inflight).run(synthetic_csv(rows, days), "csv")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--uid", default="bulk-bench")
+    parser.add_argument("--inflight", type=int, default=4)
+    parser.add_argument("--parse-only", action="store_true")
+    args = parser.parse_args()
+
+    if not args.parse_only and not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("set FIRESTORE_EMULATOR_HOST to a running Firestore emulator (or pass --parse-only)")
+
+    start = time.perf_counter()
+    if args.parse_only:
+        report = asyncio.run(parse_only(args.rows, args.days))
+    else:
+        report = asyncio.run(ingest(args.rows, args.days, args.uid, args.inflight))
+    elapsed = time.perf_counter() - start
+
+    report.pop("errors", None)
+    print({k: v for k, v in report.items()})
+    print(f"{report['rows'] / elapsed:,.0f} rows/s over {elapsed:.1f}s, "
+          f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
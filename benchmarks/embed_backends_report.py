@@ -0,0 +1,146 @@
+"""
+Accuracy vs. latency of the intent embedding backends.
+
+Accuracy:
+  loo         leave-one-out over the INTENT_MAP exemplars; each exemplar is
+              classified against all the others (top-1, no threshold)
+  paraphrase  held-out phrasings below, at the backend's threshold, with
+              "unknown" for out-of-scope prompts
+Latency: single-query embed p50/p99 and batch-of-32 throughput.
+
+cloudflare runs only when CF_API_TOKEN is set (its LOO accuracy comes from
+the committed exemplar store); onnx only with EMBED_ONNX_DIR and
+onnxruntime installed.
+
+    python benchmarks/embed_backends_report.py [--backends hash,cloudflare,onnx]
+"""
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PARAPHRASES = [
+    ("how much money did i spend on food last month", "expense_query"),
+    ("list my transactions from this week", "expense_query"),
+    ("what did i pay for last weekend", "expense_query"),
+    ("which category eats most of my money", "expense_analysis"),
+    ("break down my spending by category", "expense_analysis"),
+    ("analyse my monthly expenses", "expense_analysis"),
+    ("how much budget do i have left this month", "budget_query"),
+    ("am i within my budget", "budget_query"),
+    ("i'd like to set a monthly budget of 20000", "set_budget"),
+    ("change my budget to 15k", "set_budget"),
+    ("i spent 300 on coffee today, add it", "add_expense"),
+    ("log 500 rupees for groceries", "add_expense"),
+    ("suggest good mutual funds for me", "investment_query"),
+    ("where should i invest 10k", "investment_query"),
+    ("how are my stocks performing", "investment_performance"),
+    ("what returns did my portfolio make", "investment_performance"),
+    ("give me tips to save more money", "savings_advice"),
+    ("how do i cut down my costs", "savings_advice"),
+    ("which credit card is best for travel", "credit_card_query"),
+    ("recommend a credit card", "credit_card_query"),
+    ("what cashback does my card give", "credit_card_benefits"),
+    ("tell me the reward points on my card", "credit_card_benefits"),
+    ("when is my electricity bill due", "bill_query"),
+    ("do i have any pending bills", "bill_query"),
+    ("can you explain that in more detail", "followup"),
+    ("what else can you tell me", "followup"),
+    ("hey there, good morning", "greeting"),
+    ("thanks a lot, that helps", "acknowledgment"),
+    ("ok see you later, bye", "goodbye"),
+    ("what's the weather in delhi", "unknown"),
+    ("write me a poem about cats", "unknown"),
+    ("who won the cricket match", "unknown"),
+]
+
+
+def loo_accuracy(engine) -> float:
+    M = np.asarray(engine.exemplar_matrix, dtype=np.float32)
+    labels = engine.exemplar_labels
+    sims = M @ M.T
+    np.fill_diagonal(sims, -np.inf)
+    n_intents = len(engine.intents)
+    best = np.full((len(M), n_intents), -np.inf, dtype=np.float32)
+    for k in range(n_intents):
+        cols = labels == k
+        if cols.any():
+            best[:, k] = sims[:, cols].max(axis=1)
+    return float((best.argmax(axis=1) == labels).mean())
+
+
+def store_loo(json_path: str) -> float:
+    from utils.exemplar_store import load_exemplars
+
+    intents, counts, matrix = load_exemplars(json_path)
+    stub = SimpleNamespace(
+        exemplar_matrix=matrix,
+        exemplar_labels=np.repeat(np.arange(len(intents)), counts),
+        intents=intents,
+    )
+    return loo_accuracy(stub)
+
+
+def paraphrase_accuracy(engine, embs) -> float:
+    hits = 0
+    for (_, label), row in zip(PARAPHRASES, engine.score_embeddings(np.vstack(embs))):
+        hits += engine._result_from_scores(row)["intent"] == label
+    return hits / len(PARAPHRASES)
+
+
+def latency(engine, reps: int):
+    texts = [p for p, _ in PARAPHRASES]
+    single = []
+    for i in range(reps):
+        start = time.perf_counter()
+        engine._embed_batch([texts[i % len(texts)]])
+        single.append((time.perf_counter() - start) * 1000)
+    batch = texts[:32]
+    start = time.perf_counter()
+    rounds = max(1, reps // 10)
+    for _ in range(rounds):
+        engine._embed_batch(batch)
+    per_text = (time.perf_counter() - start) * 1000 / (rounds * len(batch))
+    single = np.array(single)
+    return float(np.percentile(single, 50)), float(np.percentile(single, 99)), per_text
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default="hash,cloudflare,onnx")
+    parser.add_argument("--reps", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("EMBED_CACHE_PATH", "")
+    os.environ.setdefault("EMBED_CACHE_SIZE", "0")
+    from utils.embed_backends import backend_from_env
+    from utils.intent_engine import IntentEngine
+
+    print(f"{'backend':<12}{'model':<28}{'loo':>7}{'para':>7}{'thr':>6}"
+          f"{'p50 ms':>10}{'p99 ms':>10}{'ms/text@32':>12}")
+    for name in args.backends.split(","):
+        try:
+            engine = IntentEngine(backend=backend_from_env(name))
+        except RuntimeError as e:
+            if name == "cloudflare" and os.path.exists("utils/intent_embs.npy"):
+                # no token: the committed bge-m3 store still gives LOO accuracy
+                print(f"{name:<12}{'(exemplar store only)':<28}{store_loo('utils/intent_embs.json'):>7.1%}"
+                      f"{'n/a':>7}{'':>6}{'n/a':>10}{'n/a':>10}{'n/a':>12}  {e}")
+            else:
+                print(f"{name:<12}skipped: {e}")
+            continue
+        loo = loo_accuracy(engine)
+        para = paraphrase_accuracy(engine, engine._embed_batch([p for p, _ in PARAPHRASES]))
+        reps = args.reps if not engine.backend.remote else min(args.reps, 30)
+        p50, p99, per_text = latency(engine, reps)
+        print(f"{name:<12}{engine.model[:27]:<28}{loo:>7.1%}{para:>7.1%}{engine.threshold:>6.2f}"
+              f"{p50:>10.3f}{p99:>10.3f}{per_text:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Query-embedding throughput with and without request coalescing.
+
+Concurrent ascore_intent calls against the embedding stub; "single" sends
+one HTTP call per miss (EMBED_BATCH_MAX=1), "coalesced" batches misses
+arriving within the window. --dup-rate re-asks recent prompts so the
+in-flight dedupe shows up. The query cache is disabled.
+
+    python benchmarks/embed_coalescing.py --requests 1000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import EmbeddingStub, fixed  # noqa: E402
+
+
+async def drive(engine, prompts, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(prompt):
+        async with sem:
+            start = time.perf_counter()
+            await engine.ascore_intent(prompt)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in prompts))
+    elapsed = time.perf_counter() - start
+    lat = np.array(latencies) * 1000
+    return {
+        "rps": len(prompts) / elapsed,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+    }
+
+
+def histogram(sizes: dict, width: int = 40) -> str:
+    if not sizes:
+        return ""
+    top = max(sizes.values())
+    return "\n".join(
+        f"    {size:>4} | {'#' * max(1, round(n / top * width))} {n}" for size, n in sizes.items()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--embed-ms", type=float, default=40)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--dup-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    stub = EmbeddingStub(fixed(args.embed_ms / 1000)).start()
+    os.environ.update({
+        "CF_API_TOKEN": "bench",
+        "EMBED_BASE_URL": stub.base_url,
+        "EMBED_CACHE_PATH": "",
+        "EMBED_CACHE_SIZE": "0",
+        "EMBED_HEDGE_MS": "0",
+    })
+    from utils.embed_batcher import EmbeddingBatcher
+    from utils.intent_engine import IntentEngine
+
+    engine = IntentEngine()
+
+    def prompts(tag):
+        # long enough that the lexical tier passes them to the embedder
+        rnd = random.Random(1)
+        out = []
+        for i in range(args.requests):
+            if out and rnd.random() < args.dup_rate:
+                out.append(out[-rnd.randint(1, min(len(out), 8))])
+            else:
+                out.append(f"please show me the {tag} spending report number {i}")
+        return out
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, embed {args.embed_ms:.0f}ms, "
+          f"window {args.window_ms:.0f}ms, dup-rate {args.dup_rate:.0%}")
+
+    async def run_all():
+        for name, max_batch in (("single", 1), ("coalesced", args.max_batch)):
+            engine.batcher = EmbeddingBatcher(engine._aembed_batch, args.window_ms, max_batch)
+            before = stub.requests
+            r = await drive(engine, prompts(name), args.concurrency)
+            stats = engine.batcher.stats()
+            print(f"{name:>10}: {r['rps']:7.1f} req/s  p50 {r['p50_ms']:7.1f}ms  "
+                  f"p99 {r['p99_ms']:7.1f}ms  upstream calls {stub.requests - before}  "
+                  f"deduped {stats['deduped']}  mean batch {stats['mean_batch']:.1f}")
+            if max_batch > 1:
+                print("  batch sizes:")
+                print(histogram(stats["batch_sizes"]))
+        await engine.aclose()
+
+    asyncio.run(run_all())
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
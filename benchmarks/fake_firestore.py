@@ -0,0 +1,313 @@
+"""
+In-memory stand-in for google.cloud.firestore.AsyncClient, covering the
+surface the app uses:
+
+    db.collection(..).document(..)[.collection(..).document(..)]
+    doc.get() / set(data, merge=) / update(data)
+    query.where(field, op, value) / order_by / limit / select / start_after / stream()
+    query.count().get()
+    db.get_all(refs, field_paths=) / db.batch() (set, create, delete, commit)
+
+set(merge=True) applies firestore.Increment and SERVER_TIMESTAMP like the
+server does, batch.create raises AlreadyExists, and snapshots hand out
+copies so callers can't mutate the store. latency() seconds are awaited
+per RPC (get, one query stream, get_all, commit, set/update), and
+reads / writes / rpcs are counted for reporting.
+"""
+import asyncio
+import copy
+import uuid
+from datetime import datetime, timezone
+
+from google.api_core import exceptions as google_exceptions
+from google.cloud.firestore_v1.aggregation import AggregationResult
+from google.cloud.firestore_v1.transforms import Increment, Sentinel
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+def _resolve(value, current):
+    """A written value with transforms applied against the stored one."""
+    if isinstance(value, Increment):
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        return base + value.value
+    if isinstance(value, Sentinel):
+        # SERVER_TIMESTAMP (DELETE_FIELD is handled by the caller)
+        return datetime.now(timezone.utc)
+    if isinstance(value, dict):
+        return {k: _resolve(v, None) for k, v in value.items()}
+    return copy.deepcopy(value)
+
+
+def _merge(current: dict, data: dict) -> None:
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(current.get(key), dict):
+            _merge(current[key], value)
+        else:
+            current[key] = _resolve(value, current.get(key))
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+    def get(self, field):
+        value = self._data or {}
+        for part in field.split("."):
+            value = value[part]
+        return copy.deepcopy(value)
+
+
+class FakeDocument:
+    def __init__(self, db, parent: str, doc_id: str):
+        self._db = db
+        self._parent = parent
+        self.id = doc_id
+        self.path = f"{parent}/{doc_id}"
+
+    def collection(self, name: str) -> "FakeCollection":
+        return FakeCollection(self._db, f"{self.path}/{name}")
+
+    def _read(self):
+        self._db.reads += 1
+        return self._db._docs.get(self._parent, {}).get(self.id)
+
+    async def get(self, field_paths=None) -> FakeSnapshot:
+        await self._db._rpc()
+        return FakeSnapshot(self, _project(self._read(), field_paths))
+
+    async def set(self, data: dict, merge: bool = False) -> None:
+        await self._db._rpc()
+        self._db._set(self, data, merge)
+
+    async def update(self, data: dict) -> None:
+        await self._db._rpc()
+        if self._read() is None:
+            raise google_exceptions.NotFound(f"no document to update: {self.path}")
+        self._db._update(self, data)
+
+    async def delete(self) -> None:
+        await self._db._rpc()
+        self._db._delete(self)
+
+
+def _project(data, fields):
+    if data is None or not fields:
+        return data
+    return {k: v for k, v in data.items() if k in fields}
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=(), order=None, limit=None, fields=None, after=None):
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._order = order
+        self._limit = limit
+        self._fields = fields
+        self._after = after
+
+    def _with(self, **changes) -> "FakeQuery":
+        state = {
+            "filters": self._filters, "order": self._order, "limit": self._limit,
+            "fields": self._fields, "after": self._after,
+        }
+        state.update(changes)
+        return FakeQuery(self._collection, **state)
+
+    def where(self, field, op, value) -> "FakeQuery":
+        if op not in _OPS:
+            raise ValueError(f"unsupported operator {op!r}")
+        return self._with(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction="ASCENDING") -> "FakeQuery":
+        return self._with(order=(field, direction == "DESCENDING"))
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._with(limit=count)
+
+    def select(self, field_paths) -> "FakeQuery":
+        return self._with(fields=tuple(field_paths))
+
+    def start_after(self, snapshot) -> "FakeQuery":
+        return self._with(after=snapshot.id)
+
+    def _matches(self):
+        db = self._collection._db
+        docs = db._docs.get(self._collection.path, {})
+        rows = [
+            (doc_id, data) for doc_id, data in docs.items()
+            if all(f in data and _OPS[op](data[f], v) for f, op, v in self._filters)
+        ]
+        if self._order is None:
+            rows.sort(key=lambda r: r[0])
+            if self._after is not None:
+                rows = [r for r in rows if r[0] > self._after]
+        else:
+            field, descending = self._order
+            # like Firestore, documents without the order field are left out
+            rows = [r for r in rows if field in r[1]]
+            rows.sort(key=lambda r: (r[1][field], r[0]), reverse=descending)
+            if self._after is not None and self._after in docs and field in docs[self._after]:
+                cursor = (docs[self._after][field], self._after)
+                rows = [r for r in rows if ((r[1][field], r[0]) < cursor if descending else (r[1][field], r[0]) > cursor)]
+        return rows[:self._limit] if self._limit is not None else rows
+
+    async def stream(self):
+        db = self._collection._db
+        await db._rpc()
+        rows = self._matches()
+        db.reads += max(len(rows), 1)  # an empty result still bills one read
+        for doc_id, data in rows:
+            yield FakeSnapshot(self._collection.document(doc_id), _project(copy.deepcopy(data), self._fields))
+
+    async def get(self):
+        return [snap async for snap in self.stream()]
+
+    def count(self, alias=None) -> "FakeCountQuery":
+        return FakeCountQuery(self, alias or "field_1")
+
+
+class FakeCountQuery:
+    def __init__(self, query, alias):
+        self._query = query
+        self._alias = alias
+
+    async def get(self):
+        db = self._query._collection._db
+        await db._rpc()
+        n = len(self._query._matches())
+        db.reads += max((n + 999) // 1000, 1)  # one read per 1000 index entries
+        return [[AggregationResult(alias=self._alias, value=n)]]
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, path: str):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+        super().__init__(self)
+
+    def document(self, doc_id: str = None) -> FakeDocument:
+        return FakeDocument(self._db, self.path, doc_id or uuid.uuid4().hex[:20])
+
+    async def add(self, data: dict):
+        doc = self.document()
+        await doc.set(data)
+        return None, doc
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(("set", ref, data, merge))
+
+    def create(self, ref, data):
+        self._ops.append(("create", ref, data, False))
+
+    def update(self, ref, data):
+        self._ops.append(("update", ref, data, False))
+
+    def delete(self, ref):
+        self._ops.append(("delete", ref, None, False))
+
+    async def commit(self):
+        await self._db._rpc()
+        # all-or-nothing, like the real commit
+        for op, ref, _, _ in self._ops:
+            exists = self._db._docs.get(ref._parent, {}).get(ref.id) is not None
+            if op == "create" and exists:
+                raise google_exceptions.AlreadyExists(f"document already exists: {ref.path}")
+            if op == "update" and not exists:
+                raise google_exceptions.NotFound(f"no document to update: {ref.path}")
+        for op, ref, data, merge in self._ops:
+            if op == "delete":
+                self._db._delete(ref)
+            elif op == "update":
+                self._db._update(ref, data)
+            else:
+                self._db._set(ref, data, merge)
+        self._ops = []
+
+
+class FakeFirestore:
+    def __init__(self, latency=None):
+        self.latency = latency
+        # {collection path: {document id: data}}
+        self._docs = {}
+        self.rpcs = 0
+        self.reads = 0
+        self.writes = 0
+
+    async def _rpc(self):
+        self.rpcs += 1
+        if self.latency is not None:
+            await asyncio.sleep(self.latency())
+
+    def _set(self, ref, data, merge):
+        self.writes += 1
+        docs = self._docs.setdefault(ref._parent, {})
+        if merge and ref.id in docs:
+            _merge(docs[ref.id], data)
+        else:
+            current = {}
+            _merge(current, data)
+            docs[ref.id] = current
+
+    def _update(self, ref, data):
+        self.writes += 1
+        current = self._docs[ref._parent][ref.id]
+        for key, value in data.items():
+            # dotted paths address nested fields; update replaces, never merges
+            *parents, leaf = key.split(".")
+            target = current
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[leaf] = _resolve(value, target.get(leaf))
+
+    def _delete(self, ref):
+        self.writes += 1
+        self._docs.get(ref._parent, {}).pop(ref.id, None)
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    async def get_all(self, references, field_paths=None):
+        await self._rpc()
+        for ref in references:
+            yield FakeSnapshot(ref, _project(copy.deepcopy(ref._read()), field_paths))
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "rpcs": self.rpcs,
+            "reads": self.reads,
+            "writes": self.writes,
+            "documents": sum(len(docs) for docs in self._docs.values()),
+        }
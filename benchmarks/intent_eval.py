@@ -0,0 +1,262 @@
+"""
+Offline intent-classification eval: replays a labelled corpus through
+IntentEngine.detect_intent with recorded embeddings, so no network is needed.
+
+Reports accuracy, a confusion matrix, per-intent precision / recall / F1,
+per-tier counts, detect_intent latency percentiles and throughput, and a
+threshold sweep over the embedding tier (lexical tiers are unaffected).
+--out writes everything as JSON; --baseline compares against a previous
+JSON and exits 1 if accuracy dropped by more than --max-drop.
+
+Corpus: benchmarks/data/intent_eval.jsonl, one {"prompt", "intent"} per line.
+
+The default backend is the local hash encoder (or $EMBED_BACKEND), which
+needs neither network nor a fixture:
+
+    python benchmarks/intent_eval.py --out eval.json
+    python benchmarks/intent_eval.py --baseline eval.json
+
+Remote backends replay a fixture, benchmarks/data/intent_eval_embs.<backend>.npz
+(corpus prompts + INTENT_MAP exemplars). No cloudflare fixture is committed
+yet; tuning the production threshold needs one, recorded once with
+credentials (CF_ACCOUNT_ID, CF_API_TOKEN, EMBED_MODEL as in production) and
+committed so the eval runs offline from then on:
+
+    python benchmarks/intent_eval.py --backend cloudflare --record
+    git add benchmarks/data/intent_eval_embs.cloudflare.npz
+    python benchmarks/intent_eval.py --backend cloudflare --out eval.json
+
+Re-record whenever the corpus, INTENT_MAP or the embedding model changes.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(ROOT, "benchmarks", "data")
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [r["prompt"] for r in rows], [r["intent"] for r in rows]
+
+
+def fixture_path(backend_name):
+    return os.path.join(DATA, f"intent_eval_embs.{backend_name}.npz")
+
+
+def make_engine(args):
+    os.environ["EMBED_CACHE_SIZE"] = "0"
+    os.environ["EMBED_CACHE_PATH"] = ""
+    from utils.embed_backends import BACKENDS, RecordedBackend, backend_from_env
+    from utils.intent_engine import IntentEngine
+
+    fixture = args.fixture or fixture_path(args.backend)
+    if os.path.exists(fixture):
+        backend = RecordedBackend(fixture)
+    elif BACKENDS[args.backend].remote:
+        sys.exit(f"{fixture} not found; record it with credentials: "
+                 f"python benchmarks/intent_eval.py --backend {args.backend} --record "
+                 f"(or run the default --backend hash offline)")
+    else:
+        backend = backend_from_env(args.backend)
+    engine = IntentEngine(backend=backend)
+    if args.threshold is not None:
+        engine.threshold = args.threshold
+    return engine, backend
+
+
+def record(args, prompts):
+    from utils.embed_backends import RecordedBackend, backend_from_env
+    from utils.intents import INTENT_MAP
+
+    backend = backend_from_env(args.backend)
+    backend.prepare(p for samples in INTENT_MAP.values() for p in samples)
+    texts = prompts + [p for samples in INTENT_MAP.values() for p in samples]
+    path = args.fixture or fixture_path(backend.name)
+    RecordedBackend.record(backend, texts, path)
+    print(f"recorded {len(texts)} texts from {backend.name} ({backend.model}) -> {path}")
+
+
+def classification_report(labels, preds):
+    intents = sorted(set(labels) | set(preds))
+    confusion = {t: {p: 0 for p in intents} for t in intents}
+    for t, p in zip(labels, preds):
+        confusion[t][p] += 1
+    per_intent = {}
+    for intent in intents:
+        tp = confusion[intent][intent]
+        predicted = sum(confusion[t][intent] for t in intents)
+        support = sum(confusion[intent].values())
+        precision = tp / predicted if predicted else 0.0
+        recall = tp / support if support else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_intent[intent] = {"precision": precision, "recall": recall, "f1": f1, "support": support}
+    accuracy = sum(t == p for t, p in zip(labels, preds)) / len(labels)
+    macro_f1 = float(np.mean([m["f1"] for i, m in per_intent.items() if m["support"]]))
+    return accuracy, macro_f1, confusion, per_intent
+
+
+def sweep(results, labels, thresholds):
+    """Accuracy per threshold, re-deciding only embedding-tier results."""
+    out = []
+    for thr in thresholds:
+        preds = [
+            r["intent_raw"] if r["tier"] != "embedding" or r["score"] >= thr else "unknown"
+            for r in results
+        ]
+        acc, macro_f1, _, per_intent = classification_report(labels, preds)
+        unknown = per_intent.get("unknown", {})
+        out.append({
+            "threshold": round(float(thr), 3),
+            "accuracy": acc,
+            "macro_f1": macro_f1,
+            "unknown_precision": unknown.get("precision", 0.0),
+            "unknown_recall": unknown.get("recall", 0.0),
+        })
+    return out
+
+
+def timed_detect(engine, prompts, repeat):
+    lat = []
+    preds = []
+    for r in range(repeat):
+        for p in prompts:
+            start = time.perf_counter()
+            intent = engine.detect_intent(p)
+            lat.append((time.perf_counter() - start) * 1e6)
+            if r == 0:
+                preds.append(intent)
+    lat = np.array(lat)
+    start = time.perf_counter()
+    engine.score_intents(prompts)
+    batch_s = time.perf_counter() - start
+    return preds, {
+        "p50_us": float(np.percentile(lat, 50)),
+        "p95_us": float(np.percentile(lat, 95)),
+        "p99_us": float(np.percentile(lat, 99)),
+        "per_s": float(len(lat) / (lat.sum() / 1e6)),
+        "batch_per_s": float(len(prompts) / batch_s),
+    }
+
+
+def print_confusion(confusion):
+    intents = list(confusion)
+    short = {i: i[:6] for i in intents}
+    print("\n" + f"{'truth/pred':<24}" + "".join(f"{short[p]:>7}" for p in intents))
+    for t in intents:
+        row = "".join(f"{(confusion[t][p] or '.'):>7}" for p in intents)
+        print(f"{t:<24}{row}")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=os.path.join(DATA, "intent_eval.jsonl"))
+    parser.add_argument("--backend", default=os.environ.get("EMBED_BACKEND", "hash"),
+                        help="hash (default, offline) | onnx | cloudflare (needs a recorded fixture)")
+    parser.add_argument("--fixture", help="recorded .npz (default: per backend in benchmarks/data)")
+    parser.add_argument("--record", action="store_true", help="embed corpus + exemplars with the live backend")
+    parser.add_argument("--threshold", type=float, help="override the backend's threshold")
+    parser.add_argument("--sweep", default="0.2:0.8:0.025", help="start:stop:step")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="previous --out JSON to compare against")
+    parser.add_argument("--max-drop", type=float, default=0.01)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)  # IntentEngine's exemplar paths are repo-relative
+    prompts, labels = load_corpus(args.corpus)
+    if args.record:
+        record(args, prompts)
+        return
+
+    engine, backend = make_engine(args)
+    results = engine.score_intents(prompts)
+    for r in results:
+        # the top intent before the threshold, for the sweep
+        r["intent_raw"] = max(r["scores"], key=r["scores"].get) if r["tier"] == "embedding" else r["intent"]
+
+    preds, latency = timed_detect(engine, prompts, args.repeat)
+    accuracy, macro_f1, confusion, per_intent = classification_report(labels, preds)
+    start, stop, step = (float(x) for x in args.sweep.split(":"))
+    thresholds = sweep(results, labels, np.arange(start, stop + step / 2, step))
+    best = max(thresholds, key=lambda t: (t["accuracy"], t["macro_f1"]))
+
+    report = {
+        "commit": git_commit(),
+        "backend": backend.name,
+        "model": engine.model,
+        "fixture": getattr(backend, "path", None),
+        "corpus": os.path.relpath(args.corpus, ROOT),
+        "prompts": len(prompts),
+        "threshold": engine.threshold,
+        "accuracy": accuracy,
+        "macro_f1": macro_f1,
+        "tiers": dict(Counter(r["tier"] for r in results)),
+        "latency": latency,
+        "per_intent": per_intent,
+        "confusion": confusion,
+        "sweep": thresholds,
+        "best_threshold": best,
+        "errors": [
+            {"prompt": p, "expected": t, "got": g}
+            for p, t, g in zip(prompts, labels, preds) if t != g
+        ],
+    }
+
+    print(f"{backend.name} / {engine.model}: {len(prompts)} prompts, threshold {engine.threshold:.3f}")
+    print(f"accuracy {accuracy:.1%}  macro-F1 {macro_f1:.3f}  tiers {report['tiers']}")
+    print(f"detect_intent p50 {latency['p50_us']:.0f} us  p95 {latency['p95_us']:.0f} us  "
+          f"p99 {latency['p99_us']:.0f} us  {latency['per_s']:,.0f}/s  (batched {latency['batch_per_s']:,.0f}/s)")
+    print(f"\n{'intent':<24}{'prec':>7}{'recall':>7}{'f1':>7}{'n':>5}")
+    for intent, m in per_intent.items():
+        print(f"{intent:<24}{m['precision']:>7.2f}{m['recall']:>7.2f}{m['f1']:>7.2f}{m['support']:>5}")
+    print_confusion(confusion)
+    print(f"\n{'threshold':>10}{'acc':>8}{'macroF1':>9}{'unk P':>7}{'unk R':>7}")
+    for t in thresholds:
+        mark = "  <- current" if abs(t["threshold"] - engine.threshold) < step / 2 else ""
+        mark = mark or ("  <- best" if t is best else "")
+        print(f"{t['threshold']:>10.3f}{t['accuracy']:>8.1%}{t['macro_f1']:>9.3f}"
+              f"{t['unknown_precision']:>7.2f}{t['unknown_recall']:>7.2f}{mark}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            base = json.load(f)
+        drop = base["accuracy"] - accuracy
+        print(f"\nbaseline {base.get('commit')}: accuracy {base['accuracy']:.1%} -> {accuracy:.1%} "
+              f"({-drop:+.1%}), p50 {base['latency']['p50_us']:.0f} -> {latency['p50_us']:.0f} us")
+        regressed = defaultdict(float)
+        for intent, m in per_intent.items():
+            old = base["per_intent"].get(intent)
+            if old and m["f1"] < old["f1"] - 1e-9:
+                regressed[intent] = old["f1"] - m["f1"]
+        for intent, d in sorted(regressed.items(), key=lambda kv: -kv[1]):
+            print(f"  {intent}: F1 -{d:.2f}")
+        if drop > args.max_drop:
+            print(f"REGRESSION: accuracy dropped more than {args.max_drop:.1%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
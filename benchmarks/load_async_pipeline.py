@@ -0,0 +1,99 @@
+"""
+Concurrent throughput of the embed + LLM stages, blocking vs. async clients.
+
+"before" calls requests.post / the sync OpenAI client inside an async
+handler (what /chatbot used to do); "after" uses httpx.AsyncClient and
+AsyncOpenAI. Both run against local stub servers.
+
+    python benchmarks/load_async_pipeline.py --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import EmbeddingStub, LLMStub, fixed  # noqa: E402
+
+
+async def drive(handler, prompts, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(prompt):
+        async with sem:
+            start = time.perf_counter()
+            await handler(prompt)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in prompts))
+    elapsed = time.perf_counter() - start
+    lat = np.array(latencies) * 1000
+    return {
+        "rps": len(prompts) / elapsed,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--embed-ms", type=float, default=50)
+    parser.add_argument("--llm-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    embed = EmbeddingStub(fixed(args.embed_ms / 1000)).start()
+    llm = LLMStub(fixed(args.llm_ms / 1000)).start()
+
+    os.environ.update({
+        "CF_API_TOKEN": "bench",
+        "EMBED_BASE_URL": embed.base_url,
+        "EMBED_CACHE_PATH": "",
+        "GROQ_API_KEY": "bench",
+        "LLM_BASE_URL": llm.base_url,
+    })
+    from utils.intent_engine import IntentEngine
+    from utils.llm import ask_llm, ask_llm_async
+
+    engine = IntentEngine()
+
+    async def blocking_handler(prompt):
+        engine.score_intent(prompt)
+        ask_llm(prompt)
+
+    async def async_handler(prompt):
+        await engine.ascore_intent(prompt)
+        await ask_llm_async(prompt)
+
+    def prompts(tag):
+        # long + unique so neither the lexical tier nor the cache answers
+        return [f"please show me the {tag} spending report number {i}" for i in range(args.requests)]
+
+    before = asyncio.run(drive(blocking_handler, prompts("before"), args.concurrency))
+
+    async def run_after():
+        try:
+            return await drive(async_handler, prompts("after"), args.concurrency)
+        finally:
+            await engine.aclose()
+
+    after = asyncio.run(run_after())
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, "
+          f"embed {args.embed_ms:.0f}ms, llm {args.llm_ms:.0f}ms")
+    for name, r in (("blocking", before), ("async", after)):
+        print(f"{name:>9}: {r['rps']:7.1f} req/s  p50 {r['p50_ms']:7.1f}ms  p99 {r['p99_ms']:7.1f}ms")
+
+    embed.stop()
+    llm.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,465 @@
+"""
+End-to-end load test of the chat routes with every external dependency
+replaced locally, so /chatbot can be profiled without Firebase, Cloudflare
+or Groq:
+
+  Firestore     benchmarks.fake_firestore (in memory, --fs-ms per RPC),
+                seeded with --users synthetic users, --txns transactions each
+                over --days (plus rollups and rollup_ready with --rollups)
+  auth          FakeTokenVerifier: "Bearer perf:<uid>" is a valid token
+  embeddings    EmbeddingStub answering with a HashedNgramBackend prepared
+                on INTENT_MAP, so intents classify as they would for real
+  LLM           LLMStub (OpenAI-compatible, streaming too)
+
+Stub latencies are lognormal (--embed-ms/--embed-sigma, --llm-ms/--llm-sigma,
+--fs-ms/--fs-sigma). The app runs in a child process (one uvicorn worker,
+the container overridden with the fakes); the driver here sends a weighted
+prompt mix from benchmarks/data/intent_eval.jsonl, closed loop with
+--concurrency workers or open loop at --rps, and reports throughput,
+latency p50/p95/p99, status counts and per-stage p50/p95/p99 parsed from
+Server-Timing, plus how often each critical path occurred.
+
+    python benchmarks/perf_env.py --users 200 --txns 500 --concurrency 32 --duration 30
+    python benchmarks/perf_env.py --route /chatbot/stream --rps 40 --llm-ms 400 --token-ms 20
+    python benchmarks/perf_env.py --mix expense_analysis=3,savings_advice=1 --rollups --out run.json
+    python benchmarks/perf_env.py up --port 8000    # stubs + app only, for another driver
+
+Each prompt gets a "#<n>" suffix so the embedding and response caches miss
+(--no-nonce measures the cached path). App settings pass through the
+environment as usual (TXN_TYPE_INDEX, EMBED_BATCH_WINDOW_MS, ...).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_firestore import FakeFirestore  # noqa: E402
+from benchmarks.startup_probe import free_port, get  # noqa: E402
+from benchmarks.stubs import EmbeddingStub, LLMStub, fixed, lognormal  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(ROOT, "benchmarks", "data", "intent_eval.jsonl")
+CATEGORIES = ["Food", "Rent", "Travel", "Shopping", "Bills", "Health", "Salary", "Freelance"]
+GOALS = ["Buy a house", "Retire early", "Emergency fund", "Pay off loans", "Travel"]
+RISK_LEVELS = ["low", "medium", "high"]
+_TIMING = re.compile(r'([\w-]+);(?:dur=([\d.]+)|desc="([^"]*)")')
+
+
+def latency(ms, sigma):
+    return lognormal(ms / 1000, sigma) if ms > 0 else fixed(0.0)
+
+
+def uid_for(i):
+    return f"perf-{i:05d}"
+
+
+def hash_backend():
+    # the same prepared backend in the stub and the app -> same vector space
+    from utils.embed_backends import HashedNgramBackend
+    from utils.intents import INTENT_MAP
+
+    backend = HashedNgramBackend()
+    backend.prepare(p for samples in INTENT_MAP.values() for p in samples)
+    return backend
+
+
+# ---------------------------
+# App side (child process)
+# ---------------------------
+class _FakeCerts:
+    url = "fake"
+
+    def refresh(self, force: bool = False) -> bool:
+        return True
+
+    def start(self):
+        return self
+
+    def stop(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class FakeTokenVerifier:
+    """TokenVerifier's surface without crypto: "perf:<uid>" tokens are valid."""
+
+    def __init__(self, ttl: int = 3600):
+        self.ttl = ttl
+        self.certs = _FakeCerts()
+        self.verified = 0
+
+    def cached(self, token: str):
+        if not isinstance(token, str) or not token.startswith("perf:") or len(token) <= 5:
+            return None
+        return {"uid": token[5:], "sub": token[5:], "exp": time.time() + self.ttl}
+
+    def verify(self, token: str) -> dict:
+        from auth.token_cache import InvalidTokenError
+
+        claims = self.cached(token)
+        if claims is None:
+            raise InvalidTokenError("not a perf token")
+        self.verified += 1
+        return claims
+
+    def stats(self) -> dict:
+        return {"verified": self.verified, "certs": self.certs.stats()}
+
+
+async def seed_users(db, users, txns, days, rollups, seed=0):
+    from utils.txn_rollup import ROLLUP_COLLECTION, ROLLUP_READY_FIELD, aggregate
+
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    for i in range(users):
+        user_ref = db.collection("users").document(uid_for(i))
+        col = user_ref.collection("transactions")
+        batch = db.batch()
+        rows = []
+        for j in range(txns):
+            income = rng.random() < 0.15
+            row = {
+                "type": "income" if income else "expense",
+                "category": rng.choice(CATEGORIES[6:] if income else CATEGORIES[:6]),
+                "amount": round(rng.uniform(50, 5000), 2),
+                "timestamp": now - timedelta(seconds=rng.uniform(0, days * 86400)),
+                "description": f"UPI/{rng.getrandbits(40):010x}",
+                "source": "sms",
+            }
+            rows.append(row)
+            batch.set(col.document(f"t{j:06d}"), row)
+        profile = {
+            "budget": rng.choice([20000, 35000, 50000, 80000]),
+            "goal": rng.choice(GOALS),
+            "risk_level": rng.choice(RISK_LEVELS),
+        }
+        if rollups:
+            for key, doc in aggregate(rows).items():
+                batch.set(user_ref.collection(ROLLUP_COLLECTION).document(key), doc)
+            profile[ROLLUP_READY_FIELD] = True
+        batch.set(user_ref, profile)
+        await batch.commit()
+
+
+def make_intent_engine(workdir):
+    from utils.embed_backends import CloudflareBackend
+    from utils.exemplar_store import save_exemplars
+    from utils.intent_engine import IntentEngine
+    from utils.intents import INTENT_MAP
+
+    hashed = hash_backend()
+    raw = {i: [v.tolist() for v in hashed.embed(s)] for i, s in INTENT_MAP.items() if s}
+    save_exemplars(raw, os.path.join(workdir, "intent_embs"), hashed.model)
+    # the real remote path (batcher, cache, upstream client) against the stub
+    os.environ["EMBED_MODEL"] = hashed.model
+    backend = CloudflareBackend.from_env()
+    backend.threshold = hashed.threshold
+    return IntentEngine(emb_path=os.path.join(workdir, "intent_embs.json"), backend=backend)
+
+
+def serve(args):
+    import uvicorn
+
+    os.chdir(ROOT)
+    from container import container
+    from main import app
+    from utils import metrics
+
+    db = FakeFirestore()
+    start = time.perf_counter()
+    asyncio.run(seed_users(db, args.users, args.txns, args.days, args.rollups, args.seed))
+    print(f"seeded {args.users} users x {args.txns} transactions in {time.perf_counter() - start:.1f}s",
+          file=sys.stderr, flush=True)
+    db.latency = latency(args.fs_ms, args.fs_sigma)
+
+    workdir = tempfile.mkdtemp(prefix="perf_env-")
+    container.override(db=db, token_verifier=FakeTokenVerifier(), intent_engine=make_intent_engine(workdir))
+    metrics.REGISTRY.add_collector(lambda: {"fake_firestore": db.stats()})
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# ---------------------------
+# Driver side
+# ---------------------------
+def start_env(args):
+    hashed = hash_backend()
+    embed = EmbeddingStub(latency(args.embed_ms, args.embed_sigma), embed_fn=hashed.embed).start()
+    llm = LLMStub(latency(args.llm_ms, args.llm_sigma), token_delay=args.token_ms / 1000).start()
+
+    port = args.port or free_port()
+    env = dict(
+        os.environ,
+        GROQ_API_KEY="bench",
+        LLM_BASE_URL=llm.base_url,
+        CF_API_TOKEN="bench",
+        EMBED_BASE_URL=embed.base_url,
+        EMBED_CACHE_PATH="",
+        RESPONSE_CACHE_PATH="",
+    )
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "serve", "--port", str(port),
+        "--users", str(args.users), "--txns", str(args.txns), "--days", str(args.days),
+        "--fs-ms", str(args.fs_ms), "--fs-sigma", str(args.fs_sigma), "--seed", str(args.seed),
+    ] + (["--rollups"] if args.rollups else [])
+    log = tempfile.NamedTemporaryFile(prefix="perf_env-", suffix=".log", delete=False)
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.ready_timeout
+    while get(f"{base}/ready") != 200:
+        if proc.poll() is not None or time.monotonic() > deadline:
+            proc.kill()
+            with open(log.name) as f:
+                sys.exit(f"app did not become ready (log {log.name}):\n{f.read()[-3000:]}")
+        time.sleep(0.2)
+    return base, proc, embed, llm, log.name
+
+
+def load_prompts(mix):
+    by_intent = defaultdict(list)
+    with open(CORPUS, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                by_intent[row["intent"]].append(row["prompt"])
+    if mix:
+        weights = {}
+        for part in mix.split(","):
+            name, _, w = part.partition("=")
+            if name not in by_intent:
+                sys.exit(f"unknown intent {name!r} in --mix (have {', '.join(sorted(by_intent))})")
+            weights[name] = float(w or 1)
+    else:
+        weights = {name: 1.0 for name in by_intent}
+    intents = list(weights)
+    return by_intent, intents, [weights[i] for i in intents]
+
+
+def parse_server_timing(value):
+    stages, critical = {}, None
+    for name, dur, desc in _TIMING.findall(value or ""):
+        if name == "critical":
+            critical = desc
+        elif dur:
+            stages[name] = float(dur)
+    return stages, critical
+
+
+async def one_request(client, args, prompt, uid):
+    headers = {"Authorization": f"Bearer perf:{uid}"}
+    start = time.perf_counter()
+    ttft = None
+    try:
+        if args.route == "/chatbot/stream":
+            async with client.stream("POST", args.route, json={"prompt": prompt}, headers=headers) as resp:
+                async for line in resp.aiter_lines():
+                    if ttft is None and line.startswith("event: token"):
+                        ttft = (time.perf_counter() - start) * 1000
+        else:
+            resp = await client.post(args.route, json={"prompt": prompt}, headers=headers)
+        status = resp.status_code
+        timing = resp.headers.get("server-timing")
+    except Exception as e:
+        status, timing = type(e).__name__, None
+    stages, critical = parse_server_timing(timing)
+    return {
+        "status": status,
+        "ms": (time.perf_counter() - start) * 1000,
+        "ttft_ms": ttft,
+        "stages": stages,
+        "critical": critical,
+    }
+
+
+async def drive(base, args):
+    import httpx
+
+    by_intent, intents, weights = load_prompts(args.mix)
+    rng = random.Random(args.seed)
+    results = []
+    counter = iter(range(10 ** 12))
+
+    def next_request():
+        intent = rng.choices(intents, weights)[0]
+        prompt = rng.choice(by_intent[intent])
+        n = next(counter)
+        if not args.no_nonce:
+            prompt = f"{prompt} #{n}"
+        return prompt, uid_for(rng.randrange(args.users))
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=max(args.concurrency, 100))
+    async with httpx.AsyncClient(base_url=base, timeout=args.timeout, limits=limits) as client:
+        for _ in range(args.warmup):
+            await one_request(client, args, *next_request())
+
+        inflight = [0]
+        start = time.perf_counter()
+        deadline = start + args.duration
+
+        def more():
+            return time.perf_counter() < deadline and (not args.requests or len(results) + inflight[0] < args.requests)
+
+        if args.rps:
+            # open loop: Poisson arrivals, independent of how fast the app answers
+            tasks = set()
+            next_at = start
+            while more():
+                next_at += rng.expovariate(args.rps)
+                await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+                inflight[0] += 1
+
+                async def fire(prompt, uid):
+                    results.append(await one_request(client, args, prompt, uid))
+                    inflight[0] -= 1
+
+                task = asyncio.ensure_future(fire(*next_request()))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        else:
+            async def worker():
+                while more():
+                    inflight[0] += 1
+                    results.append(await one_request(client, args, *next_request()))
+                    inflight[0] -= 1
+
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+        metrics_text = None
+        if args.metrics:
+            metrics_text = (await client.get("/metrics")).text
+    return results, elapsed, metrics_text
+
+
+def pct(values):
+    a = np.asarray(values, dtype=float)
+    return {
+        "n": int(a.size),
+        "p50": float(np.percentile(a, 50)),
+        "p95": float(np.percentile(a, 95)),
+        "p99": float(np.percentile(a, 99)),
+        "mean": float(a.mean()),
+        "max": float(a.max()),
+    }
+
+
+def report(results, elapsed, args):
+    ok = [r for r in results if r["status"] == 200]
+    stages = defaultdict(list)
+    for r in ok:
+        for name, ms in r["stages"].items():
+            stages[name].append(ms)
+    ttft = [r["ttft_ms"] for r in ok if r["ttft_ms"] is not None]
+    return {
+        "route": args.route,
+        "requests": len(results),
+        "seconds": elapsed,
+        "rps": len(results) / elapsed if elapsed else 0.0,
+        "ok_rps": len(ok) / elapsed if elapsed else 0.0,
+        "status": dict(Counter(str(r["status"]) for r in results)),
+        "latency_ms": pct([r["ms"] for r in ok]) if ok else None,
+        "ttft_ms": pct(ttft) if ttft else None,
+        "stages_ms": {name: pct(v) for name, v in stages.items()},
+        "critical_paths": dict(Counter(r["critical"] for r in ok if r["critical"]).most_common()),
+        "config": {k: v for k, v in vars(args).items() if k != "mode"},
+    }
+
+
+def print_report(rep, embed, llm):
+    print(f"\n{rep['route']}: {rep['requests']} requests in {rep['seconds']:.1f}s, "
+          f"{rep['rps']:.1f} req/s ({rep['ok_rps']:.1f} ok/s), status {rep['status']}")
+    print(f"\n{'':<16}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'mean':>9}   ms")
+    rows = [("end-to-end", rep["latency_ms"]), ("ttft", rep["ttft_ms"])]
+    rows += [(f"  {name}", p) for name, p in sorted(rep["stages_ms"].items(), key=lambda kv: -kv[1]["p50"])]
+    for name, p in rows:
+        if p:
+            print(f"{name:<16}{p['n']:>7}{p['p50']:>9.1f}{p['p95']:>9.1f}{p['p99']:>9.1f}{p['mean']:>9.1f}")
+    total = sum(rep["critical_paths"].values()) or 1
+    print("\ncritical path")
+    for path, n in list(rep["critical_paths"].items())[:8]:
+        print(f"  {n / total:>6.1%}  {path}")
+    batches = embed.batch_sizes
+    print(f"\nstubs: embed {embed.requests} calls (mean batch {np.mean(batches) if batches else 0:.2f}), "
+          f"llm {llm.requests} calls")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mode", nargs="?", default="load", choices=["load", "up", "serve"],
+                        help="load (default): env + driver; up: env only; serve: the app process")
+    parser.add_argument("--port", type=int, default=0)
+    # synthetic data
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--txns", type=int, default=300, help="transactions per user")
+    parser.add_argument("--days", type=int, default=365, help="history the transactions span")
+    parser.add_argument("--rollups", action="store_true", help="seed rollups and set rollup_ready")
+    parser.add_argument("--seed", type=int, default=0)
+    # dependency latencies (lognormal median ms, sigma)
+    parser.add_argument("--fs-ms", type=float, default=5)
+    parser.add_argument("--fs-sigma", type=float, default=0.4)
+    parser.add_argument("--embed-ms", type=float, default=60)
+    parser.add_argument("--embed-sigma", type=float, default=0.5)
+    parser.add_argument("--llm-ms", type=float, default=300, help="time to first token")
+    parser.add_argument("--llm-sigma", type=float, default=0.5)
+    parser.add_argument("--token-ms", type=float, default=0, help="delay between streamed words")
+    # load shape
+    parser.add_argument("--route", default="/chatbot", choices=["/chatbot", "/chatbot/stream"])
+    parser.add_argument("--concurrency", type=int, default=16, help="closed-loop workers")
+    parser.add_argument("--rps", type=float, default=0, help="open-loop arrival rate instead")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many instead")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--mix", help="intent=weight,... over the eval corpus (default: uniform)")
+    parser.add_argument("--no-nonce", action="store_true", help="repeat prompts verbatim (cache hits)")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--ready-timeout", type=float, default=120)
+    parser.add_argument("--metrics", action="store_true", help="print the app's /metrics at the end")
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        serve(args)
+        return
+
+    base, proc, embed, llm, log = start_env(args)
+    try:
+        if args.mode == "up":
+            print(f"app on {base} (log {log}); Authorization: Bearer perf:{uid_for(0)} .. "
+                  f"perf:{uid_for(args.users - 1)}; Ctrl-C to stop")
+            proc.wait()
+            return
+        results, elapsed, metrics_text = asyncio.run(drive(base, args))
+        rep = report(results, elapsed, args)
+        print_report(rep, embed, llm)
+        if metrics_text:
+            print("\n" + metrics_text)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(rep, f, indent=2)
+            print(f"\nwrote {args.out}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        embed.stop()
+        llm.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Cold start of one uvicorn worker: time until it accepts connections, time
+until /ready says 200 (when the route exists) and the worker's RSS once
+ready. Runs against fake credentials and local stubs, so nothing leaves
+the machine.
+
+    python benchmarks/startup_probe.py [--repo PATH] [--runs 3]
+
+--repo points at another checkout (e.g. a git worktree of an older commit)
+to compare before/after with the same driver.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import CertStub, EmbeddingStub, LLMStub  # noqa: E402
+
+
+def fake_service_account():
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    return json.dumps({
+        "type": "service_account", "project_id": "bench", "private_key_id": "bench",
+        "private_key": pem, "client_email": "bench@bench.iam.gserviceaccount.com",
+        "client_id": "1", "token_uri": "https://oauth2.googleapis.com/token",
+    })
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def one_run(repo, env, timeout=60.0):
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=repo, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    accept = ready = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+            if accept is None and get(base + "/") == 200:
+                accept = time.perf_counter() - start
+            if accept is not None:
+                status = get(base + "/ready")
+                if status == 200:
+                    ready = time.perf_counter() - start
+                    break
+                if status == 404:  # no readiness probe in this tree
+                    break
+            time.sleep(0.01)
+        time.sleep(0.2)
+        return accept, ready, rss_mb(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repo", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    certs = CertStub(project_id="bench").start()
+    embed = EmbeddingStub().start()
+    llm = LLMStub().start()
+    env = dict(
+        os.environ,
+        FIREBASE_CREDENTIALS=fake_service_account(),
+        FIREBASE_CERTS_URL=certs.base_url,
+        CF_API_TOKEN="bench",
+        EMBED_BASE_URL=embed.base_url,
+        EMBED_CACHE_PATH="",
+        RESPONSE_CACHE_PATH="",
+        GROQ_API_KEY="bench",
+        LLM_BASE_URL=llm.base_url,
+    )
+
+    runs = [one_run(args.repo, env) for _ in range(args.runs)]
+    accept = np.median([r[0] for r in runs]) * 1000
+    readies = [r[1] for r in runs if r[1] is not None]
+    rss = np.median([r[2] for r in runs])
+    ready = f"{np.median(readies) * 1000:7.0f} ms" if readies else "    n/a"
+    print(f"{args.repo}: accepting {accept:7.0f} ms   ready {ready}   RSS {rss:6.1f} MB  "
+          f"(median of {args.runs})")
+
+    for stub in (certs, embed, llm):
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
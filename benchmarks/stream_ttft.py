@@ -0,0 +1,56 @@
+"""
+Time-to-first-token of ask_llm_stream vs. time-to-answer of ask_llm_async,
+against the local OpenAI-compatible stub.
+
+    python benchmarks/stream_ttft.py --first-token-ms 150 --token-ms 20 --words 80
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import LLMStub, fixed  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--first-token-ms", type=float, default=150)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--words", type=int, default=80)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    reply = " ".join(f"word{i}" for i in range(args.words))
+    stub = LLMStub(fixed(args.first_token_ms / 1000), reply=reply, token_delay=args.token_ms / 1000).start()
+    os.environ.update({"GROQ_API_KEY": "bench", "LLM_BASE_URL": stub.base_url})
+    from utils import llm
+
+    async def run():
+        full = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            text = await llm.ask_llm_async("prompt")
+            full.append((time.perf_counter() - start) * 1000)
+            assert text == reply
+
+        streamed = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            parts = [d async for d in llm.ask_llm_stream("prompt")]
+            streamed.append((time.perf_counter() - start) * 1000)
+            assert "".join(parts) == reply
+        return full, streamed
+
+    full, streamed = asyncio.run(run())
+    ttft = llm.ttft.summary()
+    print(f"non-streaming time to answer : p50 {sorted(full)[len(full) // 2]:7.1f}ms")
+    print(f"streaming time to first token: p50 {ttft['p50_ms']:7.1f}ms  p99 {ttft['p99_ms']:7.1f}ms")
+    print(f"streaming time to last token : p50 {sorted(streamed)[len(streamed) // 2]:7.1f}ms")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
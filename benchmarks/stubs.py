@@ -0,0 +1,259 @@
+"""
+Local stand-ins for the external HTTP dependencies, used by the benchmarks.
+
+    embedding stub : POST /<model>            -> Workers AI shape {"result": {"data": [[...]]}}
+    llm stub       : POST /chat/completions   -> OpenAI-compatible chat completion
+    cert stub      : GET  /                   -> securetoken-style {kid: x509 PEM}, plus
+                                                 minting of Firebase-shaped ID tokens
+
+Each stub runs a ThreadingHTTPServer on 127.0.0.1 in a daemon thread and
+sleeps for latency() seconds per request; failures and stalls can be
+injected per stub.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+def fixed(seconds):
+    return lambda: seconds
+
+
+def lognormal(median, sigma=0.5):
+    # long right tail, like real upstreams
+    return lambda: random.lognormvariate(np.log(median), sigma)
+
+
+def fake_embedding(text, dim=1024):
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stub = None  # set per server class
+
+    def log_message(self, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle(self):
+        # clients that gave up (timeouts, losing hedges) close the socket early
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self):
+        self._serve(None)
+
+    def do_POST(self):
+        self._serve(self._read_json())
+
+    def _serve(self, payload):
+        self.stub.requests += 1
+        fault = random.random()
+        if fault < self.stub.fail_rate:
+            self.stub.faults += 1
+            self._send_json({"error": "injected failure"}, status=503)
+            return
+        if fault < self.stub.fail_rate + self.stub.hang_rate:
+            self.stub.faults += 1
+            time.sleep(self.stub.hang_seconds)
+        time.sleep(self.stub.latency())
+        self.stub.handle(self, payload)
+
+
+class Stub:
+    """
+    Fault injection: fail_rate of requests get a 503, hang_rate of them
+    stall for hang_seconds before answering.
+    """
+
+    def __init__(self, latency=fixed(0.0), fail_rate=0.0, hang_rate=0.0, hang_seconds=5.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.requests = 0
+        self.faults = 0
+        self.server = None
+
+    def handle(self, handler, payload):
+        raise NotImplementedError
+
+    def start(self):
+        handler = type("Handler", (_StubHandler,), {"stub": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+class EmbeddingStub(Stub):
+    """
+    Vectors come from embed_fn(texts) when given (e.g. a prepared
+    HashedNgramBackend.embed, so intents classify for real), otherwise
+    fake_embedding per text.
+    """
+
+    def __init__(self, latency=fixed(0.0), dim=1024, embed_fn=None, **faults):
+        super().__init__(latency, **faults)
+        self.dim = dim
+        self.embed_fn = embed_fn
+        self.batch_sizes = []
+
+    def handle(self, handler, payload):
+        texts = payload.get("text")
+        texts = [texts] if isinstance(texts, str) else list(texts or [])
+        self.batch_sizes.append(len(texts))
+        if self.embed_fn is not None:
+            data = [np.asarray(v).tolist() for v in self.embed_fn(texts)]
+        else:
+            data = [fake_embedding(t, self.dim).tolist() for t in texts]
+        dim = len(data[0]) if data else self.dim
+        handler._send_json({"success": True, "result": {"shape": [len(data), dim], "data": data}})
+
+
+class LLMStub(Stub):
+    """
+    latency() is the time to the first token; with stream=true the reply is
+    sent word by word as SSE chunks, token_delay seconds apart.
+    """
+
+    def __init__(self, latency=fixed(0.0), reply="Here is a summary of your finances.", token_delay=0.0,
+                 **faults):
+        super().__init__(latency, **faults)
+        self.reply = reply
+        self.token_delay = token_delay
+
+    def handle(self, handler, payload):
+        if payload.get("stream"):
+            self._stream(handler, payload)
+            return
+        # a non-streaming reply still takes the whole generation time
+        time.sleep(self.token_delay * (len(self.reply.split(" ")) - 1))
+        handler._send_json({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    def _stream(self, handler, payload):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def send(data):
+            body = f"data: {data}\n\n".encode("utf-8")
+            handler.wfile.write(f"{len(body):x}\r\n".encode() + body + b"\r\n")
+            handler.wfile.flush()
+
+        words = self.reply.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_delay)
+            send(json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else " " + word},
+                    "finish_reason": None,
+                }],
+            }))
+        send("[DONE]")
+        handler.wfile.write(b"0\r\n\r\n")
+        handler.wfile.flush()
+
+
+class CertStub(Stub):
+    """
+    Serves one self-signed RSA cert in Google's securetoken format and mints
+    ID tokens signed with its key, so TokenVerifier runs for real offline.
+    """
+
+    def __init__(self, latency=fixed(0.0), project_id="bench", max_age=3600, kid="bench-key", **faults):
+        super().__init__(latency, **faults)
+        import datetime as _dt
+
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.x509.oid import NameOID
+        from google.auth import crypt
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "bench")])
+        now = _dt.datetime.now(_dt.timezone.utc)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(1)
+            .not_valid_before(now - _dt.timedelta(days=1))
+            .not_valid_after(now + _dt.timedelta(days=1))
+            .sign(key, hashes.SHA256())
+        )
+        pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        self.project_id = project_id
+        self.max_age = max_age
+        self.kid = kid
+        self.certs = {kid: cert.public_bytes(serialization.Encoding.PEM).decode()}
+        self.signer = crypt.RSASigner.from_string(pem, key_id=kid)
+
+    def handle(self, handler, payload):
+        handler._send_json(self.certs, headers={"Cache-Control": f"public, max-age={self.max_age}"})
+
+    def mint(self, uid, ttl=3600):
+        from google.auth import jwt
+
+        now = int(time.time())
+        return jwt.encode(self.signer, {
+            "iss": f"https://securetoken.google.com/{self.project_id}",
+            "aud": self.project_id,
+            "auth_time": now,
+            "iat": now,
+            "exp": now + ttl,
+            "sub": uid,
+        }).decode()
@@ -0,0 +1,93 @@
+"""
+Firebase ID-token verification: verify every request vs. the exp-bounded
+token cache, with tokens minted locally and certs served by a local stub.
+
+  steady state : N requests spread over a pool of user sessions (tokens)
+  cold start   : first request with the certs fetched inline vs. prefetched
+
+    python benchmarks/token_verify.py --requests 5000 --users 50 --cert-ms 150
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.token_cache import CertCache, InvalidTokenError, TokenVerifier  # noqa: E402
+from benchmarks.stubs import CertStub, fixed  # noqa: E402
+from utils.kv_store import MemoryLRU  # noqa: E402
+
+
+def drive(verifier, tokens):
+    lat = []
+    for token in tokens:
+        start = time.perf_counter()
+        verifier.verify(token)
+        lat.append((time.perf_counter() - start) * 1e6)
+    lat = np.array(lat)
+    return float(lat.mean()), float(np.percentile(lat, 50)), float(np.percentile(lat, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--cert-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    stub = CertStub(fixed(args.cert_ms / 1000)).start()
+    sessions = [stub.mint(f"user-{i}") for i in range(args.users)]
+    rng = random.Random(0)
+    tokens = [rng.choice(sessions) for _ in range(args.requests)]
+
+    def verifier(cached):
+        certs = CertCache(stub.base_url)
+        return TokenVerifier(stub.project_id, certs, cache=MemoryLRU(10000) if cached else None)
+
+    # cold start: the first request pays the cert download unless prefetched
+    cold = verifier(False)
+    start = time.perf_counter()
+    cold.verify(sessions[0])
+    inline_ms = (time.perf_counter() - start) * 1000
+
+    warm = verifier(False)
+    warm.certs.start()
+    while not warm.certs.stats()["keys"]:
+        time.sleep(0.01)
+    start = time.perf_counter()
+    warm.verify(sessions[0])
+    prefetched_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{args.requests} requests over {args.users} sessions, cert endpoint {args.cert_ms:.0f}ms")
+    print(f"first request: certs inline {inline_ms:7.1f} ms   prefetched {prefetched_ms:7.2f} ms")
+
+    uncached = drive(warm, tokens)
+    cached_verifier = verifier(True)
+    cached_verifier.certs.refresh(force=True)
+    cached = drive(cached_verifier, tokens)
+    for name, (mean, p50, p99) in (("verify", uncached), ("cached", cached)):
+        print(f"{name:>7}: mean {mean:8.1f} us  p50 {p50:8.1f} us  p99 {p99:8.1f} us")
+    print(f"speedup {uncached[0] / cached[0]:.0f}x, {cached_verifier.verified} signature checks "
+          f"for {args.requests} requests")
+
+    try:
+        cached_verifier.verify(sessions[0][:-4] + "AAAA")
+        print("tampered token ACCEPTED")
+    except InvalidTokenError:
+        print("tampered token rejected")
+    try:
+        cached_verifier.verify(stub.mint("late", ttl=-120))
+        print("expired token ACCEPTED")
+    except InvalidTokenError:
+        print("expired token rejected")
+
+    warm.certs.stop()
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
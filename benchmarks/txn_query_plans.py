@@ -0,0 +1,136 @@
+"""
+Transaction fetch plans against the Firestore emulator: documents read,
+approximate bytes transferred and latency per intent.
+
+  legacy    timestamp filter only, whole documents, types dropped in Python
+  project   TransactionRepository, select() projection, index-free
+  pushdown  TransactionRepository with the type filter in Firestore
+            (TXN_TYPE_INDEX=1; needs firestore.indexes.json in production,
+            the emulator does not enforce indexes)
+
+Also checks that every plan returns the same rows.
+
+    firebase emulators:start --only firestore      # or gcloud beta emulators firestore start
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python benchmarks/txn_query_plans.py --txns 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.txn_repository import TransactionRepository, doc_size, txn_row  # noqa: E402
+
+# (intent, window days, types) as routes/chatbot.py asks for them
+CASES = [
+    ("expense_query 30d", 30, ("expense",)),
+    ("expense_query 7d", 7, ("expense",)),
+    ("savings_advice 90d", 90, ("income", "expense")),
+    ("expense_analysis 365d", 365, ("expense",)),
+]
+CATEGORIES = ["Food", "Rent", "Travel", "Shopping", "Bills", "Health", "Salary", "Freelance"]
+
+
+async def seed(db, uid, n, days, income_share):
+    rng = random.Random(0)
+    now = datetime.now(timezone.utc)
+    col = db.collection("users").document(uid).collection("transactions")
+    batch, ops = db.batch(), 0
+    for i in range(n):
+        income = rng.random() < income_share
+        batch.set(col.document(f"t{i:06d}"), {
+            "type": "income" if income else "expense",
+            "category": rng.choice(CATEGORIES[6:] if income else CATEGORIES[:6]),
+            "amount": round(rng.uniform(50, 5000), 2),
+            "timestamp": now - timedelta(seconds=rng.uniform(0, days * 86400)),
+            # what real documents carry besides the four fields we use
+            "description": "UPI/" + "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(24)),
+            "merchant": rng.choice(["Swiggy", "Zomato", "Amazon", "Uber", "BigBasket", "IRCTC"]),
+            "source": "sms",
+            "created_at": now,
+        })
+        ops += 1
+        if ops == 500:
+            await batch.commit()
+            batch, ops = db.batch(), 0
+    if ops:
+        await batch.commit()
+
+
+async def legacy(db, uid, since, types, stats):
+    # the pre-repository fetch from routes/chatbot.py
+    col = db.collection("users").document(uid).collection("transactions")
+    rows = []
+    async for doc in col.where("timestamp", ">=", since).stream():
+        data = doc.to_dict() or {}
+        stats["docs"] = stats.get("docs", 0) + 1
+        stats["bytes"] = stats.get("bytes", 0) + doc_size(doc.reference.path, data)
+        if data.get("type") in types:
+            rows.append(txn_row(data))
+    return rows
+
+
+async def run(args):
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import firestore
+
+    db = firestore.AsyncClient(project="bench", credentials=AnonymousCredentials())
+    uid = f"bench-{int(time.time())}"
+    start = time.perf_counter()
+    await seed(db, uid, args.txns, args.days, args.income_share)
+    print(f"seeded {args.txns} transactions over {args.days} days in {time.perf_counter() - start:.1f}s "
+          f"(page size {args.page_size}, prefetch {args.prefetch})\n")
+
+    plans = {
+        "legacy": lambda since, types, st: legacy(db, uid, since, types, st),
+        "project": TransactionRepository(db, False, args.page_size, args.prefetch),
+        "pushdown": TransactionRepository(db, True, args.page_size, args.prefetch),
+    }
+    now = datetime.now(timezone.utc)
+    print(f"{'intent':<22}{'plan':<10}{'rows':>7}{'docs':>7}{'KiB':>9}{'ms p50':>9}")
+    for name, days, types in CASES:
+        since = now - timedelta(days=days)
+        baseline = None
+        for plan, impl in plans.items():
+            times, stats = [], {}
+            for i in range(args.repeat):
+                st = {}
+                t0 = time.perf_counter()
+                if plan == "legacy":
+                    rows = await impl(since, types, st)
+                else:
+                    rows = await impl.window(uid, since, None, types, stats=st)
+                times.append((time.perf_counter() - t0) * 1000)
+                stats = st
+            key = sorted((r["timestamp"], r["amount"]) for r in rows)
+            if baseline is None:
+                baseline = key
+            elif key != baseline:
+                print(f"  !! {plan} returned different rows than legacy")
+            times.sort()
+            print(f"{name:<22}{plan:<10}{len(rows):>7}{stats.get('docs', 0):>7}"
+                  f"{stats.get('bytes', 0) / 1024:>9.1f}{times[len(times) // 2]:>9.1f}")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--txns", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--income-share", type=float, default=0.15)
+    parser.add_argument("--page-size", type=int, default=300)
+    parser.add_argument("--prefetch", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("set FIRESTORE_EMULATOR_HOST (e.g. localhost:8080) to a running Firestore emulator")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Embedding calls against a fault-injecting stub: bare httpx vs. the
+Upstream policy (pooling, jittered retries, hedging, circuit breaker).
+
+    python benchmarks/upstream_faults.py --fail-rate 0.1 --hang-rate 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import EmbeddingStub, fixed  # noqa: E402
+from utils.http_client import CircuitOpenError, Upstream  # noqa: E402
+
+
+async def run(call, n, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    lat, ok, fast_fail = [], 0, 0
+
+    async def one(i):
+        nonlocal ok, fast_fail
+        async with sem:
+            start = time.perf_counter()
+            try:
+                await call(i)
+                ok += 1
+            except CircuitOpenError:
+                fast_fail += 1
+            except Exception:
+                pass
+            lat.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - start
+    lat = np.array(lat)
+    return {
+        "ok": ok / n,
+        "fast_fail": fast_fail,
+        "p50": float(np.percentile(lat, 50)),
+        "p99": float(np.percentile(lat, 99)),
+        "rps": n / elapsed,
+    }
+
+
+def report(name, r, extra=""):
+    print(f"{name:>10}: success {r['ok']:6.1%}  fast-fail {r['fast_fail']:4d}  "
+          f"p50 {r['p50']:7.1f}ms  p99 {r['p99']:7.1f}ms  {r['rps']:6.1f} req/s {extra}")
+
+
+async def main(args):
+    stub = EmbeddingStub(fixed(args.latency_ms / 1000), dim=32, fail_rate=args.fail_rate,
+                         hang_rate=args.hang_rate, hang_seconds=args.hang_s).start()
+    url = f"{stub.base_url}/model"
+
+    async with httpx.AsyncClient(timeout=args.timeout) as bare:
+        async def bare_call(i):
+            resp = await bare.post(url, json={"text": [f"q{i}"]})
+            resp.raise_for_status()
+
+        report("bare", await run(bare_call, args.requests, args.concurrency))
+
+    up = Upstream("embed", timeout=args.timeout, retries=2, hedge_after=args.hedge_ms / 1000)
+
+    async def policy_call(i):
+        await up.post_json(url, json={"text": [f"q{i}"]})
+
+    report("upstream", await run(policy_call, args.requests, args.concurrency), str(up.stats()))
+
+    # dead upstream: the breaker opens and later calls fail fast
+    stub.fail_rate, stub.hang_rate = 1.0, 0.0
+    dead = Upstream("embed", timeout=args.timeout, retries=1)
+
+    async def dead_call(i):
+        await dead.post_json(url, json={"text": [f"q{i}"]})
+
+    report("dead", await run(dead_call, args.requests, args.concurrency), str(dead.stats()))
+    await up.aclose()
+    await dead.aclose()
+    stub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    parser.add_argument("--hang-rate", type=float, default=0.05)
+    parser.add_argument("--hang-s", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    parser.add_argument("--hedge-ms", type=float, default=100)
+    asyncio.run(main(parser.parse_args()))
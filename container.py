@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+
+from dotenv import load_dotenv
+
+from utils.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Process-wide application container.
+#
+# Every client is created exactly once per worker, on first use, behind one
+# lock: the Firestore AsyncClient, the token verifier, the intent engine and
+# the caches in front of Firestore and the LLM. Heavy modules
+# (google.cloud.firestore, numpy, rapidfuzz, httpx, requests, the openai
+# SDK, dateparser, firebase_admin) are imported inside the factories and
+# the functions that use them, so importing the app loads little beyond
+# FastAPI (check with python -X importtime -c "import main").
+#
+# main.py's lifespan calls startup(), which creates the Firestore client
+# before the worker accepts connections (so the firestore import is paid
+# there) and warms the rest in the background; /ready reports 200 once
+# that is done (benchmarks/startup_probe.py measures both). Requests that arrive earlier still work: they build (or wait for)
+# whatever they need via aget().
+
+load_dotenv()
+
+WARMUPS = ("intent_engine", "certs", "slots", "llm")
+
+
+class AppContainer:
+    def __init__(self):
+        self._instances = {}
+        self._lock = threading.RLock()
+        self._warmup_task = None
+        self.ready = {name: False for name in WARMUPS}
+        self.errors = {}
+        self.started_at = None
+        self.ready_at = None
+
+    # ---------------------------
+    # Instances
+    # ---------------------------
+    def _get(self, name, factory):
+        inst = self._instances.get(name)
+        if inst is not None:
+            return inst
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = factory()
+            return self._instances[name]
+
+    def override(self, **instances):
+        """Swap in instances (fakes in benchmarks and local harnesses)."""
+        with self._lock:
+            self._instances.update(instances)
+
+    async def aget(self, name):
+        """The instance, built on the blocking pool if it doesn't exist yet."""
+        inst = self._instances.get(name)
+        if inst is not None:
+            return inst
+        return await run_blocking(getattr, self, name)
+
+    @property
+    def firebase_creds(self) -> dict:
+        def load():
+            # FIREBASE_CREDENTIALS should be a JSON string in .env
+            # Example:
+            # FIREBASE_CREDENTIALS={"type":"service_account", ...}
+            raw = os.getenv("FIREBASE_CREDENTIALS")
+            if not raw:
+                raise RuntimeError("FIREBASE_CREDENTIALS missing in .env")
+            return json.loads(raw)
+        return self._get("firebase_creds", load)
+
+    @property
+    def project_id(self) -> str:
+        return self.firebase_creds["project_id"]
+
+    @property
+    def db(self):
+        def make():
+            from google.oauth2 import service_account
+            from google.cloud import firestore
+
+            credentials = service_account.Credentials.from_service_account_info(self.firebase_creds)
+            # Async client: Firestore reads/writes are awaited instead of blocking the loop
+            return firestore.AsyncClient(project=self.project_id, credentials=credentials)
+        return self._get("db", make)
+
+    @property
+    def firebase_app(self):
+        # only the auth-emulator path still goes through firebase_admin
+        def make():
+            import firebase_admin
+            from firebase_admin import credentials as fb_credentials
+
+            # Prevent “App already exists” error in reload
+            if firebase_admin._apps:
+                return firebase_admin.get_app()
+            return firebase_admin.initialize_app(fb_credentials.Certificate(self.firebase_creds))
+        return self._get("firebase_app", make)
+
+    @property
+    def token_verifier(self):
+        def make():
+            from auth.token_cache import TokenVerifier
+
+            return TokenVerifier.from_env(self.project_id)
+        return self._get("token_verifier", make)
+
+    @property
+    def intent_engine(self):
+        def make():
+            from utils.intent_engine import IntentEngine
+
+            return IntentEngine()
+        return self._get("intent_engine", make)
+
+    @property
+    def profile_cache(self):
+        def make():
+            from utils.profile_cache import ProfileCache
+
+            # users/{uid} read-through cache shared by the route and ContextEngine
+            return ProfileCache.from_env()
+        return self._get("profile_cache", make)
+
+    @property
+    def context_engine(self):
+        def make():
+            from utils.context_engine import ContextEngine
+
+            # CONTEXT_WRITE_BEHIND_MS > 0 coalesces context writes per uid (see ContextEngine)
+            write_behind_ms = float(os.getenv("CONTEXT_WRITE_BEHIND_MS", "0"))
+            return ContextEngine(
+                self.db,
+                write_behind_delay=write_behind_ms / 1000 or None,
+                profile_cache=self.profile_cache,
+            )
+        return self._get("context_engine", make)
+
+    @property
+    def txn_repo(self):
+        def make():
+            from utils.txn_repository import TransactionRepository
+
+            # projections, cursor paging, type pushdown behind TXN_TYPE_INDEX
+            return TransactionRepository.from_env(self.db)
+        return self._get("txn_repo", make)
+
+    @property
+    def response_cache(self):
+        def make():
+            from utils.response_cache import ResponseCache
+
+            # LLM replies for repeatable prompts (see utils.response_cache for bypassed intents)
+            return ResponseCache.from_env()
+        return self._get("response_cache", make)
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    async def startup(self) -> None:
+        self.started_at = time.monotonic()
+        # fail fast on missing credentials; the clients themselves are cheap
+        self.db
+        self.context_engine
+        self.response_cache
+        self._warmup_task = asyncio.get_running_loop().create_task(self._warmup())
+
+    async def _warmup(self) -> None:
+        from auth import verify
+        from utils import llm
+        from utils.slot_extraction import warmup as warmup_slots
+
+        steps = {
+            "intent_engine": lambda: self.intent_engine,
+            "certs": verify.prefetch_certs,
+            # dateparser's language data loads on first use
+            "slots": warmup_slots,
+            "llm": llm.warmup,
+        }
+
+        async def step(name, fn):
+            try:
+                await run_blocking(fn)
+                self.ready[name] = True
+            except Exception as e:
+                self.errors[name] = repr(e)
+                logger.exception("warmup step %s failed", name)
+
+        await asyncio.gather(*(step(name, fn) for name, fn in steps.items()))
+        if all(self.ready.values()):
+            self.ready_at = time.monotonic()
+
+    def readiness(self):
+        ok = all(self.ready.values())
+        status = {
+            "ready": ok,
+            "components": dict(self.ready),
+            "errors": dict(self.errors),
+        }
+        if self.ready_at is not None:
+            status["warmup_ms"] = round((self.ready_at - self.started_at) * 1000, 1)
+        return ok, status
+
+    def stats(self) -> dict:
+        """stats() of every component built so far (never builds one); fed to /metrics."""
+        from utils import llm
+
+        inst = self._instances
+        out = {"llm": {"upstream": llm.upstream.stats(), "ttft": llm.ttft.summary()}}
+        for name in ("intent_engine", "token_verifier", "profile_cache", "response_cache", "txn_repo"):
+            component = inst.get(name)
+            stats = getattr(component, "stats", None)
+            if stats is not None:
+                out[name] = stats()
+        return out
+
+    async def shutdown(self) -> None:
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+        inst = self._instances
+        if "context_engine" in inst:
+            await inst["context_engine"].flush()
+        if "intent_engine" in inst:
+            await inst["intent_engine"].aclose()
+        if "token_verifier" in inst:
+            inst["token_verifier"].certs.stop()
+        from utils import llm
+
+        await llm.aclose()
+        if "db" in inst:
+            close = getattr(inst["db"], "close", None)
+            if close is not None:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    await result
+
+
+container = AppContainer()
@@ -1,12 +1,42 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
 
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from container import container
 from routes.chatbot import router as chatbot_router
-app = FastAPI()
+from routes.dashboard import router as dashboard_router
+from routes.transactions import router as transactions_router
+from utils import metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # clients are created once here; intent exemplars, signing certs,
+    # dateparser and the LLM client warm in the background (see /ready)
+    await container.startup()
+    yield
+    await container.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 def root():
     return {"message": "Finance backend working!"}
 
+@app.get("/ready")
+def ready():
+    ok, status = container.readiness()
+    return JSONResponse(status, status_code=200 if ok else 503)
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+metrics.REGISTRY.add_collector(container.stats)
+
 # Include routes
-app.include_router(chatbot_router)
\ No newline at end of file
+app.include_router(chatbot_router)
+app.include_router(dashboard_router)
+app.include_router(transactions_router)
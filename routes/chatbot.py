@@ -1,53 +1,205 @@
 import os
 import json
-from fastapi import APIRouter, Header, HTTPException
+import time
+import asyncio
+from typing import List
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, time as dtime, timedelta, timezone
 from dotenv import load_dotenv
 
-from google.oauth2 import service_account
-from google.cloud import firestore
-
-from auth.verify import verify_id_token
-from utils.intent_engine import IntentEngine
-from utils.slot_extraction import extract_time_window
-from utils.context_engine import ContextEngine
-from utils.prompt_builder import build_prompt
-from utils.llm import ask_llm
+from auth.verify import averify_id_token
+from container import container
+from utils.slot_extraction import extract_slots
+from utils.txn_rollup import ROLLUP_READY_FIELD, mark_stale, rows_from_totals, window_totals
+from utils.llm import LLM_MODEL, ask_llm_async, ask_llm_stream
+from utils.http_client import CircuitOpenError
+from utils.stage_graph import StageGraph
+from utils import metrics
 
 
 # --------------------
-# Load env + Firestore
+# Load env
 # --------------------
 load_dotenv()
 
 router = APIRouter()
 
-# FIREBASE_CREDENTIALS should be a JSON string in .env
-# Example:
-# FIREBASE_CREDENTIALS={"type":"service_account", ...}
-firebase_creds_str = os.getenv("FIREBASE_CREDENTIALS")
-if not firebase_creds_str:
-    raise RuntimeError("FIREBASE_CREDENTIALS missing in .env")
+# Firestore, the intent engine and the caches live on the app container
+# (created once per process, warmed in main.py's lifespan).
+# CONTEXT_COMMIT=background writes context after the response is sent
+COMMIT_IN_BACKGROUND = os.getenv("CONTEXT_COMMIT", "inline") == "background"
+# /chatbot/batch: prompts per request, concurrent LLM calls per request
+BATCH_MAX_PROMPTS = int(os.getenv("CHATBOT_BATCH_MAX", "64"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("CHATBOT_BATCH_CONCURRENCY", "4"))
+
+
+class ChatbotRequest(BaseModel):
+    prompt: str
+
 
-firebase_creds = json.loads(firebase_creds_str)
-gcp_credentials = service_account.Credentials.from_service_account_info(firebase_creds)
+class ChatbotBatchRequest(BaseModel):
+    prompts: List[str]
 
-db = firestore.Client(
-    project=firebase_creds["project_id"],
-    credentials=gcp_credentials
+
+EXPENSE_ONLY_INTENTS = {"expense_query", "expense_analysis", "budget_query"}
+BOTH_INCOME_EXPENSE_INTENTS = {"savings_advice"}
+# prompts for these only need per-category totals -> answered from rollups
+# when the user's rollups are built; expense_query lists line items
+ROLLUP_INTENTS = {"expense_analysis", "budget_query", "savings_advice"}
+
+UNKNOWN_RESPONSE = (
+    "I'm your personal financial adviser 🤝\\n"
+    "You can ask me things like:\\n"
+    "• Show my last 15 days expenses\\n"
+    "• What is my budget left?\\n"
+    "• Where did I spend most this month?\\n"
+    "• Suggest some investments based on my risk level\\n"
+    "Try asking in one of these ways."
 )
 
-intent_engine = IntentEngine()
-context_engine = ContextEngine(db)
 
+def build_chat_graph(user_prompt, token_id):
+    """
+    Stages of one /chatbot request. auth and intent start together; the
+    user document is read once (profile + context) as soon as the uid is
+    known, and the transaction query starts as soon as the final intent is
+    known, concurrently with the profile read.
+    """
+    graph = StageGraph()
+
+    async def auth(g):
+        # cached per token until exp; misses verify on the bounded thread pool
+        try:
+            return await averify_id_token(token_id)
+        except Exception as e:
+            # invalid / expired token: a client error, as on /chatbot/batch and /dashboard
+            raise HTTPException(status_code=401, detail=str(e))
+
+    async def intent(g):
+        try:
+            # built on first use if the startup warmup hasn't finished yet
+            intent_engine = await container.aget("intent_engine")
+            return await intent_engine.ascore_intent(user_prompt)
+        except CircuitOpenError:
+            # embeddings are down: fail fast to the help message
+            return {"intent": "unknown", "tier": "circuit_open"}
+
+    async def profile(g):
+        uid = await g.result("auth")
+        return await container.context_engine.load_profile(uid)
+
+    async def resolve_intent(g):
+        detected = (await g.result("intent"))["intent"]
+        # Followup -> reuse last intent
+        if detected == "followup":
+            uid = await g.result("auth")
+            last_intent = container.context_engine.session(uid, await g.result("profile")).get("last_intent")
+            if last_intent:
+                return last_intent
+        return detected
+
+    async def transactions(g):
+        uid = await g.result("auth")
+        final_intent = await g.result("resolve_intent")
+        use_rollups = final_intent in ROLLUP_INTENTS and bool(
+            (await g.result("profile")).get(ROLLUP_READY_FIELD)
+        )
+        return await fetch_transactions(uid, final_intent, user_prompt, use_rollups)
+
+    graph.add("auth", auth)
+    graph.add("intent", intent)
+    graph.add("profile", profile)
+    graph.add("resolve_intent", resolve_intent)
+    graph.add("transactions", transactions)
+    return graph
+
+
+def _day_start(d):
+    """Local midnight of date d, as an aware UTC datetime."""
+    return datetime.combine(d, dtime.min).astimezone(timezone.utc)
+
+
+async def fetch_transactions(uid, intent, user_prompt, use_rollups=False):
+    """
+    Returns (transactions, no_txn_message) for the intent's window, the
+    transactions as a TransactionFrame (filled while the pages stream in).
+    With use_rollups the rows are per-category totals summed from the
+    rollup buckets instead of raw transaction documents.
+    """
+    from utils.txn_analytics import TransactionFrame
+
+    needs_expense_only = intent in EXPENSE_ONLY_INTENTS
+    needs_both = intent in BOTH_INCOME_EXPENSE_INTENTS
+
+    transactions = TransactionFrame(capacity=16)
+    no_txn_message = None  # important: defined for all paths
 
-class ChatbotRequest(BaseModel):
-    prompt: str
+    if not (needs_expense_only or needs_both):
+        return transactions, no_txn_message
 
+    # Extract window + detect if user EXPLICITLY asked for a window
+    # (compiled + memoized; dateparser only as a last resort, so no thread hop)
+    slots = extract_slots(user_prompt)
+    explicit_window = slots["window_days"] is not None
+    days = slots["window_days"] or 30
 
-@router.post("/chatbot")
-async def chatbot(request: ChatbotRequest, authorization: str = Header(None)):
+    if explicit_window:
+        cutoff_ts = _day_start(slots["start"])
+        until_ts = _day_start(slots["end"]) if slots["end"] else None
+    else:
+        cutoff_ts = datetime.now(timezone.utc) - timedelta(days=days)
+        until_ts = None
+    types = ("expense",) if needs_expense_only else ("income", "expense")
+
+    totals = None
+    if use_rollups:
+        # rollup buckets are whole days: the end day is inclusive there
+        db = container.db
+        user_ref = db.collection("users").document(uid)
+        last_day = until_ts - timedelta(microseconds=1) if until_ts else None
+        totals = await window_totals(db, user_ref, cutoff_ts, last_day)
+        if totals is None:
+            # transactions were written around the rollups: stop using them
+            # for this user until the next rebuild (raw query below)
+            await mark_stale(user_ref)
+            container.profile_cache.invalidate(uid)
+    if totals is not None:
+        transactions = TransactionFrame.from_records(rows_from_totals(totals, types))
+    else:
+        # projected, paged; the type filter is pushed down when TXN_TYPE_INDEX=1
+        transactions = await container.txn_repo.window_frame(uid, cutoff_ts, until_ts, types)
+
+    # ✅ If user explicitly asked a window and nothing found -> NO fallback
+    if explicit_window and not len(transactions):
+        if slots["end"]:
+            last = slots["end"] - timedelta(days=1)
+            no_txn_message = f"No transactions found between {slots['start']:%d %b %Y} and {last:%d %b %Y}."
+        else:
+            no_txn_message = f"No transactions found in the last {days} days."
+
+    # ✅ Fallback ONLY if user did NOT ask a specific window
+    elif not len(transactions):
+        transactions = await container.txn_repo.recent_frame(uid, limit=100, types=types)
+
+    return transactions, no_txn_message
+
+
+def fetch_key(intent, user_prompt, use_rollups=False):
+    """Requests with equal keys get identical fetch_transactions() results."""
+    if intent in EXPENSE_ONLY_INTENTS:
+        types = "expense"
+    elif intent in BOTH_INCOME_EXPENSE_INTENTS:
+        types = "both"
+    else:
+        return None
+    slots = extract_slots(user_prompt)
+    return types, use_rollups, slots["window_days"], slots["start"], slots["end"]
+
+
+def _parse_request(request, authorization):
+    """Returns (user_prompt, token_id) or raises the 400/401."""
     user_prompt = (request.prompt or "").strip()
     if not user_prompt:
         raise HTTPException(status_code=400, detail="Prompt cannot be empty")
@@ -55,110 +207,207 @@ async def chatbot(request: ChatbotRequest, authorization: str = Header(None)):
     if authorization is None or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    token_id = authorization.split(" ")[1]
-    uid = verify_id_token(token_id)
+    return user_prompt, authorization.split(" ")[1]
 
-    # -------- 1) Detect intent --------
-    intent = intent_engine.detect_intent(user_prompt)
-    print(intent)
-    
 
-    # Followup -> reuse last intent
-    if intent == "followup":
-        last_intent = context_engine.get_user_context(uid, "last_intent")
-        if last_intent:
-            intent = last_intent
-    if intent == "unknown":
-        bot_response = (
-        "I'm your personal financial adviser 🤝\\n"
-        "You can ask me things like:\\n"
-        "• Show my last 15 days expenses\\n"
-        "• What is my budget left?\\n"
-        "• Where did I spend most this month?\\n"
-        "• Suggest some investments based on my risk level\\n"
-            "Try asking in one of these ways."
+@router.post("/chatbot")
+async def chatbot(
+    request: ChatbotRequest,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    authorization: str = Header(None),
+):
+    user_prompt, token_id = _parse_request(request, authorization)
+
+    graph = build_chat_graph(user_prompt, token_id).start()
+    status = 500
+    try:
+        bot_response, session = await _answer(graph, user_prompt)
+
+        # -------- Update context memory (one merged write) --------
+        if COMMIT_IN_BACKGROUND:
+            background_tasks.add_task(session.commit)
+        else:
+            await graph.run("context_write", session.commit())
+        status = 200
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    finally:
+        graph.cancel_pending()
+        response.headers["Server-Timing"] = graph.server_timing()
+        _observe(graph, "/chatbot", status)
+
+    return {"response": bot_response}
+
+
+@router.post("/chatbot/stream")
+async def chatbot_stream(request: ChatbotRequest, authorization: str = Header(None)):
+    """
+    Same pipeline as /chatbot, but the reply is sent as Server-Sent Events:
+        event: token  data: {"text": "..."}      one per LLM delta
+        event: done   data: {"ttft_ms", "llm_ttft_ms", "total_ms"}
+        event: error  data: {"detail": "..."}
+    ttft_ms and total_ms count from the request's arrival; llm_ttft_ms
+    from opening the LLM stream. Context is committed once the stream
+    completes (not if the client disconnects first).
+    """
+    arrived = time.perf_counter()
+    user_prompt, token_id = _parse_request(request, authorization)
+
+    # auth / intent / data errors surface as normal HTTP errors before streaming
+    graph = build_chat_graph(user_prompt, token_id).start()
+    status = 500
+    try:
+        turn = await _prepare(graph, user_prompt)
+        status = 200
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    finally:
+        graph.cancel_pending()
+        # the LLM part is recorded by _stream_turn (stage "llm", TTFT)
+        _observe(graph, "/chatbot/stream", status)
+
+    return StreamingResponse(
+        _stream_turn(turn, user_prompt, arrived),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Server-Timing": graph.server_timing(),
+        },
     )
 
-        context_engine.set_user_context(uid, "last_intent", intent)
-        context_engine.set_user_context(uid, "last_bot_response", bot_response)
 
-        return {"response": bot_response}
+def _observe(graph, route, status):
+    intent = graph.peek("resolve_intent")
+    tier = (graph.peek("intent") or {}).get("tier")
+    total_ms = max((t["end_ms"] for t in graph.timings.values()), default=0.0)
+    metrics.observe_graph(graph, route, intent, status, total_ms, tier=tier)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_turn(turn, user_prompt, arrived):
+    """arrived: perf_counter() when the request came in; TTFT counts from there."""
+    start = time.perf_counter()
+    first = None
+    parts = []
+    try:
+        ready = turn["canned_response"] or _cached_reply(turn, user_prompt)
+        if ready is None:
+            try:
+                async for delta in ask_llm_stream(turn["final_prompt"]):
+                    if first is None:
+                        first = time.perf_counter()
+                    parts.append(delta)
+                    yield _sse("token", {"text": delta})
+                _cache_reply(turn, user_prompt, "".join(parts))
+            except CircuitOpenError:
+                # raised before the stream opens: fail fast to the help text, as /chatbot does
+                ready = UNKNOWN_RESPONSE
+        if ready is not None:
+            first = time.perf_counter()
+            parts.append(ready)
+            yield _sse("token", {"text": ready})
+    except Exception as e:
+        yield _sse("error", {"detail": str(e)})
+        return
+
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - start, "/chatbot/stream", "llm", turn["intent"])
+    ttft_ms = llm_ttft_ms = None
+    if first is not None:
+        ttft_ms = (first - arrived) * 1000
+        llm_ttft_ms = (first - start) * 1000
+        metrics.TTFT_SECONDS.observe(first - arrived, turn["intent"])
+        metrics.LLM_TTFT_SECONDS.observe(first - start, turn["intent"])
+
+    session = turn["session"]
+    session.update(last_intent=turn["intent"], last_bot_response="".join(parts))
+    await session.commit()
+    yield _sse("done", {
+        "ttft_ms": ttft_ms,
+        "llm_ttft_ms": llm_ttft_ms,
+        "total_ms": (time.perf_counter() - arrived) * 1000,
+    })
+
+
+def _cached_reply(turn, user_prompt):
+    return container.response_cache.get(
+        turn["intent"], user_prompt, turn["final_prompt"], LLM_MODEL, turn["query_emb"],
+        uid=turn["session"].uid,
+    )
 
-    # -------- 2) Fetch user profile --------
-    user_ref = db.collection("users").document(uid)
-    user_doc = user_ref.get()
-    profile = user_doc.to_dict() if user_doc.exists else {}
 
-    # -------- 3) Decide txn needs --------
-    expense_only_intents = {"expense_query", "expense_analysis", "budget_query"}
-    both_income_expense_intents = {"savings_advice"}
+def _cache_reply(turn, user_prompt, reply):
+    container.response_cache.put(
+        turn["intent"], user_prompt, turn["final_prompt"], LLM_MODEL, reply, turn["query_emb"],
+        uid=turn["session"].uid,
+    )
 
-    needs_expense_only = intent in expense_only_intents
-    needs_both = intent in both_income_expense_intents
 
-    transactions = []
-    no_txn_message = None  # important: defined for all paths
+async def _answer(graph, user_prompt):
+    turn = await _prepare(graph, user_prompt)
 
-    if needs_expense_only or needs_both:
-        # Extract window + detect if user EXPLICITLY asked for a window
-        extracted_days = extract_time_window(user_prompt)  # should return None if not found
-        explicit_window = extracted_days is not None
-        days = extracted_days or 30
+    bot_response = turn["canned_response"] or _cached_reply(turn, user_prompt)
+    if bot_response is None:
+        try:
+            bot_response = await graph.run("llm", ask_llm_async(turn["final_prompt"]))
+            _cache_reply(turn, user_prompt, bot_response)
+        except CircuitOpenError:
+            bot_response = UNKNOWN_RESPONSE
 
-        cutoff_ts = datetime.now(timezone.utc) - timedelta(days=days)
-        txn_ref = user_ref.collection("transactions")
+    session = turn["session"]
+    session.update(last_intent=turn["intent"], last_bot_response=bot_response)
+    return bot_response, session
 
-        # ✅ INDEX-FREE primary fetch: only timestamp filter
-        docs = txn_ref.where("timestamp", ">=", cutoff_ts).stream()
 
-        for doc in docs:
-            data = doc.to_dict() or {}
-            ttype = data.get("type")
+def _turn(session, intent, final_prompt=None, canned_response=None, query_emb=None):
+    return {
+        "session": session,
+        "intent": intent,
+        "final_prompt": final_prompt,
+        "canned_response": canned_response,
+        "query_emb": query_emb,
+    }
 
-            # For expense-only intents, keep only expenses
-            if needs_expense_only and ttype != "expense":
-                continue
 
-            transactions.append({
-                "type": ttype,
-                "category": data.get("category"),
-                "amount": float(data.get("amount", 0) or 0),
-                "timestamp": data.get("timestamp"),
-            })
+async def _prepare(graph, user_prompt):
+    """
+    Everything up to the LLM call. Returns a turn dict (see _turn) with
+    either final_prompt or canned_response set.
+    """
+    # -------- 1) Auth + intent (concurrent) --------
+    uid = await graph.result("auth")
+    intent = await graph.result("resolve_intent")
 
-        # ✅ If user explicitly asked a window and nothing found -> NO fallback
-        if explicit_window and not transactions:
-            no_txn_message = f"No transactions found in the last {days} days."
+    if intent == "unknown":
+        # write-only: no need to wait for the users/{uid} read
+        return _turn(container.context_engine.session(uid), intent, canned_response=UNKNOWN_RESPONSE)
 
-        # ✅ Fallback ONLY if user did NOT ask a specific window
-        elif not transactions:
-            fallback_docs = (
-                txn_ref.order_by("timestamp", direction=firestore.Query.DESCENDING)
-                      .limit(100)
-                      .stream()
-            )
-            for doc in fallback_docs:
-                data = doc.to_dict() or {}
-                ttype = data.get("type")
-
-                if needs_expense_only and ttype != "expense":
-                    continue
-
-                transactions.append({
-                    "type": ttype,
-                    "category": data.get("category"),
-                    "amount": float(data.get("amount", 0) or 0),
-                    "timestamp": data.get("timestamp"),
-                })
-
-    # -------- 4) Derived totals ONLY from fetched window --------
-    income_total = 0.0
-    expense_total = 0.0
-    for t in transactions:
-        if t.get("type") == "income":
-            income_total += t.get("amount", 0.0)
-        elif t.get("type") == "expense":
-            expense_total += t.get("amount", 0.0)
+    # -------- 2) Profile (single users/{uid} read) + transactions (concurrent) --------
+    profile = await graph.result("profile")
+    session = container.context_engine.session(uid, profile)
+    transactions, no_txn_message = await graph.result("transactions")
+
+    # -------- 3) + 4) Derived totals, prompt --------
+    with graph.span("prompt"):
+        final_prompt = _final_prompt(intent, user_prompt, profile, session, transactions, no_txn_message)
+
+    query_emb = (await graph.result("intent")).get("embedding")
+    return _turn(session, intent, final_prompt, query_emb=query_emb)
+
+
+def _final_prompt(intent, user_prompt, profile, session, frame, no_txn_message):
+    # numpy-backed: loaded by the first prompt, not at import
+    from utils.prompt_builder import build_prompt
+
+    # Derived totals ONLY from fetched window (frame from fetch_transactions)
+    income_total = frame.total("income")
+    expense_total = frame.total("expense")
 
     context = {
         "budget": profile.get("budget"),
@@ -166,24 +415,172 @@ async def chatbot(request: ChatbotRequest, authorization: str = Header(None)):
         "risk_level": profile.get("risk_level"),
         "derived_income": income_total if income_total > 0 else None,
         "derived_expense": expense_total if expense_total > 0 else None,
-        "last_bot_response": context_engine.get_user_context(uid, "last_bot_response"),
-        "last_intent": context_engine.get_user_context(uid, "last_intent"),
+        "last_bot_response": session.get("last_bot_response"),
+        "last_intent": session.get("last_intent"),
     }
 
-    # -------- 5) Build prompt + call LLM --------
-    final_prompt = build_prompt(
+    return build_prompt(
         intent=intent,
         user_prompt=user_prompt,
         context=context,
-        transactions=transactions,
-        no_txn_message=no_txn_message
+        transactions=None,
+        no_txn_message=no_txn_message,
+        frame=frame
     )
 
-    print(final_prompt)
-    bot_response = ask_llm(final_prompt)
-
-    # -------- 6) Update context memory --------
-    context_engine.set_user_context(uid, "last_intent", intent)
-    context_engine.set_user_context(uid, "last_bot_response", bot_response)
 
-    return {"response": bot_response}
+# ---------------------------
+# Batch
+# ---------------------------
+@router.post("/chatbot/batch")
+async def chatbot_batch(request: ChatbotBatchRequest, response: Response, authorization: str = Header(None)):
+    """
+    Several prompts of one user, answered in order:
+        {"results": [{"response": "..."} | {"error": {"status", "detail"}}, ...]}
+    The token is verified once, all prompts are scored in one
+    ascore_intents call (one embedding batch for the misses), users/{uid}
+    is read once, transaction fetches are shared between prompts that need
+    the same window, and LLM calls run CHATBOT_BATCH_CONCURRENCY at a time.
+
+    Prompts are treated as one conversation for followups (a followup
+    reuses the previous prompt's intent), but every prompt sees the context
+    stored before the batch; the context is written once, from the last
+    answered prompt.
+    """
+    if authorization is None or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if not request.prompts:
+        raise HTTPException(status_code=400, detail="prompts cannot be empty")
+    if len(request.prompts) > BATCH_MAX_PROMPTS:
+        raise HTTPException(status_code=413, detail=f"at most {BATCH_MAX_PROMPTS} prompts per batch")
+
+    prompts = [(p or "").strip() for p in request.prompts]
+    graph = build_batch_graph([p for p in prompts if p], authorization.split(" ")[1]).start()
+    status = 500
+    try:
+        results = await _answer_batch(graph, prompts)
+        status = 200
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    finally:
+        graph.cancel_pending()
+        response.headers["Server-Timing"] = graph.server_timing()
+        total_ms = max((t["end_ms"] for t in graph.timings.values()), default=0.0)
+        metrics.observe_graph(graph, "/chatbot/batch", "batch", status, total_ms, prompts=len(prompts))
+    return {"results": results}
+
+
+def build_batch_graph(user_prompts, token_id):
+    graph = StageGraph()
+
+    async def auth(g):
+        try:
+            return await averify_id_token(token_id)
+        except Exception as e:
+            raise HTTPException(status_code=401, detail=str(e))
+
+    async def intent(g):
+        if not user_prompts:
+            return []
+        try:
+            intent_engine = await container.aget("intent_engine")
+            return await intent_engine.ascore_intents(user_prompts)
+        except CircuitOpenError:
+            return [{"intent": "unknown", "tier": "circuit_open"} for _ in user_prompts]
+
+    async def profile(g):
+        return await container.context_engine.load_profile(await g.result("auth"))
+
+    graph.add("auth", auth)
+    graph.add("intent", intent)
+    graph.add("profile", profile)
+    return graph
+
+
+def _item_error(status, detail):
+    return {"error": {"status": status, "detail": detail}}
+
+
+async def _answer_batch(graph, prompts):
+    uid = await graph.result("auth")
+    scored = iter(await graph.result("intent"))
+    profile = await graph.result("profile")
+    session = container.context_engine.session(uid, profile)
+    rollups_ready = bool(profile.get(ROLLUP_READY_FIELD))
+
+    # -------- intents, in conversation order --------
+    items = []
+    last_intent = session.get("last_intent")
+    for prompt in prompts:
+        if not prompt:
+            items.append(None)
+            continue
+        result = next(scored)
+        intent = result["intent"]
+        if intent == "followup" and last_intent:
+            intent = last_intent
+        last_intent = intent
+        items.append({"prompt": prompt, "intent": intent, "query_emb": result.get("embedding")})
+
+    # -------- one transaction fetch per distinct window --------
+    fetches = {}
+
+    def fetch(item):
+        use_rollups = item["intent"] in ROLLUP_INTENTS and rollups_ready
+        key = fetch_key(item["intent"], item["prompt"], use_rollups)
+        if key not in fetches:
+            fetches[key] = asyncio.ensure_future(
+                fetch_transactions(uid, item["intent"], item["prompt"], use_rollups)
+            )
+        return fetches[key]
+
+    async def gather_transactions():
+        for item in items:
+            if item is not None and item["intent"] != "unknown":
+                item["fetch"] = fetch(item)
+        await asyncio.gather(*fetches.values(), return_exceptions=True)
+
+    await graph.run("transactions", gather_transactions())
+
+    # -------- prompts + LLM, bounded --------
+    llm_slots = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+    async def answer(item):
+        if item is None:
+            return _item_error(400, "Prompt cannot be empty")
+        if item["intent"] == "unknown":
+            return {"response": UNKNOWN_RESPONSE}
+        try:
+            transactions, no_txn_message = item["fetch"].result()
+            final_prompt = _final_prompt(
+                item["intent"], item["prompt"], profile, session, transactions, no_txn_message
+            )
+        except Exception as e:
+            return _item_error(502, f"could not load transactions: {e}")
+
+        turn = _turn(session, item["intent"], final_prompt, query_emb=item["query_emb"])
+        reply = _cached_reply(turn, item["prompt"])
+        if reply is None:
+            try:
+                async with llm_slots:
+                    reply = await ask_llm_async(final_prompt)
+                _cache_reply(turn, item["prompt"], reply)
+            except CircuitOpenError:
+                reply = UNKNOWN_RESPONSE
+            except Exception as e:
+                return _item_error(502, f"LLM call failed: {e}")
+        return {"response": reply}
+
+    async def answer_all():
+        return await asyncio.gather(*(answer(item) for item in items))
+
+    results = await graph.run("llm", answer_all())
+
+    # -------- one context write, from the last answered prompt --------
+    for item, result in zip(reversed(items), reversed(results)):
+        if item is not None and "response" in result:
+            session.update(last_intent=item["intent"], last_bot_response=result["response"])
+            break
+    await graph.run("context_write", session.commit())
+    return results
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Header, HTTPException
-from auth.verify import verify_id_token
+from auth.verify import averify_id_token
 
 router = APIRouter()
 
@@ -11,7 +11,7 @@ async def dashboard(authorization: str = Header(None)):
     id_token = authorization.split(" ")[1]
     
     try:
-        uid = verify_id_token(id_token)
+        uid = await averify_id_token(id_token)
         return {"message": f"Welcome user {uid} to your dashboard"}
     except Exception as e:
         raise HTTPException(status_code=401, detail=str(e))
@@ -0,0 +1,69 @@
+from typing import Optional
+
+from fastapi import APIRouter, Body, Header, HTTPException, Query, Request
+
+from auth.verify import averify_id_token
+from container import container
+from utils.txn_ingest import FORMATS, BulkIngest, RowError, create_transaction
+
+router = APIRouter()
+
+
+def _format(explicit, content_type):
+    if explicit:
+        return explicit.lower()
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "json" in content_type:
+        # application/x-ndjson, application/jsonl, application/json-seq ...
+        return "jsonl"
+    return None
+
+
+async def _uid(authorization):
+    if authorization is None or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    try:
+        return await averify_id_token(authorization.split(" ")[1])
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+
+@router.post("/transactions", status_code=201)
+async def add_transaction(record: dict = Body(...), authorization: str = Header(None)):
+    """
+    Add one transaction (same fields as a bulk import record). It is
+    written in one batch with its rollup increments, so the rollups stay
+    current; clients should write through here rather than to
+    users/{uid}/transactions directly. Returns {"id", "created"}; created
+    is false when a record with the same "id" was already written.
+    """
+    uid = await _uid(authorization)
+    try:
+        doc_id, created = await create_transaction(container.db, uid, record)
+    except RowError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"id": doc_id, "created": created}
+
+
+@router.post("/transactions/bulk")
+async def bulk_import(
+    request: Request,
+    authorization: str = Header(None),
+    format: Optional[str] = Query(None, description="csv | jsonl (default: from Content-Type)"),
+):
+    """
+    Import a CSV (header row) or JSON Lines statement into the caller's
+    transactions; see utils.txn_ingest for the record fields. The body is
+    streamed, so files of any size are fine. Returns counts of written,
+    duplicate (already imported) and invalid rows, plus the first errors
+    with their line numbers.
+    """
+    uid = await _uid(authorization)
+
+    fmt = _format(format, request.headers.get("content-type"))
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson (or ?format=csv|jsonl)")
+
+    return await BulkIngest.from_env(container.db, uid).run(request.stream(), fmt)
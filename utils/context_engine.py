@@ -1,19 +1,158 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ContextSession:
+    """
+    Context of one user for one request: read once, mutate many keys,
+    commit once. Only keys changed through set()/update() are written.
+    """
+
+    def __init__(self, engine, uid, context):
+        self.engine = engine
+        self.uid = uid
+        self._context = dict(context or {})
+        self._dirty = {}
+
+    def get(self, key, default=None):
+        return self._context.get(key, default)
+
+    def set(self, key, value):
+        self._context[key] = value
+        self._dirty[key] = value
+
+    def update(self, **values):
+        for key, value in values.items():
+            self.set(key, value)
+
+    @property
+    def dirty(self):
+        return dict(self._dirty)
+
+    async def commit(self):
+        if not self._dirty:
+            return
+        changes, self._dirty = self._dirty, {}
+        await self.engine.write_context(self.uid, changes)
+
+
 class ContextEngine:
-    def __init__(self, db):
+    """
+    Conversation context stored under users/{uid}.context.
+
+    db is a firestore.AsyncClient; every call is awaited on the event loop.
+
+    Consistency:
+    - A session commit is one set({"context": {...}}, merge=True), so all
+      keys of the commit land together or not at all.
+    - Concurrent commits for the same uid are last-writer-wins per key;
+      there is no read-modify-write transaction.
+    - When the commit runs as a background task the response is returned
+      first, so a request arriving before the write completes can see the
+      previous context.
+    - With write_behind_delay set, commits for a uid are merged in memory
+      and flushed once per delay window. This worker reads its own pending
+      writes (session() overlays them); other workers see them only after
+      the flush. Pending writes are lost if the process dies before the
+      flush; call flush() on shutdown.
+    """
+
+    def __init__(self, db, write_behind_delay=None, profile_cache=None):
         self.db = db
+        self.profile_cache = profile_cache
+        self.write_behind_delay = write_behind_delay
+        self._pending = {}
+        self._flushers = {}
+        # every flusher until it finishes, including ones already writing
+        self._tasks = set()
+        self.writes = 0
+        self.coalesced = 0
+
+    def _user_ref(self, uid):
+        return self.db.collection("users").document(uid)
+
+    # ---------------------------
+    # Sessions
+    # ---------------------------
+    def session(self, uid, profile=None):
+        """Session over a users/{uid} dict that was already fetched (no read)."""
+        context = dict((profile or {}).get("context", {}))
+        context.update(self._pending.get(uid, {}))
+        return ContextSession(self, uid, context)
+
+    async def load_profile(self, uid):
+        """users/{uid} as a dict, through the profile cache when one is set."""
+        if self.profile_cache is not None:
+            return await self.profile_cache.get(uid, lambda: self._read_profile(uid))
+        return await self._read_profile(uid)
+
+    async def _read_profile(self, uid):
+        doc = await self._user_ref(uid).get()
+        return doc.to_dict() if doc.exists else {}
+
+    async def load(self, uid):
+        return self.session(uid, await self.load_profile(uid))
+
+    # ---------------------------
+    # Writes
+    # ---------------------------
+    async def write_context(self, uid, changes):
+        if not self.write_behind_delay:
+            await self._write(uid, changes)
+            return
+
+        pending = self._pending.setdefault(uid, {})
+        if pending:
+            self.coalesced += 1
+        pending.update(changes)
+        if uid not in self._flushers:
+            task = asyncio.ensure_future(self._flush_later(uid))
+            self._flushers[uid] = task
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, uid, changes):
+        self.writes += 1
+        await self._user_ref(uid).set({"context": changes}, merge=True)
+        if self.profile_cache is not None:
+            self.profile_cache.merge_context(uid, changes)
+
+    async def _flush_later(self, uid):
+        await asyncio.sleep(self.write_behind_delay)
+        try:
+            await self._flush_uid(uid)
+        except Exception:
+            logger.exception("context write-behind flush failed for %s", uid)
+
+    async def _flush_uid(self, uid):
+        self._flushers.pop(uid, None)
+        changes = self._pending.pop(uid, None)
+        if changes:
+            await self._write(uid, changes)
+
+    async def flush(self):
+        """Write every pending write-behind update now."""
+        for uid in list(self._pending):
+            task = self._flushers.get(uid)
+            if task is not None:
+                task.cancel()
+            await self._flush_uid(uid)
+        # flushers that took their changes before this call may still be writing
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # ---------------------------
+    # Single-key helpers
+    # ---------------------------
+    async def set_user_context(self, uid, key, value):
+        await self.write_context(uid, {key: value})
+
+    async def get_user_context(self, uid, key, default=None):
+        return (await self.load(uid)).get(key, default)
 
-    def set_user_context(self, uid, key, value):
-        user_ref = self.db.collection("users").document(uid)
-        user_ref.set({"context": {key: value}}, merge=True)
-
-    def get_user_context(self, uid, key, default=None):
-        user_ref = self.db.collection("users").document(uid)
-        doc = user_ref.get()
-        if doc.exists:
-            context = doc.to_dict().get("context", {})
-            return context.get(key, default)
-        return default
-
-    def clear_context(self, uid):
-        user_ref = self.db.collection("users").document(uid)
-        user_ref.update({"context": {}})
+    async def clear_context(self, uid):
+        self._pending.pop(uid, None)
+        await self._user_ref(uid).update({"context": {}})
+        if self.profile_cache is not None:
+            self.profile_cache.invalidate(uid)
@@ -0,0 +1,378 @@
+import os
+import math
+import zlib
+import hashlib
+from collections import Counter
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from utils.executor import run_blocking
+from utils.http_client import Upstream, sync_session
+from utils.lexical_intent import normalize_phrase
+
+# Embedding backends for intent detection, selected with EMBED_BACKEND:
+#   cloudflare  Workers AI (@cf/baai/bge-m3 by default), remote, the original path
+#   hash        hashed word + char n-gram TF-IDF projection, pure numpy, no network
+#   onnx        local ONNX Runtime sentence encoder (optional: onnxruntime + tokenizers)
+#   recorded    replays vectors recorded from one of the above (EMBED_FIXTURE), offline
+#
+# Exemplar matrices are per backend: vectors from different backends do not
+# share a space, so each one gets its own store (see exemplar_prefix) and
+# manifests record backend.model to catch mismatches.
+
+
+class EmbeddingBackend:
+    name = "base"
+    # remote backends pay a round trip per call, so batching and caching pay off
+    remote = False
+    cacheable = True
+    batch_window_ms = 0.0
+    # cosine below which a query is "unknown"; scales differ per vector space
+    threshold = 0.6
+
+    model: str = ""
+
+    def prepare(self, corpus: Iterable[str]) -> None:
+        """Hook for backends that derive state from the exemplar corpus."""
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        raise NotImplementedError
+
+    async def aembed(self, texts: List[str]) -> List[np.ndarray]:
+        return await run_blocking(self.embed, texts)
+
+    async def aclose(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "model": self.model}
+
+
+# ---------------------------
+# Cloudflare Workers AI
+# ---------------------------
+class CloudflareBackend(EmbeddingBackend):
+    name = "cloudflare"
+    remote = True
+    batch_window_ms = 5.0
+
+    def __init__(self, base_url: str, model: str, api_key: str, upstream: Upstream):
+        self.base_url = base_url
+        self.model = model
+        self.api_key = api_key
+        # pooled outbound clients: retries, hedging, circuit breaker
+        # (EMBED_TIMEOUT, EMBED_RETRIES, EMBED_HEDGE_MS, EMBED_BREAKER_*)
+        self.upstream = upstream
+        self._session = sync_session()
+
+    @classmethod
+    def from_env(cls) -> "CloudflareBackend":
+        account_id = os.environ.get("CF_ACCOUNT_ID", "")
+        default_base = (
+            f"https://api.cloudflare.com/client/v4/accounts/{account_id}/ai/run"
+            if account_id else ""
+        )
+        base_url = os.environ.get("EMBED_BASE_URL", default_base)
+        api_key = os.environ.get("CF_API_TOKEN")
+
+        if not api_key:
+            raise RuntimeError("CF_API_TOKEN is not set")
+        if not base_url:
+            raise RuntimeError("EMBED_BASE_URL is not set (or CF_ACCOUNT_ID missing)")
+
+        return cls(
+            base_url,
+            cls.model_from_env(),
+            api_key,
+            Upstream.from_env("embed", "EMBED", timeout=5.0, hedge_ms=250),
+        )
+
+    @staticmethod
+    def model_from_env() -> str:
+        # no credentials needed (offline conversion of the JSON store)
+        return os.environ.get("EMBED_MODEL", "@cf/baai/bge-m3")
+
+    def _request(self, texts: List[str]) -> dict:
+        return {
+            "url": f"{self.base_url}/{self.model}",
+            "json": {"text": texts},
+            "headers": {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+        }
+
+    @staticmethod
+    def parse_embeddings(data) -> List[np.ndarray]:
+        # Workers AI: {"result": {"data": [...]}}; OpenAI-style: {"data": [...]};
+        # items are either {"embedding": [...]} or bare lists
+        arr = data
+        if isinstance(data, dict):
+            result = data.get("result")
+            arr = result.get("data") if isinstance(result, dict) else data.get("data")
+        try:
+            return [
+                np.asarray(item["embedding"] if isinstance(item, dict) else item, dtype=np.float32)
+                for item in arr
+            ]
+        except Exception:
+            raise ValueError(f"Unexpected embeddings response shape: {data}")
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        if not texts:
+            return []
+        resp = self._session.post(**self._request(texts), timeout=self.upstream.timeout)
+        resp.raise_for_status()
+        return self.parse_embeddings(resp.json())
+
+    async def aembed(self, texts: List[str]) -> List[np.ndarray]:
+        if not texts:
+            return []
+        return self.parse_embeddings(await self.upstream.post_json(**self._request(texts)))
+
+    async def aclose(self) -> None:
+        await self.upstream.aclose()
+
+    def stats(self) -> dict:
+        return {**super().stats(), "upstream": self.upstream.stats()}
+
+
+# ---------------------------
+# Hashed n-gram TF-IDF projection
+# ---------------------------
+class HashedNgramBackend(EmbeddingBackend):
+    """
+    Signed feature hashing of word unigrams/bigrams and char n-grams into
+    `dim` buckets, sublinear TF weighted by IDF fitted on the exemplar
+    corpus, L2-normalized. Microseconds per text and no model files, at the
+    cost of only matching surface forms (no synonyms).
+    """
+
+    name = "hash"
+    cacheable = False
+    threshold = 0.35
+
+    def __init__(self, dim: int = 2048, char_ngrams=(2, 4), char_weight: float = 1.0):
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+        self.char_weight = char_weight
+        self.idf = np.ones(dim, dtype=np.float32)
+        self.model = f"hash-ngram-{dim}"
+
+    @classmethod
+    def from_env(cls) -> "HashedNgramBackend":
+        return cls(dim=int(os.environ.get("EMBED_HASH_DIM", "2048")))
+
+    def _features(self, text: str) -> Counter:
+        words = normalize_phrase(text).split()
+        feats: Counter = Counter()
+        for w in words:
+            feats["w:" + w] += 1.0
+        for a, b in zip(words, words[1:]):
+            feats[f"b:{a} {b}"] += 1.0
+        lo, hi = self.char_ngrams
+        for w in words:
+            padded = f" {w} "
+            for n in range(lo, hi + 1):
+                for i in range(len(padded) - n + 1):
+                    feats["c:" + padded[i:i + n]] += self.char_weight
+        return feats
+
+    def _buckets(self, feats: Counter):
+        idx = np.empty(len(feats), dtype=np.int64)
+        val = np.empty(len(feats), dtype=np.float32)
+        for k, (feat, tf) in enumerate(feats.items()):
+            h = zlib.crc32(feat.encode("utf-8"))
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            idx[k] = h % self.dim
+            val[k] = sign * (1.0 + math.log(tf)) if tf >= 1.0 else sign * tf
+        return idx, val
+
+    def prepare(self, corpus: Iterable[str]) -> None:
+        docs = [normalize_phrase(t) for t in corpus]
+        df = np.zeros(self.dim, dtype=np.float32)
+        for doc in docs:
+            idx, _ = self._buckets(self._features(doc))
+            df[np.unique(idx)] += 1.0
+        n = len(docs)
+        self.idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+        # the IDF is part of the vector space: a changed corpus needs new exemplars
+        digest = hashlib.sha1("\n".join(sorted(docs)).encode("utf-8")).hexdigest()[:8]
+        self.model = f"hash-ngram-{self.dim}@{digest}"
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            idx, val = self._buckets(self._features(text))
+            np.add.at(out[row], idx, val)
+        out *= self.idf
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return list(out / norms)
+
+    async def aembed(self, texts: List[str]) -> List[np.ndarray]:
+        # cheaper than a thread hop
+        return self.embed(texts)
+
+
+# ---------------------------
+# ONNX Runtime sentence encoder
+# ---------------------------
+class OnnxBackend(EmbeddingBackend):
+    """
+    Local transformer encoder exported to ONNX (ideally int8-quantized, e.g.
+    a MiniLM / bge-small export). model_dir holds model.onnx and the
+    HuggingFace tokenizer.json. Mean pooling over the attention mask unless
+    pooling="cls".
+    """
+
+    name = "onnx"
+    batch_window_ms = 2.0
+    threshold = 0.5
+
+    def __init__(self, model_dir: str, pooling: str = "mean", threads: int = 0, max_length: int = 128):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBED_BACKEND=onnx needs `pip install onnxruntime tokenizers`"
+            ) from e
+
+        model_path = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(model_path):
+            raise RuntimeError(f"{model_path} not found (set EMBED_ONNX_DIR)")
+
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        self.pooling = pooling
+        self.model = f"onnx:{os.path.basename(os.path.normpath(model_dir))}:{pooling}"
+
+    @classmethod
+    def from_env(cls) -> "OnnxBackend":
+        return cls(
+            os.environ.get("EMBED_ONNX_DIR", "models/embedding"),
+            pooling=os.environ.get("EMBED_ONNX_POOLING", "mean"),
+            threads=int(os.environ.get("EMBED_ONNX_THREADS", "0")),
+        )
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        if not texts:
+            return []
+        encs = self.tokenizer.encode_batch([normalize_phrase(t) or t for t in texts])
+        ids = np.array([e.ids for e in encs], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encs], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+
+        hidden = self.session.run(None, feeds)[0]  # (B, T, H)
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            m = mask[..., None].astype(np.float32)
+            pooled = (hidden * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1e-9)
+
+        pooled = pooled.astype(np.float32)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return list(pooled / norms)
+
+
+# ---------------------------
+# Recorded vectors (offline evals and perf runs)
+# ---------------------------
+class RecordedBackend(EmbeddingBackend):
+    """
+    Replays vectors recorded from another backend, so evaluations run with
+    that backend's vector space (and exemplar store) but no network.
+    Texts that were not recorded raise KeyError.
+
+    Fixture (.npz): texts, vectors, and the source backend's name, model
+    and threshold. Write one with RecordedBackend.record().
+    """
+
+    cacheable = False
+
+    def __init__(self, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            texts = [str(t) for t in data["texts"]]
+            self.vectors = np.asarray(data["vectors"], dtype=np.float32)
+            self.name = str(data["backend"])
+            self.model = str(data["model"])
+            self.threshold = float(data["threshold"])
+        self.index = {t: i for i, t in enumerate(texts)}
+        self.path = path
+
+    @classmethod
+    def from_env(cls) -> "RecordedBackend":
+        path = os.environ.get("EMBED_FIXTURE")
+        if not path:
+            raise RuntimeError("EMBED_BACKEND=recorded needs EMBED_FIXTURE (a recorded .npz)")
+        return cls(path)
+
+    @staticmethod
+    def record(backend: EmbeddingBackend, texts: List[str], path: str, batch_size: int = 32) -> None:
+        from utils.embedding_cache import normalize_text
+
+        # keyed the way IntentEngine asks for them
+        texts = list(dict.fromkeys(normalize_text(t) for t in texts))
+        vecs = []
+        for i in range(0, len(texts), batch_size):
+            vecs.extend(backend.embed(texts[i:i + batch_size]))
+        np.savez_compressed(
+            path,
+            texts=np.array(texts),
+            vectors=np.vstack(vecs).astype(np.float16),
+            backend=backend.name,
+            model=backend.model,
+            threshold=backend.threshold,
+        )
+
+    def _row(self, text: str) -> int:
+        from utils.embedding_cache import normalize_text
+
+        i = self.index.get(text)
+        if i is None:
+            i = self.index.get(normalize_text(text))
+        if i is None:
+            raise KeyError(f"{text!r} is not in {self.path}; re-record the fixture")
+        return i
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        return [self.vectors[self._row(t)] for t in texts]
+
+    async def aembed(self, texts: List[str]) -> List[np.ndarray]:
+        return self.embed(texts)
+
+
+BACKENDS = {
+    "cloudflare": CloudflareBackend,
+    "hash": HashedNgramBackend,
+    "onnx": OnnxBackend,
+    "recorded": RecordedBackend,
+}
+
+
+def backend_from_env(name: Optional[str] = None) -> EmbeddingBackend:
+    name = (name or os.environ.get("EMBED_BACKEND", "cloudflare")).lower()
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise RuntimeError(f"Unknown EMBED_BACKEND {name!r} (expected one of {', '.join(BACKENDS)})")
+    return cls.from_env()
+
+
+def exemplar_prefix(json_path: str, backend: EmbeddingBackend) -> str:
+    """utils/intent_embs.json -> utils/intent_embs (cloudflare) / utils/intent_embs.hash"""
+    prefix = os.path.splitext(json_path)[0]
+    return prefix if backend.name == "cloudflare" else f"{prefix}.{backend.name}"
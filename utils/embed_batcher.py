@@ -0,0 +1,120 @@
+import asyncio
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List
+
+import numpy as np
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into batched upstream calls.
+
+    Texts queue up for at most `window_ms` (or until `max_batch` are
+    waiting) and go out as one embed_fn(texts) call; the vectors are fanned
+    back out to every waiter. A text already queued or in flight is not
+    sent twice: later callers wait on the same future. max_batch=1
+    disables coalescing.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], Awaitable[List[np.ndarray]]],
+        window_ms: float = 5.0,
+        max_batch: int = 32,
+    ):
+        self.embed_fn = embed_fn
+        self.window = max(window_ms, 0.0) / 1000.0
+        self.max_batch = max(int(max_batch), 1)
+
+        self._loop = None
+        self._pending: List[str] = []
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._timer = None
+        self._tasks = set()
+
+        self.requests = 0
+        self.texts = 0
+        self.deduped = 0
+        self.batch_sizes: Counter = Counter()
+
+    def _bind_loop(self) -> None:
+        # futures are loop-bound; start fresh if we're now on another loop
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._pending = []
+            self._inflight = {}
+            self._timer = None
+            self._tasks = set()
+
+    async def embed(self, texts: List[str]) -> List[np.ndarray]:
+        self._bind_loop()
+        self.requests += 1
+        futures = []
+        for text in texts:
+            self.texts += 1
+            fut = self._inflight.get(text)
+            if fut is None:
+                fut = self._loop.create_future()
+                self._inflight[text] = fut
+                self._pending.append(text)
+                if len(self._pending) >= self.max_batch:
+                    self._flush()
+            else:
+                self.deduped += 1
+            futures.append(fut)
+
+        if self._pending and self._timer is None:
+            self._timer = self._loop.call_later(self.window, self._flush)
+
+        # shield: one cancelled caller must not cancel a future others share
+        return [await asyncio.shield(fut) for fut in futures]
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batch_sizes[len(batch)] += 1
+        task = self._loop.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[str]) -> None:
+        futures = [self._inflight[t] for t in batch]
+        try:
+            vecs = await self.embed_fn(batch)
+            if len(vecs) != len(batch):
+                raise ValueError(f"expected {len(batch)} embeddings, got {len(vecs)}")
+        except asyncio.CancelledError:
+            for fut in futures:
+                fut.cancel()
+            raise
+        except Exception as exc:
+            for fut in futures:
+                if not fut.done():
+                    fut.set_exception(exc)
+                    # marked retrieved so abandoned waiters don't log noise
+                    fut.exception()
+        else:
+            for fut, vec in zip(futures, vecs):
+                if not fut.done():
+                    fut.set_result(vec)
+        finally:
+            for text, fut in zip(batch, futures):
+                if self._inflight.get(text) is fut:
+                    del self._inflight[text]
+
+    def stats(self) -> dict:
+        batches = sum(self.batch_sizes.values())
+        sent = sum(size * n for size, n in self.batch_sizes.items())
+        return {
+            "requests": self.requests,
+            "texts": self.texts,
+            "deduped": self.deduped,
+            "batches": batches,
+            "mean_batch": sent / batches if batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+        }
@@ -0,0 +1,113 @@
+import os
+import re
+import hashlib
+import numpy as np
+from typing import Optional
+
+from utils.kv_store import MemoryLRU, SQLiteKV
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WS.sub(" ", (text or "").strip().lower())
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for query embeddings.
+
+    memory: per-process LRU with TTL (hot phrasings)
+    disk:   SQLite file shared by all workers, survives restarts
+
+    Keys are "<model>:<sha1(normalized text)>", so an EMBED_MODEL change can
+    never return a vector from another model; rows of other models are purged
+    when the cache is opened (see invalidate_other_models).
+    """
+
+    def __init__(self, model: str, memory: MemoryLRU = None, disk: Optional[SQLiteKV] = None):
+        self.model = model
+        self.memory = memory if memory is not None else MemoryLRU(maxsize=512)
+        self.disk = disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk is not None:
+            self.invalidate_other_models()
+
+    @classmethod
+    def from_env(cls, model: str) -> "EmbeddingCache":
+        ttl = float(os.getenv("EMBED_CACHE_TTL", "86400")) or None
+        memory = MemoryLRU(maxsize=int(os.getenv("EMBED_CACHE_SIZE", "512")), ttl=ttl)
+
+        # EMBED_CACHE_PATH="" disables the shared disk tier
+        path = os.getenv("EMBED_CACHE_PATH", ".cache/embeddings.sqlite")
+        disk = None
+        if path:
+            disk = SQLiteKV(
+                path,
+                table="embeddings",
+                max_rows=int(os.getenv("EMBED_CACHE_DISK_ROWS", "100000")),
+                ttl=float(os.getenv("EMBED_CACHE_DISK_TTL", "2592000")) or None,
+            )
+        return cls(model, memory=memory, disk=disk)
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self.model}:{digest}"
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self.key(text)
+        vec = self.memory.get(key)
+        if vec is not None:
+            self.hits += 1
+            return vec
+
+        if self.disk is not None:
+            blob = self.disk.get(key)
+            if blob is not None:
+                vec = np.frombuffer(blob, dtype=np.float32)
+                self.memory.set(key, vec)
+                self.hits += 1
+                self.disk_hits += 1
+                return vec
+
+        self.misses += 1
+        return None
+
+    def set(self, text: str, vec: np.ndarray) -> None:
+        key = self.key(text)
+        vec = np.asarray(vec, dtype=np.float32)
+        self.memory.set(key, vec)
+        if self.disk is not None:
+            self.disk.set(key, vec.tobytes())
+
+    def invalidate(self, text: str) -> None:
+        key = self.key(text)
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def invalidate_other_models(self) -> int:
+        """Drop disk rows written for any model other than self.model."""
+        if self.disk is None:
+            return 0
+        return self.disk.delete_prefix(f"{self.model}:", keep=True)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "model": self.model,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
@@ -0,0 +1,17 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded pool for the work that has to stay synchronous (firebase_admin token
+# verification, dateparser). Keeps it off the event loop without letting a
+# slow dependency spawn unbounded threads.
+_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BLOCKING_POOL_SIZE", "16")),
+    thread_name_prefix="blocking",
+)
+
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,97 @@
+import os
+import json
+import numpy as np
+from typing import Dict, List, Tuple
+
+# Binary exemplar store:
+#   <prefix>.npy            float32 (N, D) matrix, rows L2-normalized,
+#                           rows of one intent are contiguous
+#   <prefix>.manifest.json  {"model", "dim", "rows", "intents": [{"name", "count"}]}
+#
+# The .npy is opened with mmap_mode="r" so every uvicorn worker shares the
+# same page-cache pages instead of holding its own parsed copy.
+
+FORMAT_VERSION = 1
+
+
+def store_paths(prefix: str) -> Tuple[str, str]:
+    return f"{prefix}.npy", f"{prefix}.manifest.json"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def _from_mapping(raw: Dict[str, List[List[float]]]) -> Tuple[List[str], List[int], np.ndarray]:
+    intents, counts, blocks = [], [], []
+    for intent, vec_list in raw.items():
+        if not vec_list:
+            continue
+        intents.append(intent)
+        counts.append(len(vec_list))
+        blocks.append(np.asarray(vec_list, dtype=np.float32))
+    return intents, counts, _normalize_rows(np.vstack(blocks))
+
+
+def save_exemplars(raw: Dict[str, List[List[float]]], prefix: str, model: str) -> Tuple[str, str]:
+    intents, counts, matrix = _from_mapping(raw)
+    npy_path, manifest_path = store_paths(prefix)
+
+    np.save(npy_path, np.ascontiguousarray(matrix))
+    manifest = {
+        "version": FORMAT_VERSION,
+        "model": model,
+        "dim": int(matrix.shape[1]),
+        "rows": int(matrix.shape[0]),
+        "normalized": True,
+        "intents": [{"name": n, "count": c} for n, c in zip(intents, counts)],
+    }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    return npy_path, manifest_path
+
+
+def convert_json(json_path: str, prefix: str, model: str) -> Tuple[str, str]:
+    with open(json_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return save_exemplars(raw, prefix, model)
+
+
+def load_exemplars(json_path: str, model: str = None) -> Tuple[List[str], List[int], np.ndarray]:
+    """
+    Returns (intents, counts, matrix) with matrix rows L2-normalized.
+    Prefers the memory-mapped binary store next to json_path and falls back
+    to parsing the JSON file.
+    """
+    prefix = os.path.splitext(json_path)[0]
+    npy_path, manifest_path = store_paths(prefix)
+
+    if os.path.exists(npy_path) and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if model and manifest.get("model") and manifest["model"] != model:
+            raise RuntimeError(
+                f"{npy_path} was built with {manifest['model']} but EMBED_MODEL is {model}. "
+                "Re-run precompute_intents.py."
+            )
+
+        matrix = np.load(npy_path, mmap_mode="r")
+        if matrix.shape != (manifest["rows"], manifest["dim"]):
+            raise RuntimeError(f"{npy_path} does not match {manifest_path}")
+
+        intents = [item["name"] for item in manifest["intents"]]
+        counts = [item["count"] for item in manifest["intents"]]
+        return intents, counts, matrix
+
+    if not os.path.exists(json_path):
+        raise RuntimeError(
+            f"{json_path} not found. Run precompute_intents.py locally and commit the file."
+        )
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return _from_mapping(raw)
@@ -0,0 +1,254 @@
+import os
+import time
+import random
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+# httpx and requests (~0.1s each) are imported where clients are built,
+# so importing the app doesn't pay for them
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    closed    -> calls flow; failure_threshold consecutive failures open it
+    open      -> calls fail fast with CircuitOpenError for reset_timeout s
+    half_open -> one probe call; success closes, failure re-opens
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def before_call(self) -> bool:
+        """Raises CircuitOpenError to fail fast; True if this call is the half-open probe."""
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is half-open")
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        # a probe that ended without a verdict (cancelled): let the next call probe
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+def http2_available() -> bool:
+    try:  # HTTP/2 needs the optional h2 package
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def is_retryable(exc: BaseException) -> bool:
+    import httpx
+
+    if isinstance(exc, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRY_STATUS
+    # openai SDK errors, without importing it here
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRY_STATUS
+    return type(exc).__name__ in {"APIConnectionError", "APITimeoutError"}
+
+
+class Upstream:
+    """
+    Outbound policy for one backend (embeddings, LLM):
+
+    - one pooled keep-alive httpx.AsyncClient (HTTP/2 when h2 is installed)
+    - at most max_concurrency calls in flight
+    - retries of retryable failures with full-jitter exponential backoff
+    - optional hedging: if an attempt has not finished after hedge_after
+      seconds, a second one is started and the first result wins
+    - a circuit breaker so a dead upstream fails fast (CircuitOpenError)
+    """
+
+    def __init__(self, name: str, timeout: float = 10.0, max_concurrency: int = 32,
+                 retries: int = 2, backoff: float = 0.1, max_backoff: float = 2.0,
+                 hedge_after: Optional[float] = None, breaker: CircuitBreaker = None):
+        self.name = name
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker(name)
+        self._client = None
+        self._sem = None
+        self.calls = 0
+        self.retried = 0
+        self.hedged = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, timeout: float, hedge_ms: float = 0) -> "Upstream":
+        def env(key, default):
+            return float(os.getenv(f"{prefix}_{key}", default))
+
+        hedge = env("HEDGE_MS", hedge_ms)
+        return cls(
+            name,
+            timeout=env("TIMEOUT", timeout),
+            max_concurrency=int(env("MAX_CONCURRENCY", 32)),
+            retries=int(env("RETRIES", 2)),
+            hedge_after=hedge / 1000 if hedge else None,
+            breaker=CircuitBreaker(
+                name,
+                failure_threshold=int(env("BREAKER_FAILURES", 5)),
+                reset_timeout=env("BREAKER_RESET_S", 30),
+            ),
+        )
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        # created lazily so it binds to the running event loop
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                http2=http2_available(),
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def call(self, fn: Callable[[], Awaitable], hedge: bool = True):
+        """Run fn() (a fresh attempt per call) under the upstream's policy."""
+        probe = self.breaker.before_call()
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+        self.calls += 1
+
+        attempt = 0
+        try:
+            while True:
+                try:
+                    async with self._sem:
+                        if hedge and self.hedge_after:
+                            result = await self._hedged(fn)
+                        else:
+                            result = await fn()
+                    self.breaker.record_success()
+                    return result
+                except Exception as e:
+                    retryable = is_retryable(e)
+                    if attempt >= self.retries or not retryable:
+                        self.failed += 1
+                        # only upstream-health failures count against the breaker;
+                        # a 4xx means the upstream answered
+                        if retryable:
+                            self.breaker.record_failure()
+                        else:
+                            self.breaker.record_success()
+                        raise
+                attempt += 1
+                self.retried += 1
+                cap = min(self.max_backoff, self.backoff * (2 ** attempt))
+                await asyncio.sleep(random.uniform(0, cap))
+        finally:
+            # cancelled mid-probe (e.g. a client left /chatbot/stream): no verdict,
+            # but the probe slot must not stay taken
+            if probe:
+                self.breaker.release_probe()
+
+    async def _hedged(self, fn):
+        first = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        self.hedged += 1
+        second = asyncio.ensure_future(fn())
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def post_json(self, url: str, json: dict, headers: dict = None):
+        async def attempt():
+            resp = await self.client.post(url, json=json, headers=headers)
+            resp.raise_for_status()
+            return resp.json()
+
+        return await self.call(attempt)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retried": self.retried,
+            "hedged": self.hedged,
+            "failed": self.failed,
+            "breaker": self.breaker.state,
+            "rejected": self.breaker.rejected,
+        }
+
+
+def sync_session(pool_size: int = 16, retries: int = 3) -> "requests.Session":
+    """requests.Session with keep-alive pooling and exponential-backoff retries."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.3,
+        status_forcelist=sorted(RETRY_STATUS),
+        allowed_methods=None,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
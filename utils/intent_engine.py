@@ -1,190 +1,248 @@
-import os, json, requests, numpy as np
-from functools import lru_cache
+import os, numpy as np
 from typing import List, Dict
 
+from utils.intents import INTENT_MAP
+from utils.exemplar_store import load_exemplars
+from utils.embedding_cache import EmbeddingCache, normalize_text
+from utils.lexical_intent import LexicalMatcher
+from utils.embed_backends import backend_from_env, exemplar_prefix
+from utils.embed_batcher import EmbeddingBatcher
+from utils.metrics import INTENT_TIERS, log_sampled
+from utils.stage_graph import stage_span
+
 class IntentEngine:
-    def __init__(self, emb_path: str = "utils/intent_embs.json"):
-        # same intent map (for reference / future edits)
-        self.intent_map: Dict[str, List[str]] = {
-    "greeting": [
-        "hi", "hello", "hey", "hii", "yo", "good morning", 
-        "good evening", "good night", "hey there", "hola"
-    ],
-
-    "acknowledgment": [
-        "ok", "okay", "thanks", "thank you", "got it", 
-        "sounds good", "great", "cool", "understood"
-    ],
-
-    "budget_query": [
-        "what's my budget", "budget status", "how much can i spend",
-        "budget left", "remaining budget", "tell me my budget",
-        "current budget", "month budget", "budget details"
-    ],
-
-    "set_budget": [
-        "set my budget", "i want to set a budget", 
-        "update budget", "change my budget", 
-        "set monthly budget", "create a budget"
-    ],
-
-    "expense_query": [
-        "expenses", "how much did i spend", "show my spending",
-        "my last transactions", "recent expenses", 
-        "how much did i pay", "transaction history"
-    ],
-
-    "add_expense": [
-        "add an expense", "record a spending", "note this expense",
-        "log an expense", "i spent money", "save this expense"
-    ],
-
-    "expense_analysis": [
-        "where did i spend most", "top spending category", 
-        "spending analysis", "expense breakdown", 
-        "spending habits", "biggest expense", 
-        "category-wise spending", "monthly spending analysis"
-    ],
-
-    "investment_query": [
-        "investments", "portfolio", "sip", "mutual fund",
-        "suggest me some good stocks", "where to invest",
-        "investment ideas", "best investment options",
-        "stock suggestions", "investment plan"
-    ],
-
-    "investment_performance": [
-        "investment returns", "portfolio performance",
-        "how are my investments doing", "profit and loss in investments",
-        "investment growth"
-    ],
-
-    "savings_advice": [
-        "how to save", "reduce spending", "save more",
-        "cut costs", "save money", "savings tips",
-        "financial advice", "ways to save", 
-        "how can i save money"
-    ],
-
-    "credit_card_query": [
-        "recommended credit card", "best credit card",
-        "which credit card should i get", "show me credit card options",
-        "credit card suggestion", "card recommendation"
-    ],
-
-    "credit_card_benefits": [
-        "card benefits", "what are the rewards", "reward points",
-        "cashback details", "card features"
-    ],
-
-    "bill_query": [
-        "upcoming bills", "pending bills", "show my bills",
-        "when is my bill due", "bill reminders", "due payments"
-    ],
-
-    "followup": [
-        "tell me more", "and what about", "can you explain",
-        "more details", "can you elaborate", "what else", 
-        "continue", "go on"
-    ],
-
-    "goodbye": [
-        "bye", "goodbye", "see you", "talk to you later",
-        "bye bye", "catch you later"
-    ],
-
-    "unknown": [
-        "nonsense", "??", "what are you saying",
-        "i don't know", "random", "confusing"
-    ]
-}
-        self.threshold: float = 0.6
-
-        # --- Cloudflare env config ---
-        self.account_id = os.environ.get("CF_ACCOUNT_ID", "")
-        default_base = (
-            f"https://api.cloudflare.com/client/v4/accounts/{self.account_id}/ai/run"
-            if self.account_id else ""
+    def __init__(self, emb_path: str = "utils/intent_embs.json", backend=None):
+        self.intent_map: Dict[str, List[str]] = INTENT_MAP
+
+        # --- local lexical tiers (exact / fuzzy) before the remote embedding ---
+        # LEXICAL_THRESHOLD is a rapidfuzz ratio (0-100); above 100 disables fuzzy
+        self.lexical = LexicalMatcher(
+            self.intent_map,
+            threshold=float(os.environ.get("LEXICAL_THRESHOLD", "80")),
+            max_tokens=int(os.environ.get("LEXICAL_MAX_TOKENS", "4")),
+            # ratio points a fuzzy hit must lead every other intent's exemplars by
+            margin=float(os.environ.get("LEXICAL_MARGIN", "5")),
+        )
+        self.tier_counts: Dict[str, int] = {"exact": 0, "fuzzy": 0, "embedding": 0}
+
+        # --- embedding backend (EMBED_BACKEND: cloudflare | hash | onnx) ---
+        self.backend = backend if backend is not None else backend_from_env()
+        self.backend.prepare(p for samples in self.intent_map.values() for p in samples)
+        self.model = self.backend.model
+        self.threshold: float = float(os.environ.get("INTENT_THRESHOLD", self.backend.threshold))
+
+        # concurrent async misses coalesce into one batched call
+        # (EMBED_BATCH_WINDOW_MS, EMBED_BATCH_MAX; max 1 disables)
+        self.batcher = EmbeddingBatcher(
+            lambda texts: self._aembed_batch(texts),
+            window_ms=float(os.environ.get("EMBED_BATCH_WINDOW_MS", self.backend.batch_window_ms)),
+            max_batch=int(os.environ.get("EMBED_BATCH_MAX", "32")),
         )
-        self.base_url = os.environ.get("EMBED_BASE_URL", default_base)
-        self.model = os.environ.get("EMBED_MODEL", "@cf/baai/bge-m3")
-        self.api_key = os.environ.get("CF_API_TOKEN")
 
-        if not self.api_key:
-            raise RuntimeError("CF_API_TOKEN is not set")
-        if not self.base_url:
-            raise RuntimeError("EMBED_BASE_URL is not set (or CF_ACCOUNT_ID missing)")
+        # --- query embedding cache (memory LRU + shared SQLite tier) ---
+        # skipped for backends that embed faster than a cache lookup
+        self.embed_cache = EmbeddingCache.from_env(self.model) if self.backend.cacheable else None
 
         # --- load precomputed exemplar embeddings ---
-        if not os.path.exists(emb_path):
-            raise RuntimeError(
-                f"{emb_path} not found. Run precompute_intents.py locally and commit the file."
-            )
-
-        with open(emb_path, "r", encoding="utf-8") as f:
-            raw = json.load(f)
-
-        # convert to numpy arrays
-        self.intent_embs: Dict[str, List[np.ndarray]] = {
-            intent: [np.asarray(v, dtype=np.float32) for v in vec_list]
-            for intent, vec_list in raw.items()
-        }
+        # binary .npy store (memory-mapped, shared across workers) with JSON fallback;
+        # each backend has its own store (precompute_intents.py --backend ...)
+        self.emb_path = exemplar_prefix(emb_path, self.backend) + ".json"
+        try:
+            intents, counts, matrix = load_exemplars(self.emb_path, model=self.model)
+        except RuntimeError:
+            if self.backend.remote:
+                raise
+            # local backends are cheap enough to embed the exemplars at startup
+            intents, counts, matrix = self._embed_exemplars()
+        self._build_index(intents, counts, matrix)
+
+    def _embed_exemplars(self):
+        intents = [i for i, samples in self.intent_map.items() if samples]
+        counts = [len(self.intent_map[i]) for i in intents]
+        vecs = self._embed_batch([p for i in intents for p in self.intent_map[i]])
+        return intents, counts, self._normalize(np.vstack(vecs))
+
+    # ---------------------------
+    # Exemplar index: one L2-normalized matrix + intent label per row
+    # ---------------------------
+    def _build_index(self, intents: List[str], counts: List[int], matrix: np.ndarray) -> None:
+        self.intents: List[str] = intents
+        self.exemplar_matrix: np.ndarray = matrix
+        self.exemplar_labels: np.ndarray = np.repeat(
+            np.arange(len(intents), dtype=np.int32), counts
+        )
+        # rows of one intent are contiguous -> grouped max via reduceat
+        self._group_starts: np.ndarray = np.concatenate(
+            ([0], np.cumsum(counts)[:-1])
+        ).astype(np.intp)
 
     # ---------------------------
-    # Embedding via CF (ONLY for user text now)
+    # Embedding via the backend (ONLY for user text now)
     # ---------------------------
-    def _embed_batch(self, texts: list[str]) -> list[np.ndarray]:
+    def _embed_batch(self, texts: List[str]) -> List[np.ndarray]:
         if not texts:
             return []
+        return self.backend.embed(texts)
 
-        resp = requests.post(
-            f"{self.base_url}/{self.model}",
-            json={"text": texts},
-            headers={
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-            },
-            timeout=30,
-        )
-        resp.raise_for_status()
-        data = resp.json()
+    async def _aembed_batch(self, texts: List[str]) -> List[np.ndarray]:
+        if not texts:
+            return []
+        return await self.backend.aembed(texts)
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
 
-        # Workers AI common shape
-        try:
-            arr = data["result"]["data"]
-            return [
-                np.asarray(item["embedding"] if isinstance(item, dict) else item, dtype=np.float32)
-                for item in arr
-            ]
-        except Exception:
-            raise ValueError(f"Unexpected embeddings response shape: {data}")
-
-    @lru_cache(maxsize=512)
     def _embed_text(self, text: str) -> np.ndarray:
-        return self._embed_batch([text])[0]
+        return self._embed_texts([text])[0]
+
+    # cache lookups are local (memory / SQLite); only misses go to CF, in one batch
+    def _cache_lookup(self, texts: List[str]):
+        texts = [normalize_text(t) for t in texts]
+        if self.embed_cache is None:
+            return texts, [None] * len(texts), list(dict.fromkeys(texts))
+        out: List[np.ndarray] = [self.embed_cache.get(t) for t in texts]
+        missing = list(dict.fromkeys(t for t, v in zip(texts, out) if v is None))
+        return texts, out, missing
+
+    def _cache_fill(self, texts, out, missing, vecs) -> List[np.ndarray]:
+        fresh = dict(zip(missing, vecs))
+        if self.embed_cache is not None:
+            for t, vec in fresh.items():
+                self.embed_cache.set(t, vec)
+        return [v if v is not None else fresh[t] for t, v in zip(texts, out)]
+
+    def _embed_texts(self, texts: List[str]) -> List[np.ndarray]:
+        texts, out, missing = self._cache_lookup(texts)
+        if not missing:
+            return out
+        return self._cache_fill(texts, out, missing, self._embed_batch(missing))
+
+    async def _aembed_texts(self, texts: List[str]) -> List[np.ndarray]:
+        texts, out, missing = self._cache_lookup(texts)
+        if not missing:
+            return out
+        # the "embed" stage of the request's graph (time spent waiting, batched or not)
+        with stage_span("embed"):
+            vecs = await self.batcher.embed(missing)
+        return self._cache_fill(texts, out, missing, vecs)
 
     @staticmethod
-    def _cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
-        na, nb = np.linalg.norm(a), np.linalg.norm(b)
-        if na == 0 or nb == 0:
-            return 0.0
-        return float(np.dot(a, b) / (na * nb))
-
-    def detect_intent(self, user_input: str) -> str:
-        input_emb = self._embed_text(user_input)
-        best_score = -1.0
-        matched_intent = "unknown"
-
-        for intent, sample_embs in self.intent_embs.items():
-            if not sample_embs:
-                continue
-            score = max((self._cosine_sim(input_emb, e) for e in sample_embs), default=-1.0)
-            if score > best_score:
-                best_score = score
-                matched_intent = intent
+    def _normalize(vecs: np.ndarray) -> np.ndarray:
+        vecs = np.asarray(vecs, dtype=np.float32)
+        norms = np.linalg.norm(vecs, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vecs / norms
 
+    # ---------------------------
+    # Scoring: one matmul + grouped max per intent
+    # ---------------------------
+    def score_embeddings(self, embs: np.ndarray) -> np.ndarray:
+        """
+        Cosine score of each query against every intent.
+        embs: (D,) or (B, D)  ->  (n_intents,) or (B, n_intents)
+        """
+        q = self._normalize(embs)
+        sims = q @ self.exemplar_matrix.T
+        return np.maximum.reduceat(sims, self._group_starts, axis=-1)
+
+    def _result_from_scores(self, scores: np.ndarray) -> dict:
+        order = np.argsort(scores)[::-1]
+        best = int(order[0])
+        best_score = float(scores[best])
+        second_score = float(scores[order[1]]) if len(order) > 1 else -1.0
+
+        intent = self.intents[best]
         if best_score < self.threshold:
-            matched_intent = "unknown"
+            intent = "unknown"
+
+        return {
+            "intent": intent,
+            "score": best_score,
+            "margin": best_score - second_score,
+            "scores": {name: float(s) for name, s in zip(self.intents, scores)},
+            "tier": "embedding",
+        }
 
-        print(matched_intent)
-        return matched_intent
+    def _lexical_result(self, user_input: str):
+        hit = self.lexical.match(user_input)
+        if hit is None:
+            return None
+        return {
+            "intent": hit["intent"],
+            "score": hit["score"],
+            "margin": None,
+            "scores": {hit["intent"]: hit["score"]},
+            "tier": hit["tier"],
+        }
+
+    def score_intent(self, user_input: str) -> dict:
+        """
+        Returns {"intent", "score", "margin", "scores", "tier"} where margin is
+        the gap between the top two intents and tier is the stage that
+        answered ("exact", "fuzzy" or "embedding"). Embedding-tier results
+        also carry the query "embedding".
+        """
+        return self.score_intents([user_input])[0]
+
+    def score_intents(self, user_inputs: List[str]) -> List[dict]:
+        results, pending = self._lexical_pass(user_inputs)
+        if pending:
+            embs = np.vstack(self._embed_texts([user_inputs[i] for i in pending]))
+            self._embedding_pass(results, pending, embs)
+        return self._count_tiers(results)
+
+    async def ascore_intents(self, user_inputs: List[str]) -> List[dict]:
+        results, pending = self._lexical_pass(user_inputs)
+        if pending:
+            embs = np.vstack(await self._aembed_texts([user_inputs[i] for i in pending]))
+            self._embedding_pass(results, pending, embs)
+        return self._count_tiers(results)
+
+    async def ascore_intent(self, user_input: str) -> dict:
+        return (await self.ascore_intents([user_input]))[0]
+
+    def _lexical_pass(self, user_inputs: List[str]):
+        results = [self._lexical_result(text) for text in user_inputs]
+        pending = [i for i, r in enumerate(results) if r is None]
+        return results, pending
+
+    def _embedding_pass(self, results: list, pending: List[int], embs: np.ndarray) -> None:
+        for i, row, emb in zip(pending, self.score_embeddings(embs), embs):
+            results[i] = self._result_from_scores(row)
+            # the query vector, for callers that reuse it (response cache)
+            results[i]["embedding"] = emb
+
+    def _count_tiers(self, results: List[dict]) -> List[dict]:
+        for r in results:
+            self.tier_counts[r["tier"]] += 1
+            INTENT_TIERS.inc(r["tier"], r["intent"])
+        return results
+
+    def tier_stats(self) -> dict:
+        total = sum(self.tier_counts.values())
+        return {
+            tier: {"count": n, "share": n / total if total else 0.0}
+            for tier, n in self.tier_counts.items()
+        }
+
+    def stats(self) -> dict:
+        return {
+            "tiers": self.tier_stats(),
+            "batcher": self.batcher.stats(),
+            "backend": self.backend.stats(),
+            "embed_cache": self.embed_cache.stats() if self.embed_cache is not None else None,
+        }
+
+    @staticmethod
+    def _log_match(result: dict) -> None:
+        log_sampled("intent", intent=result["intent"], tier=result["tier"], score=result["score"])
+
+    def detect_intent(self, user_input: str) -> str:
+        result = self.score_intent(user_input)
+        self._log_match(result)
+        return result["intent"]
+
+    async def adetect_intent(self, user_input: str) -> str:
+        result = await self.ascore_intent(user_input)
+        self._log_match(result)
+        return result["intent"]
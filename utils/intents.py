@@ -0,0 +1,98 @@
+from typing import Dict, List
+
+# Intent exemplars: the single source for IntentEngine (lexical tier + exemplar
+# index) and precompute_intents.py (exemplar embeddings). Editing this means
+# re-running precompute_intents.py for the remote backend.
+INTENT_MAP: Dict[str, List[str]] = {
+    "greeting": [
+        "hi", "hello", "hey", "hii", "yo", "good morning", 
+        "good evening", "good night", "hey there", "hola"
+    ],
+
+    "acknowledgment": [
+        "ok", "okay", "thanks", "thank you", "got it", 
+        "sounds good", "great", "cool", "understood"
+    ],
+
+    "budget_query": [
+        "what's my budget", "budget status", "how much can i spend",
+        "budget left", "remaining budget", "tell me my budget",
+        "current budget", "month budget", "budget details"
+    ],
+
+    "set_budget": [
+        "set my budget", "i want to set a budget", 
+        "update budget", "change my budget", 
+        "set monthly budget", "create a budget"
+    ],
+
+    "expense_query": [
+        "expenses", "how much did i spend", "show my spending",
+        "my last transactions", "recent expenses", 
+        "how much did i pay", "transaction history"
+    ],
+
+    "add_expense": [
+        "add an expense", "record a spending", "note this expense",
+        "log an expense", "i spent money", "save this expense"
+    ],
+
+    "expense_analysis": [
+        "where did i spend most", "top spending category", 
+        "spending analysis", "expense breakdown", 
+        "spending habits", "biggest expense", 
+        "category-wise spending", "monthly spending analysis"
+    ],
+
+    "investment_query": [
+        "investments", "portfolio", "sip", "mutual fund",
+        "suggest me some good stocks", "where to invest",
+        "investment ideas", "best investment options",
+        "stock suggestions", "investment plan"
+    ],
+
+    "investment_performance": [
+        "investment returns", "portfolio performance",
+        "how are my investments doing", "profit and loss in investments",
+        "investment growth"
+    ],
+
+    "savings_advice": [
+        "how to save", "reduce spending", "save more",
+        "cut costs", "save money", "savings tips",
+        "financial advice", "ways to save", 
+        "how can i save money"
+    ],
+
+    "credit_card_query": [
+        "recommended credit card", "best credit card",
+        "which credit card should i get", "show me credit card options",
+        "credit card suggestion", "card recommendation"
+    ],
+
+    "credit_card_benefits": [
+        "card benefits", "what are the rewards", "reward points",
+        "cashback details", "card features"
+    ],
+
+    "bill_query": [
+        "upcoming bills", "pending bills", "show my bills",
+        "when is my bill due", "bill reminders", "due payments"
+    ],
+
+    "followup": [
+        "tell me more", "and what about", "can you explain",
+        "more details", "can you elaborate", "what else", 
+        "continue", "go on"
+    ],
+
+    "goodbye": [
+        "bye", "goodbye", "see you", "talk to you later",
+        "bye bye", "catch you later"
+    ],
+
+    "unknown": [
+        "nonsense", "??", "what are you saying",
+        "i don't know", "random", "confusing"
+    ]
+}
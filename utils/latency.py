@@ -0,0 +1,26 @@
+import threading
+from collections import deque
+
+
+class LatencyWindow:
+    """Most recent latency samples (ms) with percentile summaries."""
+
+    def __init__(self, maxlen: int = 2048):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+            self.count += 1
+
+    def summary(self) -> dict:
+        import numpy as np
+
+        with self._lock:
+            samples = np.fromiter(self._samples, dtype=np.float64)
+        if samples.size == 0:
+            return {"count": self.count, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {"count": self.count, "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
@@ -0,0 +1,82 @@
+import re
+from typing import Dict, List, Optional
+
+from rapidfuzz import fuzz, process
+from rapidfuzz.distance import Levenshtein
+
+_NON_WORD = re.compile(r"[^a-z0-9' ]+")
+_WS = re.compile(r"\s+")
+
+
+def normalize_phrase(text: str) -> str:
+    s = _NON_WORD.sub(" ", (text or "").lower())
+    return _WS.sub(" ", s).strip()
+
+
+class LexicalMatcher:
+    """
+    Cheap local tiers in front of the embedding model.
+
+    exact: normalized prompt equals a normalized exemplar ("Hi!" -> "hi")
+    fuzzy: short prompt with fuzz.ratio >= threshold against an exemplar
+           ("thnaks" -> "thanks")
+
+    Only short prompts (<= max_tokens words) are fuzzy matched; longer ones
+    carry slots and phrasing that need the embedding model. A fuzzy match
+    must also be a typo of the exemplar (same word count, each word within
+    a small edit distance: "whats my budjet", not "my budget" -> "set my
+    budget") and beat the best exemplar of any other intent by `margin`
+    ratio points; anything else falls through to the embedding tier.
+    """
+
+    def __init__(self, intent_map: Dict[str, List[str]], threshold: float = 80.0, max_tokens: int = 4,
+                 margin: float = 5.0):
+        self.threshold = threshold
+        self.max_tokens = max_tokens
+        self.margin = margin
+
+        self.phrase_to_intent: Dict[str, str] = {}
+        for intent, samples in intent_map.items():
+            for sample in samples:
+                phrase = normalize_phrase(sample)
+                if phrase:
+                    self.phrase_to_intent.setdefault(phrase, intent)
+        self._choices = list(self.phrase_to_intent)
+
+    def match(self, text: str) -> Optional[dict]:
+        phrase = normalize_phrase(text)
+        if not phrase:
+            return None
+
+        intent = self.phrase_to_intent.get(phrase)
+        if intent is not None:
+            return {"intent": intent, "score": 1.0, "tier": "exact"}
+
+        if len(phrase.split()) > self.max_tokens:
+            return None
+
+        # everything close enough to matter for the margin, best first
+        hits = process.extract(
+            phrase, self._choices, scorer=fuzz.ratio,
+            score_cutoff=self.threshold - self.margin, limit=None,
+        )
+        best = next((h for h in hits if h[1] >= self.threshold and is_typo(phrase, h[0])), None)
+        if best is None:
+            return None
+        choice, score, _ = best
+        intent = self.phrase_to_intent[choice]
+        rival = max((s for c, s, _ in hits if self.phrase_to_intent[c] != intent), default=0.0)
+        if score - rival < self.margin:
+            return None
+        return {"intent": intent, "score": score / 100.0, "tier": "fuzzy"}
+
+
+def is_typo(phrase: str, exemplar: str) -> bool:
+    """Same word count and every word within 1 edit (2 for words over 3 letters)."""
+    words, target = phrase.split(), exemplar.split()
+    if len(words) != len(target):
+        return False
+    return all(
+        Levenshtein.distance(w, t) <= (1 if len(t) <= 3 else 2)
+        for w, t in zip(words, target)
+    )
@@ -1,18 +1,101 @@
 import os
-from openai import OpenAI
+import time
 from dotenv import load_dotenv
+
+from utils.http_client import Upstream
+from utils.latency import LatencyWindow
+
 load_dotenv()
-client = OpenAI(
-    api_key=os.getenv("GROQ_API_KEY"),
-    base_url="https://api.groq.com/openai/v1"
-)
+
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+
+# retries / breaker live in the upstream policy, not in the SDK
+# (LLM_TIMEOUT, LLM_RETRIES, LLM_HEDGE_MS, LLM_BREAKER_*)
+upstream = Upstream.from_env("llm", "LLM", timeout=30.0)
+
+# the openai SDK takes ~0.5s to import: clients are built on first use
+# (or by warmup() in the background at startup)
+_clients = {}
+
+
+def get_client():
+    if "sync" not in _clients:
+        from openai import OpenAI
+
+        _clients["sync"] = OpenAI(
+            api_key=os.getenv("GROQ_API_KEY"),
+            base_url=LLM_BASE_URL
+        )
+    return _clients["sync"]
+
+
+def get_async_client():
+    if "async" not in _clients:
+        from openai import AsyncOpenAI
+
+        _clients["async"] = AsyncOpenAI(
+            api_key=os.getenv("GROQ_API_KEY"),
+            base_url=LLM_BASE_URL,
+            http_client=upstream.client,
+            max_retries=0
+        )
+    return _clients["async"]
+
+
+def warmup():
+    get_async_client()
+
+
+async def aclose():
+    await upstream.aclose()
+
+
+def _messages(prompt):
+    return [
+        {"role": "system", "content": "You are a helpful finance assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
 
 def ask_llm(prompt):
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[
-            {"role": "system", "content": "You are a helpful finance assistant."},
-            {"role": "user", "content": prompt}
-        ]
+    response = get_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=_messages(prompt)
     )
     return response.choices[0].message.content
+
+
+async def ask_llm_async(prompt):
+    response = await upstream.call(lambda: get_async_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=_messages(prompt)
+    ))
+    return response.choices[0].message.content
+
+
+# time from opening the stream to its first token (LLM only; the route's
+# finance_chat_ttft_seconds counts from request arrival)
+ttft = LatencyWindow()
+
+
+async def ask_llm_stream(prompt):
+    """Yield content deltas as Groq produces them."""
+    start = time.perf_counter()
+    first = True
+    # the policy covers opening the stream; never hedge a generation
+    stream = await upstream.call(lambda: get_async_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=_messages(prompt),
+        stream=True
+    ), hedge=False)
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        if first:
+            ttft.record((time.perf_counter() - start) * 1000)
+            first = False
+        yield delta
@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import random
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Request metrics for the chat pipeline, without a client library:
+#   Histogram / Counter   labelled, thread-safe, Prometheus text exposition
+#   REGISTRY              what GET /metrics renders; collectors turn the
+#                         components' existing stats() dicts into gauges
+#   observe_graph()       one StageGraph's timings -> per-stage / per-intent
+#                         histograms, optional OpenTelemetry spans and a
+#                         sampled structured log line (never the prompt text)
+#
+# METRICS_OTEL=1 exports spans through the OpenTelemetry API (configure an
+# SDK/exporter, e.g. with opentelemetry-instrument); REQUEST_LOG_SAMPLE is
+# the share of requests logged (errors always are).
+
+logger = logging.getLogger("finance.requests")
+
+# seconds; covers cache hits (~1 ms) up to slow LLM generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v != float("inf") else "+Inf"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1.0) -> None:
+        key = tuple(str(v) for v in labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_num(v)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues) -> None:
+        key = tuple(str(v) for v in labelvalues)
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def snapshot(self) -> Dict[Tuple[str, ...], dict]:
+        """{labelvalues: {"count", "sum"}} (for benchmarks and tests)."""
+        with self._lock:
+            return {k: {"count": sum(c), "sum": s} for k, (c, s) in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for le, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le_label = f'le="{_num(le)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self, prefix: str = "finance"):
+        self.prefix = prefix
+        self._metrics: list = []
+        self._collectors: List[Callable[[], Dict[str, Optional[dict]]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn: Callable[[], Dict[str, Optional[dict]]]) -> None:
+        """fn() -> {component: stats dict}; numbers become gauges."""
+        self._collectors.append(fn)
+
+    def _flatten(self, name: str, value, labels: dict, out: list) -> None:
+        if isinstance(value, dict):
+            for k, v in value.items():
+                k = str(k)
+                if k[:1].isdigit():
+                    # histogram-like dicts ({batch size: n}) become a label
+                    self._flatten(name, v, {**labels, "key": k}, out)
+                else:
+                    self._flatten(f"{name}_{_NAME_RE.sub('_', k)}", v, labels, out)
+        elif isinstance(value, bool):
+            out.append((name, labels, 1.0 if value else 0.0))
+        elif isinstance(value, (int, float)):
+            out.append((name, labels, float(value)))
+        elif isinstance(value, str):
+            # e.g. breaker state: one series per state, value 1
+            out.append((name, {**labels, "state": value}, 1.0))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        samples: list = []
+        for collect in self._collectors:
+            try:
+                components = collect()
+            except Exception:
+                logger.exception("metrics collector failed")
+                continue
+            for component, stats in components.items():
+                if stats is not None:
+                    self._flatten(f"{self.prefix}_{_NAME_RE.sub('_', component)}", stats, {}, samples)
+
+        typed = set()
+        for name, labels, value in samples:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "finance_chat_stage_seconds", "Duration of one pipeline stage.", ("route", "stage", "intent"),
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "finance_chat_request_seconds", "End-to-end request duration.", ("route", "intent", "status"),
+))
+TTFT_SECONDS = REGISTRY.register(Histogram(
+    "finance_chat_ttft_seconds", "Time from request arrival to the first streamed token.", ("intent",),
+))
+LLM_TTFT_SECONDS = REGISTRY.register(Histogram(
+    "finance_chat_llm_ttft_seconds", "Time from opening the LLM stream to its first token.", ("intent",),
+))
+INTENT_TIERS = REGISTRY.register(Counter(
+    "finance_intent_tier_total", "Intent decisions by answering tier.", ("tier", "intent"),
+))
+
+
+# ---------------------------
+# Sampled structured logging
+# ---------------------------
+LOG_SAMPLE = float(os.getenv("REQUEST_LOG_SAMPLE", "0.01"))
+
+
+def log_sampled(event: str, force: bool = False, **fields) -> None:
+    if not force and (LOG_SAMPLE <= 0 or random.random() >= LOG_SAMPLE):
+        return
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"event": event, **fields}, default=str))
+
+
+# ---------------------------
+# OpenTelemetry (optional)
+# ---------------------------
+_tracer = None
+if os.getenv("METRICS_OTEL", "0") == "1":
+    try:
+        from opentelemetry import trace as _otel_trace
+
+        _tracer = _otel_trace.get_tracer("finance.chatbot")
+    except ImportError:
+        logger.warning("METRICS_OTEL=1 but opentelemetry-api is not installed")
+
+
+def _export_spans(graph, route: str, attrs: dict, total_ms: float) -> None:
+    # spans are created after the fact from the graph's timings, so tracing
+    # adds nothing to the request path while it runs
+    t0 = graph.started_ns
+    root = _tracer.start_span(route, start_time=t0, attributes=attrs)
+    ctx = _otel_trace.set_span_in_context(root)
+    for name, t in graph.timings.items():
+        span = _tracer.start_span(
+            name, context=ctx, start_time=t0 + int(t["start_ms"] * 1e6), attributes={"stage": name}
+        )
+        span.end(end_time=t0 + int(t["end_ms"] * 1e6))
+    root.end(end_time=t0 + int(total_ms * 1e6))
+
+
+def observe_graph(graph, route: str, intent: Optional[str], status: int, total_ms: float,
+                  **fields) -> None:
+    """Record one finished request: stage and request histograms, spans, sampled log."""
+    intent = intent or "none"
+    for name, t in graph.timings.items():
+        STAGE_SECONDS.observe(t["duration_ms"] / 1000, route, name, intent)
+    REQUEST_SECONDS.observe(total_ms / 1000, route, intent, status)
+
+    if _tracer is not None and graph.started_ns is not None:
+        try:
+            _export_spans(graph, route, {"intent": intent, "status": status}, total_ms)
+        except Exception:
+            logger.debug("span export failed", exc_info=True)
+
+    log_sampled(
+        "request",
+        force=status >= 500,
+        route=route,
+        intent=intent,
+        status=status,
+        total_ms=round(total_ms, 1),
+        stages={n: round(t["duration_ms"], 1) for n, t in graph.timings.items()},
+        critical=graph.critical_path(),
+        **fields,
+    )
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -1,203 +1,72 @@
 import os
+import sys
 import json
-import requests
+import argparse
 import numpy as np
-from typing import Dict, List
+from typing import List
 from dotenv import load_dotenv
 
-# --- Load .env file ---
-load_dotenv()
-
-INTENT_MAP: Dict[str, List[str]] = {
-    "greeting": [
-        "hi", "hello", "hey", "hii", "yo", "good morning", 
-        "good evening", "good night", "hey there", "hola"
-    ],
-
-    "acknowledgment": [
-        "ok", "okay", "thanks", "thank you", "got it", 
-        "sounds good", "great", "cool", "understood"
-    ],
-
-    "budget_query": [
-        "what's my budget", "budget status", "how much can i spend",
-        "budget left", "remaining budget", "tell me my budget",
-        "current budget", "month budget", "budget details"
-    ],
-
-    "set_budget": [
-        "set my budget", "i want to set a budget", 
-        "update budget", "change my budget", 
-        "set monthly budget", "create a budget"
-    ],
-
-    "expense_query": [
-        "expenses", "how much did i spend", "show my spending",
-        "my last transactions", "recent expenses", 
-        "how much did i pay", "transaction history"
-    ],
-
-    "add_expense": [
-        "add an expense", "record a spending", "note this expense",
-        "log an expense", "i spent money", "save this expense"
-    ],
+# run as `python precompute_intents.py` from utils/ or `python -m utils.precompute_intents`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    "expense_analysis": [
-        "where did i spend most", "top spending category", 
-        "spending analysis", "expense breakdown", 
-        "spending habits", "biggest expense", 
-        "category-wise spending", "monthly spending analysis"
-    ],
+from utils.exemplar_store import save_exemplars, convert_json  # noqa: E402
+from utils.intents import INTENT_MAP  # noqa: E402
+from utils.embed_backends import BACKENDS, CloudflareBackend, backend_from_env, exemplar_prefix  # noqa: E402
 
-    "investment_query": [
-        "investments", "portfolio", "sip", "mutual fund",
-        "suggest me some good stocks", "where to invest",
-        "investment ideas", "best investment options",
-        "stock suggestions", "investment plan"
-    ],
-
-    "investment_performance": [
-        "investment returns", "portfolio performance",
-        "how are my investments doing", "profit and loss in investments",
-        "investment growth"
-    ],
-
-    "savings_advice": [
-        "how to save", "reduce spending", "save more",
-        "cut costs", "save money", "savings tips",
-        "financial advice", "ways to save", 
-        "how can i save money"
-    ],
-
-    "credit_card_query": [
-        "recommended credit card", "best credit card",
-        "which credit card should i get", "show me credit card options",
-        "credit card suggestion", "card recommendation"
-    ],
-
-    "credit_card_benefits": [
-        "card benefits", "what are the rewards", "reward points",
-        "cashback details", "card features"
-    ],
-
-    "bill_query": [
-        "upcoming bills", "pending bills", "show my bills",
-        "when is my bill due", "bill reminders", "due payments"
-    ],
-
-    "followup": [
-        "tell me more", "and what about", "can you explain",
-        "more details", "can you elaborate", "what else", 
-        "continue", "go on"
-    ],
-
-    "goodbye": [
-        "bye", "goodbye", "see you", "talk to you later",
-        "bye bye", "catch you later"
-    ],
+# --- Load .env file ---
+load_dotenv()
 
-    "unknown": [
-        "nonsense", "??", "what are you saying",
-        "i don't know", "random", "confusing"
-    ]
-}
 
-def embed_batch(texts: List[str]) -> List[List[float]]:
-    account_id = os.getenv("CF_ACCOUNT_ID")
-    api_key = os.getenv("CF_API_TOKEN")
-    base_url = os.getenv("EMBED_BASE_URL") or f"https://api.cloudflare.com/client/v4/accounts/{account_id}/ai/run"
-    model = os.getenv("EMBED_MODEL", "@cf/baai/bge-m3")
+def embed_batch(texts: List[str], backend=None) -> List[List[float]]:
+    backend = backend or backend_from_env()
+    return [np.asarray(v, dtype=np.float32).tolist() for v in backend.embed(texts)]
 
-    if not account_id:
-        raise RuntimeError("CF_ACCOUNT_ID missing in .env")
-    if not api_key:
-        raise RuntimeError("CF_API_TOKEN missing in .env")
 
-    resp = requests.post(
-        f"{base_url}/{model}",
-        json={"text": texts},
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-        timeout=60,
+def main():
+    parser = argparse.ArgumentParser(description="Precompute intent exemplar embeddings.")
+    parser.add_argument("--out", default="intent_embs.json", help="JSON output path")
+    parser.add_argument(
+        "--backend",
+        choices=sorted(BACKENDS),
+        help="embedding backend (default: EMBED_BACKEND or cloudflare)",
     )
-    resp.raise_for_status()
-    data = resp.json()
-
-    vectors = None
-
-    # 1) Workers AI common shape: {"result":{"data":[{"embedding":[...]}, ...]}}
-    try:
-        arr = data["result"]["data"]
-        if isinstance(arr, list) and arr:
-            if isinstance(arr[0], dict) and "embedding" in arr[0]:
-                vectors = [item["embedding"] for item in arr]
-            elif isinstance(arr[0], list):
-                vectors = arr
-    except Exception:
-        pass
-
-    # 2) OpenAI-style shape: {"data":[{"embedding":[...]}, ...]}
-    if vectors is None:
-        try:
-            arr = data["data"]
-            if isinstance(arr, list) and arr:
-                if isinstance(arr[0], dict) and "embedding" in arr[0]:
-                    vectors = [item["embedding"] for item in arr]
-                elif isinstance(arr[0], list):
-                    vectors = arr
-        except Exception:
-            pass
-
-    # 3) Raw list fallback
-    if vectors is None and isinstance(data, list) and data and isinstance(data[0], list):
-        vectors = data
-
-    if vectors is None:
-        raise ValueError(f"Unexpected embeddings response shape: {data}")
-
-    return vectors
-
-    account_id = os.getenv("CF_ACCOUNT_ID")
-    api_key = os.getenv("CF_API_TOKEN")
-    base_url = os.getenv("EMBED_BASE_URL") or f"https://api.cloudflare.com/client/v4/accounts/{account_id}/ai/run"
-    model = os.getenv("EMBED_MODEL", "@cf/baai/bge-m3")
-
-    if not account_id:
-        raise RuntimeError("CF_ACCOUNT_ID missing in .env")
-    if not api_key:
-        raise RuntimeError("CF_API_TOKEN missing in .env")
-
-    resp = requests.post(
-        f"{base_url}/{model}",
-        json={"text": texts},
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-        timeout=60,
+    parser.add_argument(
+        "--from-json",
+        metavar="PATH",
+        help="skip embedding; convert an existing intent_embs.json to the binary store",
     )
-    resp.raise_for_status()
-    data = resp.json()
-
-    arr = data["result"]["data"]
-    return [item["embedding"] for item in arr]
+    args = parser.parse_args()
+
+    if args.from_json:
+        # the JSON store is Cloudflare's; only its model name is needed, not a client
+        if args.backend not in (None, "cloudflare"):
+            parser.error("--from-json converts the cloudflare JSON store")
+        npy_path, manifest_path = convert_json(
+            args.from_json, os.path.splitext(args.from_json)[0], CloudflareBackend.model_from_env()
+        )
+        print(f"✔️ Converted {args.from_json} → {npy_path} + {manifest_path}")
+        return
+
+    backend = backend_from_env(args.backend)
+    backend.prepare(p for samples in INTENT_MAP.values() for p in samples)
+    model = backend.model
 
-
-def main():
     out = {}
     for intent, samples in INTENT_MAP.items():
         print(f"Embedding → {intent} ({len(samples)} samples)")
-        vecs = embed_batch(samples)
+        vecs = embed_batch(samples, backend)
         out[intent] = vecs
         print(f"done {intent}: {len(vecs)}")
 
-    with open("intent_embs.json", "w", encoding="utf-8") as f:
-        json.dump(out, f)
-
     print("\n✔️ Completed!")
-    print("✔️ Saved → intent_embs.json")
+    if backend.name == "cloudflare":
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(out, f)
+        print(f"✔️ Saved → {args.out}")
+
+    # local backends only get the binary store, next to the JSON: intent_embs.<backend>.npy
+    npy_path, manifest_path = save_exemplars(out, exemplar_prefix(args.out, backend), model)
+    print(f"✔️ Saved → {npy_path} + {manifest_path}")
     print("✔️ You can now use it in IntentEngine.\n")
 
 
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+from typing import Awaitable, Callable, Optional
+
+from utils.kv_store import MemoryLRU, SQLiteKV
+
+
+def _encode(entry) -> bytes:
+    # Firestore timestamps are not JSON types; profiles are read as plain values
+    return json.dumps(entry, default=str).encode("utf-8")
+
+
+class MemoryProfileBackend:
+    """Per-process: LRU by entry count and approximate JSON size."""
+
+    def __init__(self, maxsize: int = 10000, max_bytes: Optional[int] = 64 * 1024 * 1024):
+        self.lru = MemoryLRU(maxsize=maxsize, max_bytes=max_bytes, sizeof=lambda e: len(_encode(e)))
+
+    def get(self, uid):
+        return self.lru.get(uid)
+
+    def set(self, uid, entry):
+        self.lru.set(uid, entry)
+
+    def delete(self, uid):
+        self.lru.delete(uid)
+
+    def stats(self):
+        return self.lru.stats()
+
+
+class SharedProfileBackend:
+    """SQLite file shared by every worker on the host, so invalidations are seen by all."""
+
+    def __init__(self, path: str, max_rows: int = 100000):
+        self.kv = SQLiteKV(path, table="profiles", max_rows=max_rows)
+
+    def get(self, uid):
+        blob = self.kv.get(uid)
+        return json.loads(blob) if blob is not None else None
+
+    def set(self, uid, entry):
+        self.kv.set(uid, _encode(entry))
+
+    def delete(self, uid):
+        self.kv.delete(uid)
+
+    def stats(self):
+        return self.kv.stats()
+
+
+class ProfileCache:
+    """
+    Read-through cache of users/{uid} documents (budget, goal, risk_level,
+    context).
+
+    Entries are {"stored_at", "profile"} and are served while younger than
+    ttl. Writes made through this process (ContextEngine, the chat route)
+    keep it coherent with invalidate() / merge_context(); there is no push
+    invalidation, so a change written anywhere else (the app, the console,
+    another host's memory backend) shows up only once the entry expires,
+    i.e. within ttl (PROFILE_CACHE_TTL, 60s). Staleness is the age of an
+    entry when it is served.
+    """
+
+    def __init__(self, backend=None, ttl: float = 60.0):
+        self.backend = backend if backend is not None else MemoryProfileBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._staleness_sum = 0.0
+        self.max_staleness = 0.0
+
+    @classmethod
+    def from_env(cls) -> "ProfileCache":
+        ttl = float(os.getenv("PROFILE_CACHE_TTL", "60"))
+        if os.getenv("PROFILE_CACHE_BACKEND", "memory") == "shared":
+            backend = SharedProfileBackend(
+                os.getenv("PROFILE_CACHE_PATH", ".cache/profiles.sqlite"),
+                max_rows=int(os.getenv("PROFILE_CACHE_SIZE", "100000")),
+            )
+        else:
+            backend = MemoryProfileBackend(
+                maxsize=int(os.getenv("PROFILE_CACHE_SIZE", "10000")),
+                max_bytes=int(os.getenv("PROFILE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            )
+        return cls(backend, ttl=ttl)
+
+    async def get(self, uid: str, loader: Callable[[], Awaitable[dict]]) -> dict:
+        entry = self.backend.get(uid)
+        if entry is not None:
+            age = time.time() - entry["stored_at"]
+            if age < self.ttl:
+                self.hits += 1
+                self._staleness_sum += age
+                self.max_staleness = max(self.max_staleness, age)
+                return entry["profile"]
+
+        self.misses += 1
+        profile = await loader()
+        self.put(uid, profile)
+        return profile
+
+    def put(self, uid: str, profile: dict) -> None:
+        self.backend.set(uid, {"stored_at": time.time(), "profile": profile or {}})
+
+    def invalidate(self, uid: str) -> None:
+        self.invalidations += 1
+        self.backend.delete(uid)
+
+    def merge_context(self, uid: str, changes: dict) -> None:
+        """Apply a context write to the cached copy (keeps its stored_at)."""
+        entry = self.backend.get(uid)
+        if entry is None:
+            return
+        profile = dict(entry["profile"])
+        profile["context"] = {**profile.get("context", {}), **changes}
+        self.backend.set(uid, {"stored_at": entry["stored_at"], "profile": profile})
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "invalidations": self.invalidations,
+            "avg_staleness_s": self._staleness_sum / self.hits if self.hits else 0.0,
+            "max_staleness_s": self.max_staleness,
+            "backend": self.backend.stats(),
+        }
@@ -1,5 +1,157 @@
-def build_prompt(intent, user_prompt, context, transactions, no_txn_message=None):
+import os
+import numpy as np
+
+from utils.txn_analytics import NO_TIMESTAMP, TransactionFrame
+
+# ----------------------------------------------------
+# Token budgets (whole prompt, estimated tokens)
+#   PROMPT_TOKEN_BUDGET             default for every intent
+#   PROMPT_TOKEN_BUDGET_<INTENT>    e.g. PROMPT_TOKEN_BUDGET_EXPENSE_QUERY=2000
+#   PROMPT_TOP_N_ITEMS              raw line items attached after the aggregates
+# ----------------------------------------------------
+DEFAULT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "600"))
+PROMPT_TOKEN_BUDGETS = {
+    "expense_query": 1200,
+    "expense_analysis": 800,
+    "savings_advice": 800,
+    "budget_query": 300,
+    "followup": 800,
+}
+TOP_N_ITEMS = int(os.getenv("PROMPT_TOP_N_ITEMS", "20"))
+
+
+def token_budget(intent):
+    override = os.getenv(f"PROMPT_TOKEN_BUDGET_{intent.upper()}")
+    if override:
+        return int(override)
+    return PROMPT_TOKEN_BUDGETS.get(intent, DEFAULT_TOKEN_BUDGET)
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English + numbers; cheap and local
+    return (len(text) + 3) // 4
+
+
+def _truncate_to_tokens(text, tokens):
+    text = str(text or "")
+    limit = max(0, tokens) * 4
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+
+def _fit(lines, budget):
+    """Longest prefix of lines within budget tokens -> (kept, remaining budget)."""
+    kept = []
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if cost > budget:
+            break
+        kept.append(line)
+        budget -= cost
+    return kept, budget
+
+
+def _period_lines(frame, ttype):
+    days, sums = frame.daily_histogram(ttype)
+    if len(days) < 2:
+        return "", []
+    # monthly buckets for long windows, Monday-based weeks for short ones
+    if (days[-1] - days[0]).astype(int) > 62:
+        label, periods = "month", days.astype("datetime64[M]")
+    else:
+        day_num = days.astype(np.int64)
+        # 1970-01-01 was a Thursday (weekday 3)
+        label, periods = "week", (day_num - (day_num + 3) % 7).astype("datetime64[D]")
+    uniq, inverse = np.unique(periods, return_inverse=True)
+    totals = np.bincount(inverse, weights=sums)
+    prefix = "week of " if label == "week" else ""
+    return label, [f"- {prefix}{p}: ₹{t:.2f}" for p, t in zip(uniq, totals)]
+
+
+def _item_lines(frame, ttypes, top_n):
+    mask = np.zeros(len(frame), dtype=bool)
+    for ttype in ttypes:
+        mask |= frame.mask(ttype)
+    idx = np.flatnonzero(mask)
+    if idx.size > top_n:
+        idx = idx[np.argpartition(-frame.amount[idx], top_n - 1)[:top_n]]
+    idx = idx[np.argsort(-frame.amount[idx], kind="stable")]
+
+    lines = []
+    for i in idx:
+        ts = frame.ts[i]
+        day = f"{np.datetime64(int(ts), 'ms').astype('datetime64[D]')} " if ts != NO_TIMESTAMP else ""
+        kind = "" if len(ttypes) == 1 else f"{frame.type_name(i)} "
+        lines.append(f"- {day}{kind}{frame.categories[frame.category[i]]}: ₹{frame.amount[i]:.2f}")
+    return int(mask.sum()), lines
+
+
+def is_aggregated(frame):
+    """Rows are per-category totals (rollups: no timestamps), not transactions."""
+    return len(frame) > 0 and not (frame.ts != NO_TIMESTAMP).any()
+
+
+def summarize_transactions(frame, ttypes=("expense",), budget=DEFAULT_TOKEN_BUDGET, top_n=TOP_N_ITEMS,
+                           aggregated=False):
+    """
+    Aggregated view of the window within `budget` tokens:
+    totals, then per-category totals, then the top_n largest line items,
+    then per-period totals. Lower-priority sections are cut first.
+    With aggregated rows there is no transaction count and no line items.
+    """
+    totals, categories, periods = [], [], []
+    for ttype in ttypes:
+        mask = frame.mask(ttype)
+        n = int(mask.sum())
+        if not n:
+            continue
+        total = frame.amount[mask].sum()
+        totals.append(f"Total {ttype}: ₹{total:.2f}." if aggregated else
+                      f"Total {ttype}: ₹{total:.2f} across {n} transactions.")
+        ranked = frame.top_k(len(frame.categories), ttype=ttype)
+        categories.append((ttype, [f"- {c}: ₹{a:.2f} ({p:.1f}%)" for c, a, p in ranked]))
+        periods.append((ttype, *_period_lines(frame, ttype)))
+
+    if not totals:
+        return ""
+
+    out, budget = _fit(totals, budget)
+
+    for ttype, lines in categories:
+        kept, budget = _fit(lines, budget - 8)
+        if kept:
+            out.append(f"{ttype.capitalize()} by category:")
+            out.extend(kept)
+            if len(kept) < len(lines):
+                out.append(f"- … {len(lines) - len(kept)} more categories")
+
+    n_items, items = (0, []) if aggregated else _item_lines(frame, ttypes, top_n)
+    kept, budget = _fit(items, budget - 12)
+    if kept:
+        out.append(f"Largest transactions ({len(kept)} of {n_items}):")
+        out.extend(kept)
+
+    for ttype, label, lines in periods:
+        kept, budget = _fit(lines, budget - 8)
+        if kept and len(kept) == len(lines):
+            out.append(f"{ttype.capitalize()} by {label}:")
+            out.extend(kept)
+
+    return "\n".join(out)
+
+
+def build_prompt(intent, user_prompt, context, transactions, no_txn_message=None, frame=None,
+                 budget=None, aggregated=None):
     prompt_parts = ["You are a helpful Indian financial assistant.\n"]
+    # columnar view for the totals; callers that already built one pass it in
+    if frame is None:
+        frame = TransactionFrame.from_records(transactions)
+    # rollup rows (routes/chatbot.py) are category totals without timestamps
+    if aggregated is None:
+        aggregated = is_aggregated(frame)
+    data_label = "Totals by category" if aggregated else "Transactions"
+    budget = token_budget(intent) if budget is None else budget
+    # room left for the transaction block after the fixed text of the prompt
+    data_budget = budget - estimate_tokens(prompt_parts[0]) - estimate_tokens(user_prompt) - 40
 
     # ----------------------------------------------------
     # 0️⃣ IF NO TRANSACTIONS IN THIS PERIOD
@@ -18,11 +170,11 @@ def build_prompt(intent, user_prompt, context, transactions, no_txn_message=None
     # 1️⃣ BUDGET QUERY
     # ----------------------------------------------------
     if intent == "budget_query":
-        spent = sum(t['amount'] for t in transactions)
-        budget = context.get('budget', 0)
-        balance = budget - spent
+        spent = frame.total()
+        monthly_budget = context.get('budget', 0)
+        balance = monthly_budget - spent
         prompt_parts.append(
-            f"User's monthly budget is ₹{budget}, spent ₹{spent}, balance ₹{balance}.\n"
+            f"User's monthly budget is ₹{monthly_budget}, spent ₹{spent}, balance ₹{balance}.\n"
             "Provide a direct budget status update."
         )
 
@@ -30,10 +182,10 @@ def build_prompt(intent, user_prompt, context, transactions, no_txn_message=None
     # 2️⃣ EXPENSE QUERY
     # ----------------------------------------------------
     elif intent == "expense_query":
-        txn_summary = "\n".join([f"- {t['category']}: ₹{t['amount']}" for t in transactions])
+        txn_summary = summarize_transactions(frame, ("expense",), data_budget, aggregated=aggregated)
         prompt_parts.append(
             f"User asked about expenses.\n"
-            f"Transactions:\n{txn_summary}\n"
+            f"{data_label}:\n{txn_summary}\n"
             "Provide a clear expense summary."
         )
 
@@ -41,10 +193,13 @@ def build_prompt(intent, user_prompt, context, transactions, no_txn_message=None
     # 3️⃣ EXPENSE ANALYSIS
     # ----------------------------------------------------
     elif intent == "expense_analysis":
-        txn_summary = "\n".join([f"- {t['category']}: ₹{t['amount']}" for t in transactions])
+        txn_summary = summarize_transactions(frame, ("expense",), data_budget, aggregated=aggregated)
+        top = frame.top_k(1, ttype="expense")
+        top_line = f"Top category: {top[0][0]} ₹{top[0][1]:.2f} ({top[0][2]:.1f}% of total).\n" if top else ""
         prompt_parts.append(
             f"User wants expense analysis.\n"
-            f"Transactions:\n{txn_summary}\n"
+            f"{data_label}:\n{txn_summary}\n"
+            f"{top_line}"
             "State the top spending category, amount, and percentage of total."
         )
 
@@ -63,10 +218,10 @@ def build_prompt(intent, user_prompt, context, transactions, no_txn_message=None
     # 5️⃣ SAVINGS ADVICE
     # ----------------------------------------------------
     elif intent == "savings_advice":
-        txn_summary = "\n".join([f"- {t['category']}: ₹{t['amount']}" for t in transactions])
+        txn_summary = summarize_transactions(frame, ("income", "expense"), data_budget, aggregated=aggregated)
         prompt_parts.append(
             f"User asked for savings advice.\n"
-            f"Transactions:\n{txn_summary}\n"
+            f"{data_label}:\n{txn_summary}\n"
             "Provide actionable, realistic savings tips."
         )
 
@@ -76,7 +231,7 @@ def build_prompt(intent, user_prompt, context, transactions, no_txn_message=None
     elif intent == "followup":
         prompt_parts.append(
             f"Follow-up query: {user_prompt}.\n"
-            f"Previous bot response: {context.get('last_bot_response')}.\n"
+            f"Previous bot response: {_truncate_to_tokens(context.get('last_bot_response'), data_budget)}.\n"
             "Continue the conversation helpfully."
         )
 
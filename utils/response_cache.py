@@ -0,0 +1,175 @@
+import os
+import re
+import hashlib
+import time
+import numpy as np
+from typing import Optional
+
+from utils.embedding_cache import normalize_text
+from utils.kv_store import MemoryLRU, SQLiteKV
+
+# Seconds an LLM reply stays valid, per intent. Prompts for these intents
+# carry little or slowly changing user data.
+RESPONSE_TTLS = {
+    "greeting": 86400,
+    "acknowledgment": 86400,
+    "goodbye": 86400,
+    "credit_card_query": 3600,
+    "credit_card_benefits": 3600,
+    "investment_query": 3600,
+    "investment_performance": 600,
+    "bill_query": 600,
+}
+DEFAULT_TTL = 600
+
+# Personalised prompts over fresh data (transactions, last reply) and
+# requests to change data (the reply confirms the user's amount): never cached.
+BYPASS_INTENTS = {
+    "expense_query", "expense_analysis", "budget_query", "savings_advice", "followup",
+    "set_budget", "add_expense",
+}
+# Replies built from profile data: semantic matches only among the same user's entries.
+PER_USER_INTENTS = {"investment_query"}
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def response_ttl(intent: str) -> float:
+    override = os.getenv(f"RESPONSE_CACHE_TTL_{intent.upper()}")
+    if override:
+        return float(override)
+    return RESPONSE_TTLS.get(intent, DEFAULT_TTL)
+
+
+class ResponseCache:
+    """
+    Cache in front of the LLM call.
+
+    exact:    sha256(model + normalized final prompt) -> reply, memory LRU
+              backed by an optional SQLite file shared by workers
+    semantic: replies whose *user question* embedding is within
+              semantic_threshold cosine of the query, but only among
+              entries whose prompt is otherwise identical (same intent,
+              same profile data, same uid for PER_USER_INTENTS) and
+              whose question has the same numbers, so one user's data
+              never answers another and "5000" never answers "50000"
+    """
+
+    def __init__(self, memory: MemoryLRU = None, disk: Optional[SQLiteKV] = None,
+                 semantic_threshold: float = 0.97, semantic_bucket_size: int = 32):
+        self.memory = memory if memory is not None else MemoryLRU(maxsize=1024)
+        self.disk = disk
+        self.semantic_threshold = semantic_threshold
+        self.semantic_bucket_size = semantic_bucket_size
+        self._semantic = MemoryLRU(maxsize=1024)
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        memory = MemoryLRU(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")))
+        path = os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite")
+        disk = None
+        if path:
+            disk = SQLiteKV(path, table="responses",
+                            max_rows=int(os.getenv("RESPONSE_CACHE_DISK_ROWS", "50000")))
+        return cls(memory, disk, semantic_threshold=float(os.getenv("RESPONSE_CACHE_SEMANTIC", "0.97")))
+
+    @staticmethod
+    def key(final_prompt: str, model: str) -> str:
+        raw = f"{model}\x00{normalize_text(final_prompt)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _bucket(cls, intent: str, user_prompt: str, final_prompt: str, model: str, uid=None) -> str:
+        # the prompt minus the user's question: profile data + template
+        bucket = intent + ":" + cls.key(final_prompt.replace(user_prompt, "\x00"), model)
+        if intent in PER_USER_INTENTS:
+            bucket += ":" + (uid or "")
+        return bucket
+
+    @staticmethod
+    def _numbers(user_prompt: str) -> tuple:
+        return tuple(_NUMBER.findall(user_prompt))
+
+    def bypass(self, intent: str) -> bool:
+        return intent in BYPASS_INTENTS
+
+    def get(self, intent, user_prompt, final_prompt, model, query_emb=None, uid=None) -> Optional[str]:
+        if self.bypass(intent):
+            self.bypassed += 1
+            return None
+
+        key = self.key(final_prompt, model)
+        reply = self.memory.get(key)
+        if reply is None and self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                blob, expires_at = entry
+                reply = blob.decode("utf-8")
+                # keep the expiry put() gave it, not a fresh TTL from now
+                ttl = expires_at - time.time() if expires_at is not None else None
+                if ttl is None or ttl > 0:
+                    self.memory.set(key, reply, ttl=ttl)
+        if reply is not None:
+            self.hits += 1
+            return reply
+
+        if query_emb is not None and self.semantic_threshold:
+            bucket = self._bucket(intent, user_prompt, final_prompt, model, uid)
+            reply = self._semantic_get(bucket, query_emb, self._numbers(user_prompt))
+            if reply is not None:
+                self.hits += 1
+                self.semantic_hits += 1
+                return reply
+
+        self.misses += 1
+        return None
+
+    def put(self, intent, user_prompt, final_prompt, model, reply, query_emb=None, uid=None) -> None:
+        if self.bypass(intent) or not reply:
+            return
+        ttl = response_ttl(intent)
+        key = self.key(final_prompt, model)
+        self.memory.set(key, reply, ttl=ttl)
+        if self.disk is not None:
+            self.disk.set(key, reply.encode("utf-8"), ttl=ttl)
+        if query_emb is not None and self.semantic_threshold:
+            bucket = self._bucket(intent, user_prompt, final_prompt, model, uid)
+            self._semantic_put(bucket, query_emb, self._numbers(user_prompt), reply, ttl)
+
+    def _semantic_get(self, bucket: str, query_emb, numbers: tuple) -> Optional[str]:
+        entries = self._semantic.get(bucket)
+        if not entries:
+            return None
+        now = time.time()
+        live = [e for e in entries if e[2] > now and e[3] == numbers]
+        if not live:
+            return None
+        q = np.asarray(query_emb, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        sims = np.stack([e[0] for e in live]) @ q
+        best = int(np.argmax(sims))
+        return live[best][1] if sims[best] >= self.semantic_threshold else None
+
+    def _semantic_put(self, bucket: str, query_emb, numbers: tuple, reply: str, ttl: float) -> None:
+        q = np.asarray(query_emb, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        now = time.time()
+        entries = [e for e in (self._semantic.get(bucket) or []) if e[2] > now]
+        entries.append((q, reply, now + ttl, numbers))
+        self._semantic.set(bucket, entries[-self.semantic_bucket_size:])
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
@@ -1,7 +1,21 @@
 import re
-import dateparser
-from datetime import datetime
-from rapidfuzz import fuzz
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+
+# Compiled slot extraction for expense prompts.
+#
+#   1. tokens are canonicalized against one vocabulary (exact dict hit, else a
+#      single process.extractOne per unknown token, memoized per token), so
+#      "lats 15 dyas" -> "last 15 days" before any pattern runs
+#   2. precompiled patterns pick out windows, absolute ranges, "since ...",
+#      categories and amounts from the canonical text
+#   3. dateparser runs only when nothing matched and the prompt still looks
+#      like it carries a date (weekday, "on the 5th", ...)
+#
+# Results are memoized on (normalized prompt, today), so repeated and
+# retried prompts cost a dict lookup.
 
 _WORD_NUM = {
     "one":1,"two":2,"three":3,"four":4,"five":5,"six":6,"seven":7,"eight":8,"nine":9,"ten":10,
@@ -24,66 +38,351 @@ def _word_to_num(text: str):
     total += cur
     return total if total > 0 else None
 
-def _near(token: str, targets, threshold=80):
-    return any(fuzz.ratio(token, t) >= threshold for t in targets)
+# ---------------------------
+# Vocabulary
+# ---------------------------
+UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
 
-def extract_time_window(user_prompt: str):
-    """
-    Returns number of days inferred from user_prompt.
-    Fuzzy-robust against typos + supports numeric and word durations.
-    Returns None if no window found (caller can default).
-    """
-    s = (user_prompt or "").lower().strip()
-    now = datetime.now()
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+_MONTH_NUM = {m: i + 1 for i, m in enumerate(MONTHS)}
+_MONTH_NUM.update({m[:3]: i + 1 for i, m in enumerate(MONTHS)})
+_MONTH_NUM["sept"] = 9
 
-    # tokenize words/numbers
-    tokens = re.findall(r"[a-z0-9]+", s)
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
 
-    # detect approx "last/past/previous"
-    has_window_word = any(_near(t, ["last", "past", "previous", "prev"]) for t in tokens)
+# canonical category -> words that mean it
+CATEGORIES: Dict[str, List[str]] = {
+    "food": ["food", "restaurant", "restaurants", "dining", "eating", "lunch", "dinner",
+             "breakfast", "swiggy", "zomato", "takeout"],
+    "groceries": ["groceries", "grocery", "supermarket", "vegetables", "blinkit", "zepto", "bigbasket"],
+    "transport": ["transport", "travel", "uber", "ola", "cab", "cabs", "taxi", "fuel", "petrol",
+                  "diesel", "metro", "bus", "train", "flight", "flights"],
+    "shopping": ["shopping", "clothes", "clothing", "amazon", "flipkart", "myntra"],
+    "bills": ["bills", "bill", "utilities", "electricity", "water", "internet", "wifi", "recharge", "broadband"],
+    "rent": ["rent", "housing"],
+    "entertainment": ["entertainment", "movies", "movie", "netflix", "subscriptions", "subscription",
+                      "games", "gaming"],
+    "health": ["health", "medical", "medicine", "medicines", "doctor", "hospital", "pharmacy", "gym"],
+    "education": ["education", "tuition", "course", "courses", "books", "fees"],
+    "emi": ["emi", "loan", "loans"],
+}
+
+# every word we canonicalize to; the value is what the patterns see
+_VOCAB: Dict[str, str] = {}
+for _w in ("last", "past", "previous"):
+    _VOCAB[_w] = "last"
+_VOCAB["prev"] = "last"
+for _u in UNIT_DAYS:
+    _VOCAB[_u] = _u
+    _VOCAB[_u + "s"] = _u
+for _w in ("fortnight", "yesterday", "today", "since", "between", "from", "this", "ago",
+           "above", "below", "over", "under", "than", "more", "less", "rupees"):
+    _VOCAB[_w] = _w
+for _m in MONTHS + WEEKDAYS:
+    _VOCAB[_m] = _m
+for _cat, _words in CATEGORIES.items():
+    for _w in _words:
+        _VOCAB[_w] = "cat:" + _cat
+
+# fuzzy matching only for tokens long enough that a typo is unambiguous.
+# OSA similarity counts a transposition as one edit ("lats" -> "last",
+# "dyas" -> "days"); category words need a closer match ("sent" vs "rent").
+_FUZZY_MIN_LEN = 4
+_FUZZY_CHOICES = [w for w in _VOCAB if len(w) >= _FUZZY_MIN_LEN]
+FUZZY_THRESHOLD = 0.75
+CATEGORY_FUZZY_THRESHOLD = 0.85
+
+_TOKEN = re.compile(r"[a-z]+|\d+(?:[.,]\d+)*|[₹<>/-]")
+_ORDINAL = {"st", "nd", "rd", "th"}
+# what's left for dateparser once the patterns found nothing
+_DATE_HINT = re.compile(r"\b(?:ago|back|weekend)\b|\d")
+
+
+@lru_cache(maxsize=4096)
+def _canonical(token: str) -> str:
+    hit = _VOCAB.get(token)
+    if hit is not None:
+        return hit
+    if token.isalpha() and len(token) >= _FUZZY_MIN_LEN:
+        # month abbreviations stay exact ("mar" vs "may" is not a typo call we can make)
+        if token in _MONTH_NUM:
+            return MONTHS[_MONTH_NUM[token] - 1]
+        # imported on the first unknown word (or by warmup()), not with the app
+        from rapidfuzz import process
+        from rapidfuzz.distance import OSA
+
+        best = process.extractOne(
+            token, _FUZZY_CHOICES, scorer=OSA.normalized_similarity, score_cutoff=FUZZY_THRESHOLD
+        )
+        if best is not None:
+            hit = _VOCAB[best[0]]
+            if not hit.startswith("cat:") or best[1] >= CATEGORY_FUZZY_THRESHOLD:
+                return hit
+    elif token in _MONTH_NUM:
+        return MONTHS[_MONTH_NUM[token] - 1]
+    return token
+
+
+def _digits_for_words(tokens: List[str]) -> List[str]:
+    # "twenty one days" -> "21 days", "5th of march" -> "5 march"
+    out, run = [], []
+    for t in tokens + [""]:
+        if t in _WORD_NUM:
+            run.append(t)
+            continue
+        if run:
+            out.append(str(_word_to_num(" ".join(run))))
+            run = []
+        if out and out[-1].isdigit() and (t in _ORDINAL or t == "of"):
+            continue
+        if t:
+            out.append(t)
+    return out
+
+
+def normalize_prompt(user_prompt: str) -> str:
+    """Lowercased canonical token string the patterns run on."""
+    tokens = _TOKEN.findall((user_prompt or "").lower())
+    return " ".join(_digits_for_words([_canonical(t) for t in tokens]))
+
+
+# ---------------------------
+# Patterns (on the canonical string)
+# ---------------------------
+_UNIT = r"(day|week|month|year)"
+_MONTH = r"(" + "|".join(MONTHS) + r")"
+_NUM = r"(\d+(?:[.,]\d+)*)"
+_WEEKDAY = r"(" + "|".join(WEEKDAYS) + r")"
+
+_LAST_N = re.compile(r"\blast (?:(\d+) )?" + _UNIT + r"\b")
+_N_AGO = re.compile(r"\b(\d+|a) " + _UNIT + r" (?:ago|back)\b")
+_THIS = re.compile(r"\bthis " + _UNIT + r"\b")
+
+# dates: "5 march [2024]", "march 5 [2024]", "2024-03-05", "5/3/2024" (day first)
+_DATE = (
+    r"(?:(\d{1,2}) " + _MONTH + r"(?: (\d{4}))?"
+    r"|" + _MONTH + r" (\d{1,2})(?: (\d{4}))?"
+    r"|(\d{4}) - (\d{1,2}) - (\d{1,2})"
+    r"|(\d{1,2}) / (\d{1,2})(?: / (\d{2,4}))?"
+    r"|" + _MONTH + r"(?: (\d{4}))?)"
+)
+_RANGE = re.compile(r"\b(?:from|between) " + _DATE + r" (?:to|and|till|until) " + _DATE)
+_SINCE = re.compile(r"\bsince " + _DATE)
+_IN_MONTH = re.compile(r"\b(?:in|for|during) " + _MONTH + r"(?: (\d{4}))?\b")
+_ON = re.compile(r"\bon (?:the )?" + _DATE)
+_ON_DAY = re.compile(r"\bon the (\d{1,2})\b")
+_ON_WEEKDAY = re.compile(r"\b(since |last |on )?" + _WEEKDAY + r"\b")
+
+_CURRENCY = r"(?:₹ |rs |inr )?"
+_AMOUNT_CMP = re.compile(
+    r"\b(over|above|more than|greater than|>|under|below|less than|<) " + _CURRENCY + _NUM + r"( k)?\b"
+)
+_AMOUNT_EQ = re.compile(r"(?:₹ |\brs |\binr )" + _NUM + r"( k)?\b|\b" + _NUM + r"( k)? rupees\b")
+_CMP_OP = {"over": "gt", "above": "gt", "more than": "gt", "greater than": "gt", ">": "gt",
+           "under": "lt", "below": "lt", "less than": "lt", "<": "lt"}
+
+
+def _past_date(today: date, month: int, day: int = 1, year: Optional[int] = None) -> Optional[date]:
+    """Most recent occurrence on or before today when the year is left out."""
+    try:
+        if year is not None:
+            return date(year if year >= 100 else 2000 + year, month, day)
+        d = date(today.year, month, day)
+        return d if d <= today else date(today.year - 1, month, day)
+    except ValueError:
+        return None
+
+
+def _month_end(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _parse_date(groups: Tuple, today: date) -> Tuple[Optional[date], bool]:
+    """(date, month_only) from one _DATE match's groups."""
+    g = groups
+    num = lambda x: int(x) if x else None  # noqa: E731
+    if g[0]:
+        return _past_date(today, _MONTH_NUM[g[1]], int(g[0]), num(g[2])), False
+    if g[3]:
+        return _past_date(today, _MONTH_NUM[g[3]], int(g[4]), num(g[5])), False
+    if g[6]:
+        try:
+            return date(int(g[6]), int(g[7]), int(g[8])), False
+        except ValueError:
+            return None, False
+    if g[9]:
+        return _past_date(today, int(g[10]), int(g[9]), num(g[11])), False
+    if g[12]:
+        return _past_date(today, _MONTH_NUM[g[12]], 1, num(g[13])), True
+    return None, False
 
-    # detect approx unit
-    unit_map = {"day": 1, "week": 7, "month": 30, "year": 365}
-    unit = None
-    for t in tokens:
-        for u in unit_map.keys():
-            if _near(t, [u, u + "s"]):
-                unit = u
-                break
-        if unit:
-            break
-
-    # detect numeric value
-    num = None
-    for t in tokens:
-        if t.isdigit():
-            num = int(t)
-            break
-
-    # detect word-number value if no digit
-    if num is None:
-        num = _word_to_num(" ".join(tokens))
-
-    # fuzzy duration like "lats 15 dyas"
-    if has_window_word and unit and num:
-        return num * unit_map[unit]
-
-    # relative date like "15 days ago", "yesterday"
-    rel = dateparser.parse(s, settings={"RELATIVE_BASE": now})
-    if rel:
-        delta_days = (now - rel).days
-        if delta_days > 0:
-            return delta_days
-
-    # phrase fallbacks
-    if any(_near(t, ["fortnight"]) for t in tokens):
-        return 14
-    if any(_near(t, ["yesterday"]) for t in tokens):
-        return 1
-    if "this week" in s:
-        return 7
-    if "this month" in s:
-        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        return max(1, (now - start).days)
 
+_DATE_GROUPS = 14
+
+
+def _dateparse(text: str, now: datetime) -> Optional[datetime]:
+    import dateparser
+
+    return dateparser.parse(
+        text,
+        languages=["en"],
+        settings={"RELATIVE_BASE": now, "PREFER_DATES_FROM": "past"},
+    )
+
+
+def warmup() -> None:
+    """Loads dateparser's English data so the first real prompt doesn't pay for it."""
+    _dateparse("3 days ago", datetime.now())
+    normalize_prompt("lats 15 dyas")
+
+
+# ---------------------------
+# Extraction
+# ---------------------------
+def _window(canon: str, today: date) -> dict:
+    """start/end (end exclusive) and window_days; empty if no time slot."""
+    m = _RANGE.search(canon)
+    if m:
+        start, _ = _parse_date(m.groups()[:_DATE_GROUPS], today)
+        end, month_only = _parse_date(m.groups()[_DATE_GROUPS:], today)
+        if start and end:
+            if start > end:  # "from december to february" crosses a year
+                start = start.replace(year=start.year - 1)
+            end = _month_end(end) if month_only else end + timedelta(days=1)
+            return {"start": start, "end": min(end, today + timedelta(days=1))}
+
+    m = _SINCE.search(canon)
+    if m:
+        start, _ = _parse_date(m.groups(), today)
+        if start:
+            return {"start": start}
+
+    m = _IN_MONTH.search(canon)
+    if m:
+        start = _past_date(today, _MONTH_NUM[m.group(1)], 1, int(m.group(2)) if m.group(2) else None)
+        if start:
+            return {"start": start, "end": min(_month_end(start), today + timedelta(days=1))}
+
+    m = _ON.search(canon)
+    if m:
+        day, month_only = _parse_date(m.groups(), today)
+        if day:
+            return {"start": day, "end": _month_end(day) if month_only else day + timedelta(days=1)}
+
+    m = _ON_DAY.search(canon)
+    if m:
+        n = int(m.group(1))
+        month = today.month if n <= today.day else today.month - 1 or 12
+        day = _past_date(today, month, n)
+        if day:
+            return {"start": day, "end": day + timedelta(days=1)}
+
+    m = _ON_WEEKDAY.search(canon)
+    if m:
+        back = (today.weekday() - WEEKDAYS.index(m.group(2))) % 7
+        if back == 0 and m.group(1) in ("last ", "since "):
+            back = 7
+        day = today - timedelta(days=back)
+        if m.group(1) == "since ":
+            return {"start": day}
+        return {"start": day, "end": day + timedelta(days=1)}
+
+    m = _LAST_N.search(canon)
+    if m:
+        return {"days": int(m.group(1) or 1) * UNIT_DAYS[m.group(2)]}
+
+    m = _N_AGO.search(canon)
+    if m:
+        n = 1 if m.group(1) == "a" else int(m.group(1))
+        return {"days": n * UNIT_DAYS[m.group(2)]}
+
+    m = _THIS.search(canon)
+    if m:
+        unit = m.group(1)
+        if unit == "week":
+            return {"days": 7}
+        if unit == "month":
+            return {"start": today.replace(day=1)}
+        if unit == "year":
+            return {"start": today.replace(month=1, day=1)}
+        return {"days": 1}
+
+    words = canon.split()
+    if "fortnight" in words:
+        return {"days": 14}
+    if "yesterday" in words:
+        return {"start": today - timedelta(days=1), "end": today}
+    if "today" in words:
+        return {"start": today}
+    return {}
+
+
+def _amount(canon: str) -> Optional[dict]:
+    m = _AMOUNT_CMP.search(canon)
+    if m:
+        value = float(m.group(2).replace(",", "")) * (1000 if m.group(3) else 1)
+        return {"op": _CMP_OP[m.group(1)], "value": value}
+    m = _AMOUNT_EQ.search(canon)
+    if m:
+        raw, k = (m.group(1), m.group(2)) if m.group(1) else (m.group(3), m.group(4))
+        return {"op": "eq", "value": float(raw.replace(",", "")) * (1000 if k else 1)}
     return None
+
+
+@lru_cache(maxsize=2048)
+def _extract(raw: str, today: date) -> tuple:
+    canon = normalize_prompt(raw)
+    window = _window(canon, today)
+    if not window and _DATE_HINT.search(raw):
+        # last resort for phrasings the patterns don't cover
+        now = datetime.combine(today, datetime.min.time())
+        rel = _dateparse(raw, now)
+        if rel and (now - rel).days > 0:
+            window = {"days": (now - rel).days}
+
+    start = window.get("start")
+    days = window.get("days")
+    if start is not None:
+        days = max(1, (today - start).days)
+    elif days is not None:
+        start = today - timedelta(days=days)
+
+    categories = tuple(dict.fromkeys(t[4:] for t in canon.split() if t.startswith("cat:")))
+    amount = _amount(canon)
+    return (
+        days,
+        start,
+        window.get("end"),
+        categories,
+        tuple(sorted(amount.items())) if amount else None,
+    )
+
+
+def extract_slots(user_prompt: str, now: Optional[datetime] = None) -> dict:
+    """
+    Slots from an expense-type prompt:
+      window_days  days back from today the window starts (None if no time slot)
+      start, end   date bounds, end exclusive (end None = up to now)
+      categories   canonical category names mentioned ("food", "transport", ...)
+      amount       {"op": "gt" | "lt" | "eq", "value": float} or None
+    """
+    today = (now or datetime.now()).date()
+    raw = re.sub(r"\s+", " ", (user_prompt or "").lower().strip())
+    days, start, end, categories, amount = _extract(raw, today)
+    return {
+        "window_days": days,
+        "start": start,
+        "end": end,
+        "categories": list(categories),
+        "amount": dict(amount) if amount else None,
+    }
+
+
+def extract_time_window(user_prompt: str, now: Optional[datetime] = None):
+    """
+    Returns number of days inferred from user_prompt.
+    Fuzzy-robust against typos + supports numeric and word durations.
+    Returns None if no window found (caller can default).
+    """
+    return extract_slots(user_prompt, now)["window_days"]
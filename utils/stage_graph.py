@@ -0,0 +1,134 @@
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import Awaitable, Callable, Dict, List, Optional
+
+_current_stage: contextvars.ContextVar = contextvars.ContextVar("current_stage", default=None)
+_current_graph: contextvars.ContextVar = contextvars.ContextVar("current_graph", default=None)
+
+
+class StageGraph:
+    """
+    Dependency-aware runner for the async stages of one request.
+
+    Each stage is `async def fn(graph)` and pulls what it needs with
+    `await graph.result("other")`, so dependencies are discovered as they
+    are awaited (a stage can depend on another only on some paths).
+    Eager stages start as soon as the graph starts; lazy ones start the
+    first time someone awaits them. Every stage runs at most once.
+
+    timings[name] = {"start_ms", "end_ms", "duration_ms"} relative to start();
+    started_ns is the wall-clock start, for exporting spans.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Callable[["StageGraph"], Awaitable]] = {}
+        self._lazy: Dict[str, bool] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._deps: Dict[str, List[str]] = {}
+        self._t0: Optional[float] = None
+        self.started_ns: Optional[int] = None
+        self.timings: Dict[str, dict] = {}
+
+    def add(self, name: str, fn: Callable[["StageGraph"], Awaitable], lazy: bool = False) -> "StageGraph":
+        self._stages[name] = fn
+        self._lazy[name] = lazy
+        self._deps[name] = []
+        return self
+
+    def start(self) -> "StageGraph":
+        self._t0 = time.perf_counter()
+        self.started_ns = time.time_ns()
+        # stages (and code they call) find the graph through stage_span()
+        _current_graph.set(self)
+        for name, lazy in self._lazy.items():
+            if not lazy:
+                self._task(name)
+        return self
+
+    def _ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    def _task(self, name: str) -> asyncio.Task:
+        task = self._tasks.get(name)
+        if task is None:
+            if self._t0 is None:
+                self.start()
+            task = asyncio.ensure_future(self._run(name))
+            self._tasks[name] = task
+        return task
+
+    async def _run(self, name: str):
+        _current_stage.set(name)
+        start = self._ms()
+        try:
+            return await self._stages[name](self)
+        finally:
+            end = self._ms()
+            self.timings[name] = {"start_ms": start, "end_ms": end, "duration_ms": end - start}
+
+    async def result(self, name: str):
+        caller = _current_stage.get()
+        if caller is not None and name not in self._deps[caller]:
+            self._deps[caller].append(name)
+        # shield: one consumer being cancelled must not cancel a shared stage
+        return await asyncio.shield(self._task(name))
+
+    async def run(self, name: str, coro: Awaitable):
+        """Time an inline step under the graph's clock; it follows every stage finished so far."""
+        self.add(name, lambda graph: coro, lazy=True)
+        self._deps[name] = list(self.timings)
+        return await self.result(name)
+
+    @contextmanager
+    def span(self, name: str):
+        """Time a synchronous or nested step under the graph's clock."""
+        deps = list(self.timings)
+        start = self._ms()
+        try:
+            yield
+        finally:
+            end = self._ms()
+            self.timings[name] = {"start_ms": start, "end_ms": end, "duration_ms": end - start}
+            self._deps.setdefault(name, deps)
+
+    def peek(self, name: str):
+        """A stage's result if it already finished successfully, else None."""
+        task = self._tasks.get(name)
+        if task is None or not task.done() or task.cancelled() or task.exception() is not None:
+            return None
+        return task.result()
+
+    def cancel_pending(self) -> None:
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+
+    def critical_path(self) -> List[str]:
+        """Walk back from the last stage to finish through its latest-finishing dependency."""
+        if not self.timings:
+            return []
+        node = max(self.timings, key=lambda n: self.timings[n]["end_ms"])
+        path = [node]
+        while True:
+            deps = [d for d in self._deps.get(node, []) if d in self.timings]
+            if not deps:
+                break
+            node = max(deps, key=lambda n: self.timings[n]["end_ms"])
+            path.append(node)
+        return path[::-1]
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header."""
+        parts = [f"{name};dur={t['duration_ms']:.1f}" for name, t in self.timings.items()]
+        path = self.critical_path()
+        if path:
+            parts.append(f'critical;desc="{">".join(path)}"')
+        return ", ".join(parts)
+
+
+def stage_span(name: str):
+    """graph.span(name) on the request's graph; a no-op outside one."""
+    graph = _current_graph.get()
+    return graph.span(name) if graph is not None else nullcontext()
@@ -0,0 +1,160 @@
+import numpy as np
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TYPES = ("income", "expense", "other")
+_TYPE_CODE = {t: i for i, t in enumerate(TYPES)}
+NO_TIMESTAMP = np.iinfo(np.int64).min
+
+
+def to_epoch_ms(ts) -> int:
+    if ts is None:
+        return NO_TIMESTAMP
+    if isinstance(ts, datetime):
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return int(ts.timestamp() * 1000)
+    return int(ts)
+
+
+class TransactionFrame:
+    """
+    Columnar view of one user's transactions.
+
+        ts        int64    epoch milliseconds (NO_TIMESTAMP when unknown)
+        amount    float64
+        category  int32    code into self.categories
+        type      int8     code into TYPES
+
+    Rows can be appended incrementally; columns grow by doubling so appends
+    are amortized O(1). All analytics are vectorized over a boolean mask.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._n = 0
+        self._ts = np.empty(capacity, dtype=np.int64)
+        self._amount = np.empty(capacity, dtype=np.float64)
+        self._category = np.empty(capacity, dtype=np.int32)
+        self._type = np.empty(capacity, dtype=np.int8)
+        self.categories: List[str] = []
+        self._category_code: Dict[str, int] = {}
+
+    @classmethod
+    def from_records(cls, rows: Iterable[dict]) -> "TransactionFrame":
+        rows = list(rows)
+        frame = cls(capacity=max(len(rows), 16))
+        frame.append(rows)
+        return frame
+
+    # ---------------------------
+    # Columns
+    # ---------------------------
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def ts(self) -> np.ndarray:
+        return self._ts[:self._n]
+
+    @property
+    def amount(self) -> np.ndarray:
+        return self._amount[:self._n]
+
+    @property
+    def category(self) -> np.ndarray:
+        return self._category[:self._n]
+
+    @property
+    def type(self) -> np.ndarray:
+        return self._type[:self._n]
+
+    def type_name(self, i: int) -> str:
+        return TYPES[self._type[i]]
+
+    def _code(self, category) -> int:
+        name = category if category is not None else "uncategorized"
+        code = self._category_code.get(name)
+        if code is None:
+            code = self._category_code[name] = len(self.categories)
+            self.categories.append(name)
+        return code
+
+    def _reserve(self, extra: int) -> None:
+        need = self._n + extra
+        cap = len(self._ts)
+        if need <= cap:
+            return
+        while cap < need:
+            cap *= 2
+        for name in ("_ts", "_amount", "_category", "_type"):
+            old = getattr(self, name)
+            new = np.empty(cap, dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def append(self, rows: Iterable[dict]) -> None:
+        rows = list(rows)
+        if not rows:
+            return
+        self._reserve(len(rows))
+        lo, hi = self._n, self._n + len(rows)
+        self._ts[lo:hi] = [to_epoch_ms(r.get("timestamp")) for r in rows]
+        self._amount[lo:hi] = [float(r.get("amount", 0) or 0) for r in rows]
+        self._category[lo:hi] = [self._code(r.get("category")) for r in rows]
+        self._type[lo:hi] = [_TYPE_CODE.get(r.get("type"), _TYPE_CODE["other"]) for r in rows]
+        self._n = hi
+
+    # ---------------------------
+    # Analytics
+    # ---------------------------
+    def mask(self, ttype: Optional[str] = None, since=None, until=None) -> np.ndarray:
+        m = np.ones(self._n, dtype=bool)
+        if ttype is not None:
+            m &= self.type == _TYPE_CODE.get(ttype, _TYPE_CODE["other"])
+        if since is not None:
+            m &= self.ts >= to_epoch_ms(since)
+        if until is not None:
+            m &= self.ts < to_epoch_ms(until)
+        return m
+
+    def total(self, ttype: Optional[str] = None, since=None, until=None) -> float:
+        return float(self.amount[self.mask(ttype, since, until)].sum())
+
+    def category_totals(self, ttype: Optional[str] = "expense", since=None, until=None) -> np.ndarray:
+        """Totals indexed by category code."""
+        m = self.mask(ttype, since, until)
+        return np.bincount(self.category[m], weights=self.amount[m], minlength=len(self.categories))
+
+    def totals_by_category(self, ttype: Optional[str] = "expense", since=None, until=None) -> Dict[str, float]:
+        sums = self.category_totals(ttype, since, until)
+        return {self.categories[i]: float(sums[i]) for i in np.flatnonzero(sums)}
+
+    def share_by_category(self, ttype: Optional[str] = "expense", since=None, until=None) -> Dict[str, float]:
+        """Percentage of the window total per category."""
+        sums = self.category_totals(ttype, since, until)
+        total = sums.sum()
+        if total == 0:
+            return {}
+        pct = sums * (100.0 / total)
+        return {self.categories[i]: float(pct[i]) for i in np.flatnonzero(sums)}
+
+    def top_k(self, k: int = 3, ttype: Optional[str] = "expense", since=None, until=None) -> List[Tuple[str, float, float]]:
+        """[(category, amount, percent of total)] by descending amount."""
+        sums = self.category_totals(ttype, since, until)
+        total = sums.sum()
+        if total == 0:
+            return []
+        k = min(k, int(np.count_nonzero(sums)))
+        idx = np.argpartition(-sums, k - 1)[:k] if k < len(sums) else np.arange(len(sums))
+        idx = idx[np.argsort(-sums[idx], kind="stable")][:k]
+        return [(self.categories[i], float(sums[i]), float(sums[i] * 100.0 / total)) for i in idx]
+
+    def daily_histogram(self, ttype: Optional[str] = "expense", since=None, until=None):
+        """(days as datetime64[D], total per day) for days that have rows."""
+        m = self.mask(ttype, since, until) & (self.ts != NO_TIMESTAMP)
+        days = self.ts[m] // 86_400_000
+        if days.size == 0:
+            return np.array([], dtype="datetime64[D]"), np.array([], dtype=np.float64)
+        uniq, inverse = np.unique(days, return_inverse=True)
+        sums = np.bincount(inverse, weights=self.amount[m])
+        return uniq.astype("datetime64[D]"), sums
@@ -0,0 +1,366 @@
+"""
+Transaction writes into users/{uid}/transactions: bulk import (POST
+/transactions/bulk) and single transactions (POST /transactions,
+create_transaction).
+
+Input is CSV with a header row or JSON Lines, one record per line, parsed
+incrementally from the request body:
+
+    timestamp    ISO 8601 datetime or YYYY-MM-DD (naive = UTC)     required
+    amount       positive number; "1,234.50" and "₹" are accepted   required
+    type         income | expense (credit / debit, cr / dr too)    required
+    category     free text, "uncategorized" when empty
+    description  free text
+    id           idempotency key; defaults to a hash of the fields above,
+                 plus "-<n>" for the n-th identical row of the upload (n >= 2)
+
+Occurrences are counted over the last INGEST_DUP_WINDOW distinct row
+hashes (16384, about 4 MB), so memory stays bounded on million-row files.
+Identical rows are normally adjacent (they share a timestamp); a copy that
+turns up more distinct rows than that after the previous one starts again
+at n = 1 and is reported as a duplicate instead of being written.
+
+Writes go out in Firestore batches of at most 500 ops: the new transaction
+documents (create, so an existing id is never overwritten) plus one merged
+increment per rollup bucket they touch (txn_rollup.add_totals_to_batch).
+Ids that already exist are skipped after a get_all, so re-importing the
+same statement writes nothing. At most INGEST_MAX_INFLIGHT batches are
+in flight; parsing waits for a free slot, which stops reading the body.
+"""
+import os
+import csv
+import json
+import codecs
+import asyncio
+import hashlib
+import re
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Tuple
+
+from utils.txn_rollup import add_totals_to_batch, aggregate, bucket_keys
+
+MAX_BATCH_OPS = 500
+FORMATS = ("csv", "jsonl")
+TYPE_ALIASES = {
+    "income": "income", "credit": "income", "cr": "income",
+    "expense": "expense", "debit": "expense", "dr": "expense",
+}
+_AMOUNT_JUNK = re.compile(r"[,\s₹$]|^(?:inr|rs\.?)", re.IGNORECASE)
+_ID_OK = re.compile(r"^[A-Za-z0-9_.:-]{1,128}$")
+
+
+class RowError(ValueError):
+    pass
+
+
+# ---------------------------
+# Validation
+# ---------------------------
+def parse_timestamp(value) -> datetime:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, timezone.utc)
+    if not isinstance(value, str) or not value.strip():
+        raise RowError("timestamp is required")
+    try:
+        ts = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise RowError(f"bad timestamp {value!r}")
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def parse_amount(value) -> float:
+    if isinstance(value, str):
+        value = _AMOUNT_JUNK.sub("", value.strip())
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f"bad amount {value!r}")
+    if not amount > 0 or amount == float("inf"):
+        raise RowError(f"amount must be positive, got {value!r}")
+    return round(amount, 2)
+
+
+def validate(record: dict, source: str = "bulk") -> Tuple[str, dict]:
+    """(document id, transaction) for one parsed record, or RowError."""
+    ttype = TYPE_ALIASES.get(str(record.get("type") or "").strip().lower())
+    if ttype is None:
+        raise RowError(f"type must be income or expense, got {record.get('type')!r}")
+    txn = {
+        "type": ttype,
+        "category": str(record.get("category") or "").strip() or "uncategorized",
+        "amount": parse_amount(record.get("amount")),
+        "timestamp": parse_timestamp(record.get("timestamp")),
+        "source": source,
+    }
+    description = str(record.get("description") or "").strip()
+    if description:
+        txn["description"] = description
+
+    key = record.get("id")
+    if key not in (None, ""):
+        key = str(key)
+        if not _ID_OK.match(key):
+            raise RowError("id must be 1-128 characters of [A-Za-z0-9_.:-]")
+        return f"k-{key}", txn
+    # same statement line -> same id, whichever file it arrives in
+    digest = hashlib.sha1(
+        f"{txn['timestamp'].isoformat()}|{ttype}|{txn['amount']:.2f}|{txn['category']}|{description}".encode()
+    ).hexdigest()
+    return f"h-{digest}", txn
+
+
+async def create_transaction(db, uid: str, record: dict) -> Tuple[str, bool]:
+    """
+    Write one transaction (POST /transactions) together with its rollup
+    increments, in one batch. With an "id" the write is idempotent
+    (returns created=False when it exists); without one every call is a
+    new transaction. Returns (document id, created).
+    """
+    from google.api_core import exceptions as google_exceptions
+
+    doc_id, txn = validate(record, source="api")
+    user_ref = db.collection("users").document(uid)
+    col = user_ref.collection("transactions")
+    ref = col.document(doc_id) if doc_id.startswith("k-") else col.document()
+
+    batch = db.batch()
+    batch.create(ref, txn)
+    add_totals_to_batch(batch, user_ref, aggregate([txn]))
+    try:
+        await batch.commit()
+    except (google_exceptions.AlreadyExists, google_exceptions.Conflict):
+        return ref.id, False
+    return ref.id, True
+
+
+# ---------------------------
+# Incremental parsing
+# ---------------------------
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """(line number, line) from a byte stream; only one partial line is buffered."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buf, lineno = "", 0
+    async for chunk in chunks:
+        buf += decoder.decode(chunk)
+        if "\n" not in buf:
+            continue
+        *lines, buf = buf.split("\n")
+        for line in lines:
+            lineno += 1
+            yield lineno, line.rstrip("\r")
+    buf += decoder.decode(b"", final=True)
+    if buf:
+        yield lineno + 1, buf.rstrip("\r")
+
+
+def _quote_open_after(line: str, in_quotes: bool) -> bool:
+    """Whether a quoted CSV field is still open at the end of line (default dialect)."""
+    if '"' not in line:
+        return in_quotes
+    field_start = not in_quotes
+    i, n = 0, len(line)
+    while i < n:
+        c = line[i]
+        if in_quotes:
+            if c == '"':
+                if i + 1 < n and line[i + 1] == '"':
+                    i += 1  # escaped quote
+                else:
+                    in_quotes = False
+        elif c == '"' and field_start:
+            in_quotes = True
+        field_start = not in_quotes and c == ","
+        i += 1
+    return in_quotes
+
+
+async def _iter_csv(chunks: AsyncIterator[bytes]):
+    # one csv.reader over the whole line stream, so quoted fields may span
+    # lines; it is only advanced once a record's last line has arrived
+    lines: deque = deque()
+    reader = csv.reader(iter(lines.popleft, None))
+    header, start, in_quotes = None, None, False
+    async for lineno, line in iter_lines(chunks):
+        if start is None:
+            if not line.strip():
+                continue
+            start = lineno
+        lines.append(line + "\n")
+        in_quotes = _quote_open_after(line, in_quotes)
+        if in_quotes:
+            continue
+        first, start = start, None
+        try:
+            row = next(reader)
+        except csv.Error as e:
+            lines.clear()
+            yield first, RowError(f"bad CSV: {e}")
+            continue
+        if header is None:
+            header = [h.strip().lower() for h in row]
+            continue
+        if len(row) != len(header):
+            yield first, RowError(f"expected {len(header)} columns, got {len(row)}")
+            continue
+        yield first, dict(zip(header, row))
+    if start is not None:
+        yield start, RowError("unterminated quoted field")
+
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str):
+    """(line number, record dict or RowError); blank lines are skipped."""
+    if fmt == "csv":
+        async for item in _iter_csv(chunks):
+            yield item
+        return
+    async for lineno, line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield lineno, RowError(f"invalid JSON: {e.msg}")
+            continue
+        if not isinstance(record, dict):
+            yield lineno, RowError("each line must be a JSON object")
+            continue
+        yield lineno, record
+
+
+# ---------------------------
+# Batched writes
+# ---------------------------
+class BulkIngest:
+    def __init__(self, db, uid: str, max_inflight: int = 4, max_errors: int = 100,
+                 dup_window: int = 16384):
+        self.db = db
+        self.user_ref = db.collection("users").document(uid)
+        self.col = self.user_ref.collection("transactions")
+        self.max_errors = max_errors
+        self._slots = asyncio.Semaphore(max(int(max_inflight), 1))
+        self._tasks = set()
+
+        self.rows = 0
+        self.written = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors = []
+        # occurrences per content hash (first 8 bytes of the digest) among the
+        # last dup_window distinct hashes of this upload, least recent first
+        self.dup_window = max(int(dup_window), 1)
+        self._seen: "OrderedDict[int, int]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls, db, uid: str) -> "BulkIngest":
+        return cls(
+            db, uid,
+            max_inflight=int(os.getenv("INGEST_MAX_INFLIGHT", "4")),
+            dup_window=int(os.getenv("INGEST_DUP_WINDOW", "16384")),
+        )
+
+    def _occurrence(self, digest: int) -> int:
+        n = self._seen.pop(digest, 0) + 1
+        self._seen[digest] = n
+        if len(self._seen) > self.dup_window:
+            self._seen.popitem(last=False)
+        return n
+
+    def _error(self, line, message) -> None:
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": str(message)})
+
+    async def run(self, chunks: AsyncIterator[bytes], fmt: str) -> dict:
+        start = asyncio.get_running_loop().time()
+        pending: Dict[str, dict] = {}
+        buckets = set()
+        try:
+            async for lineno, record in iter_records(chunks, fmt):
+                self.rows += 1
+                try:
+                    if isinstance(record, RowError):
+                        raise record
+                    doc_id, txn = validate(record)
+                except RowError as e:
+                    self.invalid += 1
+                    self._error(lineno, e)
+                    continue
+                if doc_id.startswith("h-"):
+                    # identical rows are separate transactions (two equal purchases
+                    # on one day); the n-th copy gets -n, the same on every re-import
+                    n = self._occurrence(int(doc_id[2:18], 16))
+                    if n > 1:
+                        doc_id = f"{doc_id}-{n}"
+                if doc_id in pending:
+                    self.duplicates += 1
+                    continue
+                keys = bucket_keys(txn["timestamp"])
+                # one op per transaction + one per distinct rollup bucket
+                new_buckets = sum(1 for k in keys if k not in buckets)
+                if len(pending) + len(buckets) + new_buckets >= MAX_BATCH_OPS:
+                    await self._submit(pending)
+                    pending, buckets = {}, set()
+                pending[doc_id] = txn
+                buckets.update(keys)
+            if pending:
+                await self._submit(pending)
+        finally:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        elapsed = asyncio.get_running_loop().time() - start
+        return {
+            "rows": self.rows,
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "failed": self.failed,
+            "batches": self.batches,
+            "seconds": round(elapsed, 3),
+            "rows_per_s": round(self.rows / elapsed) if elapsed > 0 else None,
+            "errors": self.errors,
+        }
+
+    async def _submit(self, rows: Dict[str, dict]) -> None:
+        # backpressure: no more parsing until a batch slot frees up
+        await self._slots.acquire()
+        task = asyncio.ensure_future(self._write(rows))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, rows: Dict[str, dict]) -> None:
+        from google.api_core import exceptions as google_exceptions
+
+        try:
+            for attempt in range(3):
+                refs = {doc_id: self.col.document(doc_id) for doc_id in rows}
+                existing = set()
+                async for snap in self.db.get_all(list(refs.values()), field_paths=["type"]):
+                    if snap.exists:
+                        existing.add(snap.id)
+                fresh = {k: v for k, v in rows.items() if k not in existing}
+                self.duplicates += len(rows) - len(fresh)
+                if not fresh:
+                    return
+
+                batch = self.db.batch()
+                for doc_id, txn in fresh.items():
+                    batch.create(refs[doc_id], txn)
+                add_totals_to_batch(batch, self.user_ref, aggregate(fresh.values()))
+                try:
+                    await batch.commit()
+                except (google_exceptions.AlreadyExists, google_exceptions.Conflict):
+                    # another batch (or upload) created one of these ids since the
+                    # get_all; nothing was written, so re-check and retry
+                    rows = fresh
+                    continue
+                self.batches += 1
+                self.written += len(fresh)
+                return
+            raise RuntimeError("ids kept conflicting with concurrent writes")
+        except Exception as e:
+            self.failed += len(rows)
+            self._error(None, f"batch of {len(rows)} rows failed: {e}")
+        finally:
+            self._slots.release()
@@ -0,0 +1,195 @@
+"""
+Reads of users/{uid}/transactions for the chat pipeline.
+
+    window(uid, since, until, types)   rows in [since, until), oldest first
+    recent(uid, limit, types)          the newest `limit` rows
+
+window_frame() / recent_frame() return the same rows as a
+TransactionFrame whose columns are filled page by page as the pages
+arrive, without building a dict per row first (the chat route's path).
+
+Query plan:
+  - select() projection: only type / category / amount / timestamp come back
+  - type pushdown: with TXN_TYPE_INDEX=1 the type filter runs in Firestore
+    (`type == x` / `type in [...]`), which needs the composite indexes in
+    firestore.indexes.json (type + timestamp, both directions). Without it
+    the query is index-free (timestamp only) and types are filtered here.
+  - pagination: pages of TXN_PAGE_SIZE ordered by timestamp with a
+    start_after cursor; a producer task keeps at most TXN_PREFETCH_PAGES
+    pages fetched ahead of the consumer.
+
+Every read can report docs / pages / approximate bytes transferred
+(Firestore's document-size rules) into a stats dict.
+"""
+import os
+import asyncio
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from utils.txn_analytics import TransactionFrame
+
+TXN_FIELDS = ("type", "category", "amount", "timestamp")
+
+
+def txn_row(data):
+    return {
+        "type": data.get("type"),
+        "category": data.get("category"),
+        "amount": float(data.get("amount", 0) or 0),
+        "timestamp": data.get("timestamp"),
+    }
+
+
+def value_size(value) -> int:
+    """Storage size of a Firestore value (cloud.google.com/firestore/docs/storage-size)."""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(k.encode("utf-8")) + 1 + value_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(value_size(v) for v in value)
+    return 16  # references, geo points
+
+
+def doc_size(path: str, data: Optional[dict]) -> int:
+    # document name (path segments + 16) + fields + 32 bytes overhead
+    name = sum(len(seg.encode("utf-8")) + 1 for seg in path.split("/")) + 16
+    return name + value_size(data or {}) + 32
+
+
+class TransactionRepository:
+    def __init__(self, db, type_index: bool = False, page_size: int = 300, prefetch: int = 2):
+        self.db = db
+        self.type_index = type_index
+        self.page_size = max(int(page_size), 1)
+        self.prefetch = max(int(prefetch), 1)
+        self.totals = {"queries": 0, "docs": 0, "pages": 0, "bytes": 0}
+
+    @classmethod
+    def from_env(cls, db) -> "TransactionRepository":
+        return cls(
+            db,
+            # only after `firebase deploy --only firestore:indexes`
+            type_index=os.getenv("TXN_TYPE_INDEX", "0") == "1",
+            page_size=int(os.getenv("TXN_PAGE_SIZE", "300")),
+            prefetch=int(os.getenv("TXN_PREFETCH_PAGES", "2")),
+        )
+
+    def _collection(self, uid: str):
+        return self.db.collection("users").document(uid).collection("transactions")
+
+    def _query(self, uid, types, since=None, until=None, descending=False):
+        query = self._collection(uid)
+        types = tuple(types) if types else ()
+        if types and self.type_index:
+            # composite index: type ASC, timestamp ASC|DESC
+            query = query.where("type", "==", types[0]) if len(types) == 1 else query.where("type", "in", list(types))
+        if since is not None:
+            query = query.where("timestamp", ">=", since)
+        if until is not None:
+            query = query.where("timestamp", "<", until)
+        query = query.order_by("timestamp", direction="DESCENDING" if descending else "ASCENDING")
+        return query.select(TXN_FIELDS)
+
+    async def window(self, uid: str, since: datetime, until: Optional[datetime] = None,
+                     types: Optional[Iterable[str]] = None, stats: Optional[dict] = None) -> List[dict]:
+        query = self._query(uid, types, since, until)
+        return await self._rows(query, types, None, stats)
+
+    async def recent(self, uid: str, limit: int = 100, types: Optional[Iterable[str]] = None,
+                     stats: Optional[dict] = None) -> List[dict]:
+        query = self._query(uid, types, descending=True)
+        return await self._rows(query, types, limit, stats)
+
+    async def window_frame(self, uid: str, since: datetime, until: Optional[datetime] = None,
+                           types: Optional[Iterable[str]] = None, stats: Optional[dict] = None) -> TransactionFrame:
+        query = self._query(uid, types, since, until)
+        return await self._rows(query, types, None, stats, frame=TransactionFrame(max(self.page_size, 16)))
+
+    async def recent_frame(self, uid: str, limit: int = 100, types: Optional[Iterable[str]] = None,
+                           stats: Optional[dict] = None) -> TransactionFrame:
+        query = self._query(uid, types, descending=True)
+        return await self._rows(query, types, limit, stats, frame=TransactionFrame(max(limit, 16)))
+
+    async def _rows(self, query, types, limit, stats, frame: Optional[TransactionFrame] = None):
+        """Rows as txn_row dicts, or appended to frame (returned) when one is given."""
+        keep = set(types) if types else None
+        # a post-filtered recent() may need more than `limit` docs: page on
+        cap = limit if keep is None or self.type_index else None
+        rows: List[dict] = []
+        read = {"docs": 0, "pages": 0, "bytes": 0}
+        pages = self._pages(query, cap, read)
+        try:
+            async for page in pages:
+                if keep is not None:
+                    page = [data for data in page if data.get("type") in keep]
+                if frame is not None:
+                    if limit is not None:
+                        page = page[:limit - len(frame)]
+                    # the documents are already projected to TXN_FIELDS
+                    frame.append(page)
+                    if limit is not None and len(frame) >= limit:
+                        break
+                    continue
+                rows.extend(txn_row(data) for data in page)
+                if limit is not None and len(rows) >= limit:
+                    break
+        finally:
+            await pages.aclose()
+
+        self.totals["queries"] += 1
+        for k, v in read.items():
+            self.totals[k] += v
+            if stats is not None:
+                stats[k] = stats.get(k, 0) + v
+        if frame is not None:
+            return frame
+        return rows[:limit] if limit is not None else rows
+
+    async def _pages(self, query, cap, read):
+        """Pages of document dicts; a producer task stays at most `prefetch` pages ahead."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.prefetch)
+
+        async def produce():
+            cursor, fetched = None, 0
+            try:
+                while True:
+                    size = self.page_size if cap is None else min(self.page_size, cap - fetched)
+                    page_query = query.limit(size)
+                    if cursor is not None:
+                        page_query = page_query.start_after(cursor)
+                    snaps = [snap async for snap in page_query.stream()]
+                    page = [snap.to_dict() or {} for snap in snaps]
+                    read["pages"] += 1
+                    read["docs"] += len(page)
+                    read["bytes"] += sum(doc_size(s.reference.path, d) for s, d in zip(snaps, page))
+                    fetched += len(page)
+                    await queue.put(page)
+                    if len(page) < size or (cap is not None and fetched >= cap):
+                        break
+                    cursor = snaps[-1]
+            except Exception as e:
+                await queue.put(e)
+                return
+            await queue.put(None)
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            while True:
+                page = await queue.get()
+                if page is None:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+        finally:
+            producer.cancel()
+
+    def stats(self) -> dict:
+        return {**self.totals, "type_index": self.type_index}
@@ -0,0 +1,252 @@
+"""
+Per-user transaction rollups.
+
+    users/{uid}/rollups/d-YYYY-MM-DD   one doc per UTC day
+    users/{uid}/rollups/m-YYYY-MM      one doc per UTC month
+        {"period": "day"|"month", "key": "...",
+         "income": {category: total}, "expense": {category: total}, "count": n}
+
+Every server-side write adds the increments in the same batch as the
+transactions (add_totals_to_batch(batch, user_ref, aggregate(txns))):
+POST /transactions (txn_ingest.create_transaction) and bulk import, so the
+rollup moves atomically with the data. Clients that write
+users/{uid}/transactions directly bypass them, so the rollups can go
+stale:
+  - users/{uid}.rollup_ready is set by rebuild once the buckets cover the
+    user's full history; readers only consider rollups when it is set
+  - as a fallback, not a way of keeping them current, window_totals() also
+    counts the window's transactions (one count aggregation, run alongside
+    the bucket reads) and returns None when the buckets' count differs.
+    The caller then reads the transactions and clears rollup_ready
+    (mark_stale), so later requests go straight to the transactions
+    instead of paying for the check again; the next rebuild sets it back.
+    This catches added and deleted transactions, not edits in place;
+    rebuild after bulk edits.
+
+Backfill / rebuild:
+    python -m utils.txn_rollup rebuild --uid <uid>
+    python -m utils.txn_rollup rebuild --all
+"""
+import os
+import json
+import asyncio
+import argparse
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+ROLLUP_COLLECTION = "rollups"
+ROLLUP_READY_FIELD = "rollup_ready"
+TXN_TYPES = ("income", "expense")
+
+
+def _as_utc(ts):
+    if isinstance(ts, datetime):
+        return ts.astimezone(timezone.utc) if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc)
+
+
+def day_key(d: date) -> str:
+    return f"d-{d.isoformat()}"
+
+
+def month_key(d: date) -> str:
+    return f"m-{d.year:04d}-{d.month:02d}"
+
+
+def bucket_keys(ts):
+    d = _as_utc(ts).date()
+    return day_key(d), month_key(d)
+
+
+def _category(txn):
+    return txn.get("category") or "uncategorized"
+
+
+def add_totals_to_batch(batch, user_ref, buckets):
+    """
+    Add the increments for aggregate() output to a batch: one write per
+    bucket instead of two per transaction (bulk imports).
+    """
+    # imported here: google.cloud.firestore is ~0.3s of the app's import time
+    from google.cloud import firestore
+
+    rollups = user_ref.collection(ROLLUP_COLLECTION)
+    for key, doc in buckets.items():
+        data = {"period": doc["period"], "key": doc["key"], "count": firestore.Increment(doc["count"])}
+        for ttype in TXN_TYPES:
+            if doc[ttype]:
+                data[ttype] = {c: firestore.Increment(v) for c, v in doc[ttype].items()}
+        batch.set(rollups.document(key), data, merge=True)
+
+
+def aggregate(txns):
+    """{bucket_key: rollup doc} for an iterable of transaction dicts."""
+    buckets = {}
+    for txn in txns:
+        ttype = txn.get("type")
+        if ttype not in TXN_TYPES:
+            continue
+        amount = float(txn.get("amount", 0) or 0)
+        for period, key in zip(("day", "month"), bucket_keys(txn.get("timestamp"))):
+            doc = buckets.setdefault(
+                key, {"period": period, "key": key[2:], "income": {}, "expense": {}, "count": 0}
+            )
+            doc[ttype][_category(txn)] = doc[ttype].get(_category(txn), 0.0) + amount
+            doc["count"] += 1
+    return buckets
+
+
+def window_bucket_keys(since: datetime, until: datetime = None):
+    """
+    Fewest buckets covering [since's UTC day, until's UTC day]: whole
+    months that fit use the month doc, the ragged ends use day docs.
+    Day granularity: the first day counts in full even if since is mid-day.
+    """
+    d = _as_utc(since).date()
+    end = _as_utc(until or datetime.now(timezone.utc)).date()
+    keys = []
+    while d <= end:
+        next_month = (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+        if d.day == 1 and next_month - timedelta(days=1) <= end:
+            keys.append(month_key(d))
+            d = next_month
+        else:
+            keys.append(day_key(d))
+            d += timedelta(days=1)
+    return keys
+
+
+def sum_buckets(docs):
+    totals = {t: defaultdict(float) for t in TXN_TYPES}
+    count = 0
+    for doc in docs:
+        for ttype in TXN_TYPES:
+            for category, amount in (doc.get(ttype) or {}).items():
+                totals[ttype][category] += float(amount or 0)
+        count += int(doc.get("count", 0) or 0)
+    return {"income": dict(totals["income"]), "expense": dict(totals["expense"]), "count": count}
+
+
+def _window_bounds(since: datetime, until: datetime = None):
+    """[since's UTC midnight, midnight after until's UTC day): what the buckets cover."""
+    first = _as_utc(since).date()
+    last = _as_utc(until or datetime.now(timezone.utc)).date()
+    return (
+        datetime.combine(first, datetime.min.time(), timezone.utc),
+        datetime.combine(last + timedelta(days=1), datetime.min.time(), timezone.utc),
+    )
+
+
+async def _count_transactions(user_ref, since: datetime, until: datetime = None) -> int:
+    start, end = _window_bounds(since, until)
+    query = (
+        user_ref.collection("transactions")
+        .where("timestamp", ">=", start)
+        .where("timestamp", "<", end)
+        .count()
+    )
+    result = await query.get()
+    return int(result[0][0].value)
+
+
+async def window_totals(db, user_ref, since: datetime, until: datetime = None):
+    """
+    {"income": {category: total}, "expense": {category: total}, "count": n}
+    for the window, from a handful of rollup docs (db is an AsyncClient).
+    None when the buckets don't account for every transaction in the window
+    (written without the increments); read the transactions then.
+    """
+    rollups = user_ref.collection(ROLLUP_COLLECTION)
+    refs = [rollups.document(k) for k in window_bucket_keys(since, until)]
+
+    async def read_buckets():
+        return [snap.to_dict() async for snap in db.get_all(refs) if snap.exists]
+
+    docs, count = await asyncio.gather(read_buckets(), _count_transactions(user_ref, since, until))
+    totals = sum_buckets(docs)
+    if totals["count"] != count:
+        return None
+    return totals
+
+
+async def mark_stale(user_ref) -> None:
+    """Clear rollup_ready after window_totals() found the buckets behind."""
+    await user_ref.set({ROLLUP_READY_FIELD: False}, merge=True)
+
+
+def rows_from_totals(totals, types=TXN_TYPES):
+    """Category totals in the transaction row shape build_prompt expects."""
+    rows = []
+    for ttype in types:
+        for category, amount in sorted(totals.get(ttype, {}).items(), key=lambda kv: -kv[1]):
+            if amount:
+                rows.append({"type": ttype, "category": category, "amount": amount, "timestamp": None})
+    return rows
+
+
+# ---------------------------
+# Rebuild (sync client, offline job)
+# ---------------------------
+def rebuild_user(db, uid):
+    """
+    Recompute every bucket of one user from users/{uid}/transactions.
+    Transactions written while this runs may be missed; run it while
+    writers are paused or re-run it afterwards.
+    """
+    user_ref = db.collection("users").document(uid)
+    txns = (doc.to_dict() or {} for doc in user_ref.collection("transactions").stream())
+    buckets = aggregate(txns)
+
+    batch, ops = db.batch(), 0
+    rollups = user_ref.collection(ROLLUP_COLLECTION)
+
+    def _op():
+        nonlocal batch, ops
+        ops += 1
+        if ops == 500:
+            batch.commit()
+            batch, ops = db.batch(), 0
+
+    for doc in rollups.stream():
+        if doc.id not in buckets:
+            batch.delete(doc.reference)
+            _op()
+    for key, data in buckets.items():
+        batch.set(rollups.document(key), data)
+        _op()
+    batch.set(user_ref, {ROLLUP_READY_FIELD: True}, merge=True)
+    batch.commit()
+    return len(buckets)
+
+
+def _sync_client():
+    from dotenv import load_dotenv
+    from google.cloud import firestore
+    from google.oauth2 import service_account
+
+    load_dotenv()
+    creds = json.loads(os.environ["FIREBASE_CREDENTIALS"])
+    return firestore.Client(
+        project=creds["project_id"],
+        credentials=service_account.Credentials.from_service_account_info(creds),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill / rebuild transaction rollups.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild")
+    who = rebuild.add_mutually_exclusive_group(required=True)
+    who.add_argument("--uid", action="append", help="user id (repeatable)")
+    who.add_argument("--all", action="store_true", help="every document in users/")
+    args = parser.parse_args()
+
+    db = _sync_client()
+    uids = args.uid or [doc.id for doc in db.collection("users").list_documents()]
+    for uid in uids:
+        n = rebuild_user(db, uid)
+        print(f"✔️ {uid}: {n} buckets")
+
+
+if __name__ == "__main__":
+    main()